@@ -0,0 +1,93 @@
+"""Análises da frota sobre o histórico de inspeções.
+
+Os vetores de status gravados no banco viram uma matriz ``uint8``
+(inspeções x itens) por versão de catálogo; taxas, rankings e tendências
+saem de operações vetorizadas do NumPy/pandas, sem laço por inspeção.
+"""
+import numpy as np
+import pandas as pd
+
+HISTORY_COLUMNS = ('id', 'data', 'placa', 'matricula', 'colaborador', 'resultado', 'catalogo', 'statuses')
+
+
+def status_matrix(blobs, n_items):
+    """Matriz uint8 (inspeções x itens) a partir dos vetores gravados, sem cópia por linha"""
+    return np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), n_items)
+
+
+def _ranking(frame, column):
+    """Inspeções, não conformidades e taxa agrupadas por ``column`` (placa ou colaborador)"""
+    frame = frame[frame[column] != '']
+    ranking = frame.groupby(column).agg(
+        inspecoes=('id', 'size'),
+        reprovadas=('reprovada', 'sum'),
+        nao_conformes=('nao_conformes', 'sum'),
+        avaliados=('avaliados', 'sum'),
+    )
+    ranking['taxa_nc'] = ranking['nao_conformes'] / ranking['avaliados'].where(ranking['avaliados'] > 0)
+    return ranking.sort_values(['taxa_nc', 'nao_conformes'], ascending=False)
+
+
+def build_report(rows, catalogs, nonconforming, na_code='N/A'):
+    """Relatório da frota a partir de ``InspectionStore.history``.
+
+    ``nonconforming`` são os códigos que contam como não conformidade (B/C
+    no EPC, NC/NR no EPI); ``na_code`` não conta como item avaliado.
+    Retorna um dict de DataFrames: itens, veiculos, colaboradores e semanal.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=HISTORY_COLUMNS)
+    frame['data'] = pd.to_datetime(frame['data'], format='%Y-%m-%d', errors='coerce')
+    frame['reprovada'] = frame['resultado'] == 'Reprovado'
+    frame['nao_conformes'] = 0
+    frame['avaliados'] = 0
+
+    item_frames = []
+    # Versões em ordem de uso (as linhas vêm por id): o nome exibido de cada item é o da versão mais recente
+    versions = sorted(frame.groupby('catalogo').indices.items(), key=lambda item: item[1][-1])
+    for versao, positions in versions:
+        names, codes, item_codes = catalogs[versao]
+        matrix = status_matrix(frame['statuses'].iloc[positions].tolist(), len(names))
+
+        nc_numbers = [codes.index(code) + 1 for code in nonconforming if code in codes]
+        na_number = codes.index(na_code) + 1 if na_code in codes else 0
+        nc = np.isin(matrix, nc_numbers)
+        assessed = (matrix > 0) & (matrix != na_number)
+
+        frame.iloc[positions, frame.columns.get_loc('nao_conformes')] = nc.sum(axis=1)
+        frame.iloc[positions, frame.columns.get_loc('avaliados')] = assessed.sum(axis=1)
+        item_frames.append(pd.DataFrame({
+            'codigo': item_codes,
+            'item': names,
+            'nao_conformes': nc.sum(axis=0),
+            'avaliados': assessed.sum(axis=0),
+        }))
+
+    # Um item (mesmo código) em várias versões do catálogo é somado, mesmo se foi renomeado
+    if item_frames:
+        itens = pd.concat(item_frames).groupby('codigo', sort=False).agg(
+            item=('item', 'last'),
+            nao_conformes=('nao_conformes', 'sum'),
+            avaliados=('avaliados', 'sum'),
+        ).set_index('item')
+    else:
+        itens = pd.DataFrame(columns=['nao_conformes', 'avaliados'])
+    itens['taxa_nc'] = itens['nao_conformes'] / itens['avaliados'].where(itens['avaliados'] > 0)
+    itens = itens.sort_values(['taxa_nc', 'nao_conformes'], ascending=False)
+
+    dated = frame.dropna(subset=['data'])
+    semanal = dated.groupby(dated['data'].dt.to_period('W').dt.start_time).agg(
+        inspecoes=('id', 'size'),
+        reprovadas=('reprovada', 'sum'),
+        nao_conformes=('nao_conformes', 'sum'),
+        avaliados=('avaliados', 'sum'),
+    )
+    semanal.index.name = 'semana'
+    semanal['taxa_nc'] = semanal['nao_conformes'] / semanal['avaliados'].where(semanal['avaliados'] > 0)
+
+    return {
+        'inspecoes': len(frame),
+        'itens': itens,
+        'veiculos': _ranking(frame, 'placa'),
+        'colaboradores': _ranking(frame, 'colaborador'),
+        'semanal': semanal,
+    }
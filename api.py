@@ -0,0 +1,467 @@
+"""API HTTP para enviar inspeções e buscar os PDFs sem passar pela interface.
+
+Uso pela linha de comando (grava no banco de ``CHECKLIST_DB``):
+
+    python api.py --porta 8502 -w 4
+
+ou junto com o app do Streamlit, definindo ``CHECKLIST_API_PORT``. Rotas:
+
+- ``POST /inspecoes``: uma inspeção em JSON; valida, grava e responde o PDF
+  (``?pdf=0`` responde só o JSON com o id)
+- ``POST /inspecoes/lote``: lista de inspeções; grava as válidas numa
+  transação e responde o resultado de cada uma em JSON, ou um ZIP com os PDFs
+  em fluxo (``?formato=zip``)
+- ``GET /inspecoes/<id>`` e ``GET /inspecoes/<id>/pdf``
+- ``GET /catalogos/<tipo>``: itens (código, nome, categoria) e status aceitos
+
+Corpo de uma inspeção, como no ``batch_pdf``::
+
+    {"tipo": "epc", "itens": {"EPC-001": "A", "Extintor": "B"}, "info_data": {"data": "01/03/2025", ...}}
+
+Toda requisição precisa do cabeçalho ``Authorization: Bearer <token>`` com o
+token de ``CHECKLIST_API_TOKEN`` (sem ele a resposta é 401, e a API não sobe
+sem o token definido). O servidor escuta só em 127.0.0.1 por padrão; use
+``--host`` para expor na rede, de preferência atrás de um proxy com TLS.
+
+Os itens vão pelo código estável ou pelo nome. Os PDFs saem do pool de
+processos da ``PdfJobQueue`` (e do cache de PDFs). Toda resposta traz o
+tempo de cada etapa no cabeçalho ``Server-Timing`` (e em ``tempos`` nas
+respostas JSON).
+"""
+import argparse
+import contextlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from http import HTTPStatus
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, make_server
+
+from metrics import timed
+from storage import INFO_COLUMNS
+
+API_PORT = int(os.environ.get('CHECKLIST_API_PORT', '0'))
+
+# Token exigido em ``Authorization: Bearer ...`` (vazio = a API não sobe)
+API_TOKEN = os.environ.get('CHECKLIST_API_TOKEN', '')
+
+# Limites de uma requisição
+MAX_BODY_BYTES = 10 * 1024 * 1024
+MAX_BATCH = 500
+
+
+class ApiError(Exception):
+    """Erro que vira resposta JSON ``{"erro": ...}`` com o status HTTP"""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _parse_date(value):
+    """'dd/mm/aaaa' ou 'aaaa-mm-dd' -> 'dd/mm/aaaa' (formato do formulário); None se inválida"""
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).strftime('%d/%m/%Y')
+        except ValueError:
+            pass
+    return None
+
+
+def validate_inspection(payload, specs, resultados=None):
+    """Confere uma inspeção recebida contra os catálogos.
+
+    Retorna ``(registro, erros)``: ``registro`` no formato de
+    ``InspectionStore.save_many`` (``data`` como {item: status} no catálogo
+    atual) ou None quando há erros.
+    """
+    if not isinstance(payload, dict):
+        return None, ["a inspeção deve ser um objeto JSON"]
+    tipo = str(payload.get('tipo') or '').lower()
+    spec = specs.get(tipo)
+    if spec is None:
+        return None, [f'tipo inválido: "{tipo}" (use {"/".join(specs)})']
+
+    erros = []
+    info = payload.get('info_data') or {}
+    if not isinstance(info, dict):
+        info = {}
+        erros.append("info_data deve ser um objeto")
+    info_data = {field: str(info.get(field) or '').strip() for field in INFO_COLUMNS}
+    if not info_data['responsavel']:
+        erros.append("responsável obrigatório")
+    if not info_data['data']:
+        erros.append("data obrigatória")
+    else:
+        data = _parse_date(info_data['data'])
+        if data is None:
+            erros.append(f'data inválida: "{info_data["data"]}"')
+        info_data['data'] = data
+    if resultados and info_data['resultado'] and info_data['resultado'] not in resultados:
+        erros.append(f'resultado inválido: "{info_data["resultado"]}"')
+
+    itens = payload.get('itens', payload.get('data')) or {}
+    if not isinstance(itens, dict):
+        return None, erros + ["itens deve ser um objeto {item: status}"]
+    names = dict(zip(spec.catalog.item_codes, spec.item_names))
+    data = {}
+    unknown, invalid = [], []
+    for item, status in itens.items():
+        name = item if item in spec.item_ids else names.get(item)
+        status = str(status or '').strip().upper()
+        if name is None:
+            unknown.append(item)
+        elif status and status not in spec.status_codes:
+            invalid.append(item)
+        elif status:
+            data[name] = status
+    if unknown:
+        erros.append(f"itens desconhecidos no {spec.name}: {', '.join(unknown)}")
+    if invalid:
+        erros.append(f"status inválido (use {'/'.join(spec.status_codes)}) em: {', '.join(invalid)}")
+    if not data and not unknown and not invalid:
+        erros.append("nenhum item preenchido")
+
+    if erros:
+        return None, erros
+    return {'tipo': tipo, 'data': data, 'info_data': info_data}, []
+
+
+class Timings:
+    """Tempo de cada etapa de uma requisição (também nas métricas como ``api_<etapa>``)"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with timed(f"api_{name}"):
+                yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        """{etapa: milissegundos}"""
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+
+    def header(self):
+        return ', '.join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+class ChecklistApi:
+    """Aplicação WSGI da API.
+
+    Recebe as dependências prontas, como o app do Streamlit as tem:
+    ``archived_pdfs(store, headers, queue)`` produz ``(header, pdf, erro)``
+    (ver ``checklistepiepc.iter_archived_pdfs``). Todas as rotas exigem o
+    ``token`` no cabeçalho ``Authorization: Bearer``.
+    """
+
+    ROUTES = (
+        ('POST', re.compile(r'/inspecoes/?$'), 'submit'),
+        ('POST', re.compile(r'/inspecoes/lote/?$'), 'submit_batch'),
+        ('GET', re.compile(r'/inspecoes/(\d+)/?$'), 'inspection'),
+        ('GET', re.compile(r'/inspecoes/(\d+)/pdf/?$'), 'inspection_pdf'),
+        ('GET', re.compile(r'/catalogos/(\w+)/?$'), 'catalog'),
+    )
+
+    def __init__(self, store, queue, specs, archived_pdfs, resultados=None, token=API_TOKEN):
+        if not token:
+            raise ValueError("defina CHECKLIST_API_TOKEN: a API não aceita requisições sem token")
+        self.token = token
+        self.store = store
+        self.queue = queue
+        self.specs = specs
+        self.archived_pdfs = archived_pdfs
+        self.resultados = resultados
+
+    def __call__(self, environ, start_response):
+        timings = Timings()
+        method = environ['REQUEST_METHOD']
+        path = environ.get('PATH_INFO') or '/'
+        query = {name: values[-1] for name, values in parse_qs(environ.get('QUERY_STRING', '')).items()}
+        try:
+            self._authorize(environ)
+            allowed = []
+            for route_method, pattern, handler in self.ROUTES:
+                match = pattern.match(path)
+                if match is None:
+                    continue
+                if route_method != method:
+                    allowed.append(route_method)
+                    continue
+                with timed('api_request'):
+                    status, headers, body = getattr(self, handler)(environ, query, timings, *match.groups())
+                break
+            else:
+                if allowed:
+                    raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"use {', '.join(allowed)} em {path}")
+                raise ApiError(HTTPStatus.NOT_FOUND, f"rota não encontrada: {path}")
+        except ApiError as e:
+            status, headers, body = self._json(e.status, {'erro': str(e), **e.extra}, timings)
+            if e.status == HTTPStatus.UNAUTHORIZED:
+                headers.append(('WWW-Authenticate', 'Bearer'))
+
+        headers.append(('Server-Timing', timings.header()))
+        start_response(f"{status.value} {status.phrase}", headers)
+        return body
+
+    def _authorize(self, environ):
+        scheme, _, token = environ.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "token ausente ou inválido (Authorization: Bearer <token>)")
+
+    # Respostas
+
+    @staticmethod
+    def _json(status, content, timings=None):
+        if timings is not None and isinstance(content, dict):
+            content = {**content, 'tempos': timings.as_dict()}
+        body = json.dumps(content, ensure_ascii=False).encode()
+        return status, [('Content-Type', 'application/json; charset=utf-8'),
+                        ('Content-Length', str(len(body)))], [body]
+
+    @staticmethod
+    def _pdf(pdf, filename, extra_headers=()):
+        return HTTPStatus.OK, [('Content-Type', 'application/pdf'), ('Content-Length', str(len(pdf))),
+                               ('Content-Disposition', f'attachment; filename="{filename}"'),
+                               *extra_headers], [pdf]
+
+    def _read_json(self, environ, timings):
+        with timings.stage('ler'):
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+            if length > MAX_BODY_BYTES:
+                raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"corpo maior que {MAX_BODY_BYTES} bytes")
+            try:
+                return json.loads(environ['wsgi.input'].read(length) or b'null')
+            except ValueError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"JSON inválido: {e}") from None
+
+    def _render(self, headers, timings):
+        """PDFs das inspeções gravadas de ``headers`` pelo pool (``(header, pdf, erro)``, na ordem)"""
+        with timings.stage('pdf'):
+            return list(self.archived_pdfs(self.store, headers, self.queue))
+
+    # Rotas
+
+    def submit(self, environ, query, timings):
+        payload = self._read_json(environ, timings)
+        with timings.stage('validar'):
+            registro, erros = validate_inspection(payload, self.specs, self.resultados)
+        if erros:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, "inspeção inválida", erros=erros)
+        with timings.stage('gravar'):
+            inspection_id = self.store.save_many([registro])[0]
+        location = ('Location', f"/inspecoes/{inspection_id}/pdf")
+        if query.get('pdf') == '0':
+            status, headers, body = self._json(HTTPStatus.CREATED, {'id': inspection_id, 'pdf': location[1]},
+                                               timings)
+            return status, headers + [location], body
+
+        header = {'id': inspection_id, 'tipo': registro['tipo'], 'info_data': registro['info_data']}
+        (_, pdf, erro), = self._render([header], timings)
+        if pdf is None:
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, f"inspeção gravada, mas o PDF falhou: {erro}",
+                           id=inspection_id)
+        from pdf_export import archive_name
+        _, headers, body = self._pdf(pdf, archive_name(header), [location, ('X-Inspecao-Id', str(inspection_id))])
+        return HTTPStatus.CREATED, headers, body
+
+    def submit_batch(self, environ, query, timings):
+        payload = self._read_json(environ, timings)
+        if isinstance(payload, dict):
+            payload = payload.get('inspecoes')
+        if not isinstance(payload, list) or not payload:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "envie uma lista de inspeções (ou {\"inspecoes\": [...]})")
+        if len(payload) > MAX_BATCH:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"no máximo {MAX_BATCH} inspeções por lote")
+
+        with timings.stage('validar'):
+            results = []
+            registros = []
+            for indice, item in enumerate(payload):
+                registro, erros = validate_inspection(item, self.specs, self.resultados)
+                results.append({'indice': indice, 'erros': erros} if erros else {'indice': indice})
+                if registro is not None:
+                    registros.append((indice, registro))
+        if not registros:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, "nenhuma inspeção válida", resultados=results)
+
+        with timings.stage('gravar'):
+            ids = self.store.save_many([registro for _, registro in registros])
+        headers = []
+        by_id = {}
+        for (indice, registro), inspection_id in zip(registros, ids):
+            results[indice].update(id=inspection_id, pdf=f"/inspecoes/{inspection_id}/pdf")
+            headers.append({'id': inspection_id, 'tipo': registro['tipo'], 'info_data': registro['info_data']})
+            by_id[inspection_id] = results[indice]
+
+        if query.get('formato') == 'zip':
+            # O ZIP sai em pedaços enquanto o pool gera os PDFs seguintes
+            from pdf_export import ZipExport
+            export = ZipExport(self.archived_pdfs(self.store, headers, self.queue))
+            return HTTPStatus.OK, [('Content-Type', 'application/zip'),
+                                   ('Content-Disposition', 'attachment; filename="inspecoes.zip"'),
+                                   ('X-Inspecao-Ids', ','.join(map(str, ids)))], export
+
+        # Sem ZIP os PDFs já vão para o pool: o GET de cada um sai do cache
+        if query.get('pdf') != '0':
+            for header, pdf, erro in self._render(headers, timings):
+                if pdf is None:
+                    by_id[header['id']]['erro_pdf'] = erro
+        return self._json(HTTPStatus.CREATED, {'gravadas': len(ids), 'com_erro': len(payload) - len(ids),
+                                               'resultados': results}, timings)
+
+    def _header(self, inspection_id):
+        record = self.store.get(int(inspection_id))
+        if record is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"inspeção {inspection_id} não encontrada")
+        return record
+
+    def inspection(self, environ, query, timings, inspection_id):
+        with timings.stage('ler'):
+            record = self._header(inspection_id)
+        content = {field: record[field] for field in ('id', 'tipo', 'info_data', 'criado_em')}
+        return self._json(HTTPStatus.OK, {**content, 'itens': record['por_codigo']}, timings)
+
+    def inspection_pdf(self, environ, query, timings, inspection_id):
+        with timings.stage('ler'):
+            record = self._header(inspection_id)
+        (header, pdf, erro), = self._render([record], timings)
+        if pdf is None:
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, f"PDF da inspeção {inspection_id} falhou: {erro}")
+        from pdf_export import archive_name
+        return self._pdf(pdf, archive_name(header))
+
+    def catalog(self, environ, query, timings, tipo):
+        spec = self.specs.get(tipo.lower())
+        if spec is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"tipo desconhecido: {tipo}")
+        catalog = spec.catalog
+        itens = [{'codigo': code, 'nome': name, 'categoria': categoria}
+                 for code, name, categoria in zip(catalog.item_codes, catalog.item_names, catalog.item_categories)]
+        return self._json(HTTPStatus.OK, {'tipo': spec.key, 'versao': catalog.label, 'status': spec.status_codes,
+                                          'legenda': spec.legend, 'itens': itens})
+
+
+class Response:
+    """Resposta do ``Client``: ``status`` (int), ``headers`` (dict) e ``body`` (bytes)"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class Client:
+    """Chama a aplicação WSGI no próprio processo, sem servidor (testes e scripts)
+
+    Com ``token``, envia ``Authorization: Bearer <token>`` em toda requisição.
+    """
+
+    def __init__(self, app, token=None):
+        self.app = app
+        self.token = token
+
+    def request(self, method, path, json_body=None, headers=None, body=None):
+        """``json_body`` é serializado como JSON; ``body`` envia bytes como estão"""
+        path, _, query = path.partition('?')
+        if body is None:
+            body = json.dumps(json_body).encode() if json_body is not None else b''
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body), 'wsgi.errors': sys.stderr, 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False, 'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': 'application/json',
+        }
+        if self.token is not None:
+            environ['HTTP_AUTHORIZATION'] = f"Bearer {self.token}"
+        for name, value in (headers or {}).items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = dict(response_headers)
+
+        chunks = self.app(environ, start_response)
+        try:
+            body = b''.join(chunks)
+        finally:
+            getattr(chunks, 'close', lambda: None)()
+        return Response(started['status'], started['headers'], body)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, json_body=None, **kwargs):
+        return self.request('POST', path, json_body, **kwargs)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def serve(app, port=API_PORT, host='127.0.0.1', background=True):
+    """Sobe a API (numa thread daemon com ``background``) e retorna o servidor (None sem porta)"""
+    if not port:
+        return None
+    server = make_server(host, port, app, server_class=_ThreadingWSGIServer)
+    if background:
+        threading.Thread(target=server.serve_forever, name='api', daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+def main(argv=None):
+    from checklistepiepc import RESULTADO_OPTIONS, SPECS, iter_archived_pdfs
+    from pdf_cache import PdfCache
+    from pdf_jobs import DEFAULT_WORKERS, PdfJobQueue
+    from state_backend import open_backend
+    from storage import DEFAULT_DB_PATH, InspectionStore
+
+    parser = argparse.ArgumentParser(description="API HTTP de inspeções EPC/EPI")
+    parser.add_argument('--host', default='127.0.0.1', help="endereço (padrão: só local; 0.0.0.0 expõe na rede)")
+    parser.add_argument('-p', '--porta', type=int, default=API_PORT or 8502, help="porta (padrão: 8502)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="banco de inspeções")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="processos que geram os PDFs (padrão: número de núcleos)")
+    args = parser.parse_args(argv)
+    if not API_TOKEN:
+        parser.error("defina CHECKLIST_API_TOKEN com o token que os clientes vão enviar")
+
+    shared = open_backend()
+    queue = PdfJobQueue(workers=args.workers or DEFAULT_WORKERS,
+                        cache=PdfCache(backend=shared and shared.namespace('pdf')))
+    app = ChecklistApi(InspectionStore(args.db, SPECS), queue, SPECS, iter_archived_pdfs,
+                       resultados=RESULTADO_OPTIONS)
+    print(f"API em http://{args.host}:{args.porta}", file=sys.stderr)
+    try:
+        serve(app, args.porta, args.host, background=False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Cache compartilhado da logo da empresa.
+
+A logo é lida do disco uma vez e guardada já nos formatos usados pelo app:
+bytes originais, variante reduzida em base64 para o cabeçalho da página e
+um ``ImageReader`` pré-decodificado (também reduzido) para os PDFs. O cache
+é invalidado quando o arquivo muda (mtime/tamanho) ou o caminho configurado
+muda.
+
+O caminho vem da variável de ambiente ``CHECKLIST_LOGO``; o padrão é a logo
+que acompanha o repositório. Pillow e ReportLab só são importados quando
+uma variante é gerada pela primeira vez.
+"""
+import base64
+import io
+import os
+import threading
+
+from metrics import timed
+
+DEFAULT_LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__sitelogo__Logo Rezende.png')
+
+# Altura da variante web (2x os 60px exibidos, para telas de alta densidade)
+WEB_LOGO_HEIGHT = 120
+# Maior lado da variante do PDF: ~300 dpi na caixa de 2 x 1 polegadas
+PDF_LOGO_SIZE = 600
+
+
+def logo_path():
+    """Caminho configurado da logo (``CHECKLIST_LOGO`` ou a logo do repositório)"""
+    return os.environ.get('CHECKLIST_LOGO') or DEFAULT_LOGO_PATH
+
+
+def _resized_png(image, size):
+    """PNG de ``image`` reduzido para caber em ``size`` (largura, altura), mantendo a proporção"""
+    from PIL import Image
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class LogoAsset:
+    """Uma versão da logo já carregada; as variantes são geradas na primeira vez que são pedidas"""
+
+    def __init__(self, path, stamp, raw):
+        self.path = path
+        self.stamp = stamp
+        self.raw = raw
+        self._lock = threading.Lock()
+        self._image = None
+        self._web_base64 = None
+        self._pdf_reader = None
+
+    @property
+    def token(self):
+        """Identifica a versão do arquivo (para chavear caches derivados, como o fundo do PDF)"""
+        return (self.path, self.stamp)
+
+    def _decoded(self):
+        if self._image is None:
+            from PIL import Image
+            image = Image.open(io.BytesIO(self.raw))
+            image.load()
+            self._image = image
+        return self._image
+
+    @property
+    def web_base64(self):
+        """PNG reduzido para o cabeçalho da página, em base64"""
+        with self._lock:
+            if self._web_base64 is None:
+                with timed('logo_web'):
+                    image = self._decoded()
+                    png = _resized_png(image, (image.width, WEB_LOGO_HEIGHT))
+                    self._web_base64 = base64.b64encode(png).decode()
+            return self._web_base64
+
+    @property
+    def pdf_reader(self):
+        """ImageReader reduzido e já decodificado, compartilhado por todos os PDFs"""
+        with self._lock:
+            if self._pdf_reader is None:
+                from reportlab.lib.utils import ImageReader
+                with timed('logo_pdf'):
+                    png = _resized_png(self._decoded(), (PDF_LOGO_SIZE, PDF_LOGO_SIZE))
+                    reader = ImageReader(io.BytesIO(png))
+                    reader.getRGBData()  # decodifica agora, não no primeiro PDF
+                self._pdf_reader = reader
+            return self._pdf_reader
+
+
+_cache_lock = threading.Lock()
+_cached = None
+
+
+def get_logo():
+    """LogoAsset do caminho configurado, recarregado só se o arquivo mudou; None se indisponível"""
+    global _cached
+    path = logo_path()
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _cache_lock:
+        if _cached is not None and _cached.token == (path, stamp):
+            return _cached
+        try:
+            with timed('logo_load'), open(path, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return None
+        _cached = LogoAsset(path, stamp, raw)
+        return _cached
@@ -0,0 +1,150 @@
+"""Geração em lote (headless) dos PDFs de checklist EPC/EPI.
+
+Uso pela linha de comando:
+
+    python batch_pdf.py inspecoes.jsonl -o pdfs/ -w 8
+
+Cada registro JSONL tem o formato
+``{"tipo": "epc", "data": {item: status}, "info_data": {...}}``.
+No CSV cada linha é uma inspeção: coluna ``tipo``, os campos de
+``info_data`` (local, data, empresa, ...) e uma coluna por item do checklist.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from checklistepiepc import SPECS, create_pdf
+from storage import INFO_COLUMNS
+
+
+def load_records(path):
+    """Lê os registros (tipo, data, info_data) de um arquivo CSV ou JSONL"""
+    if path.lower().endswith('.csv'):
+        return list(_read_csv(path))
+    return list(_read_jsonl(path))
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield {
+                'tipo': record.get('tipo', 'epc').lower(),
+                'data': record.get('data', {}),
+                'info_data': record.get('info_data', {}),
+            }
+
+
+def _read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            tipo = (row.pop('tipo', '') or 'epc').lower()
+            info_data = {campo: row.pop(campo, '') or '' for campo in INFO_COLUMNS}
+            data = {item: status.strip() for item, status in row.items() if item and status and status.strip()}
+            yield {'tipo': tipo, 'data': data, 'info_data': info_data}
+
+
+def invalid_tipos(records):
+    """Mensagens dos registros cujo ``tipo`` não está em ``SPECS`` (mesmo formato dos erros de geração)"""
+    validos = ', '.join(SPECS)
+    return [f"registro {index} ({record['tipo']}): tipo inválido; use {validos}"
+            for index, record in enumerate(records, start=1) if record['tipo'] not in SPECS]
+
+
+def pdf_filename(index, tipo, info_data):
+    """Nome do arquivo no mesmo padrão do download da interface, prefixado pelo índice do lote"""
+    data = info_data.get('data', '')
+    try:
+        data = datetime.strptime(data, '%d/%m/%Y').strftime('%Y%m%d')
+    except ValueError:
+        data = data.replace('/', '')
+    colaborador = info_data.get('colaborador', '')
+    colaborador = colaborador.replace(' ', '_') if colaborador else 'Usuario'
+    return f"{index:05d}_Checklist_{tipo.upper()}_{data}_{colaborador}.pdf"
+
+
+def _render_one(job):
+    """Executado no processo filho: gera um PDF e grava no diretório de saída"""
+    index, record, output_dir, overlay = job
+    tipo = record['tipo']
+    try:
+        buffer = create_pdf(SPECS[tipo], record['data'], record['info_data'], overlay=overlay)
+        filename = pdf_filename(index, tipo, record['info_data'])
+        with open(os.path.join(output_dir, filename), 'wb') as f:
+            f.write(buffer.getvalue())
+        return filename, None
+    except Exception as e:
+        return None, f"registro {index} ({tipo}): {e}"
+
+
+def render_batch(records, output_dir, workers=None, overlay=False):
+    """Gera os PDFs de ``records`` em paralelo e grava em ``output_dir``.
+
+    ``workers`` padrão é o número de núcleos; ``workers=1`` roda no próprio processo.
+    ``overlay=True`` usa o fundo estático em cache (montado uma vez por processo).
+    Retorna um dicionário com os arquivos gerados, erros e a vazão em PDFs/s.
+    """
+    records = list(records)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    jobs = [(index, record, output_dir, overlay) for index, record in enumerate(records, start=1)]
+
+    start = time.perf_counter()
+    if workers == 1 or len(jobs) <= 1:
+        results = [_render_one(job) for job in jobs]
+    else:
+        # Lotes maiores reduzem o custo de IPC sem desbalancear os processos
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_render_one, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    arquivos = [filename for filename, error in results if filename]
+    erros = [error for filename, error in results if error]
+    return {
+        'total': len(records),
+        'arquivos': arquivos,
+        'erros': erros,
+        'workers': workers,
+        'segundos': elapsed,
+        'pdfs_por_segundo': len(arquivos) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera PDFs de checklist EPC/EPI em lote")
+    parser.add_argument('entrada', help="arquivo CSV ou JSONL com as inspeções")
+    parser.add_argument('-o', '--saida', default='pdfs', help="diretório de saída (padrão: pdfs)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="número de processos (padrão: número de núcleos)")
+    parser.add_argument('--overlay', action='store_true',
+                        help="desenha só os dados sobre o fundo estático em cache (mais rápido)")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.entrada)
+    erros = invalid_tipos(records)
+    if erros:
+        for erro in erros:
+            print(f"ERRO {erro}", file=sys.stderr)
+        print(f"nenhum PDF gerado: {len(erros)} de {len(records)} registros com tipo inválido", file=sys.stderr)
+        return 1
+
+    resultado = render_batch(records, args.saida, workers=args.workers, overlay=args.overlay)
+
+    for erro in resultado['erros']:
+        print(f"ERRO {erro}", file=sys.stderr)
+    print(f"{len(resultado['arquivos'])}/{resultado['total']} PDFs em {resultado['segundos']:.2f}s "
+          f"com {resultado['workers']} processos ({resultado['pdfs_por_segundo']:.1f} PDFs/s)")
+    return 1 if resultado['erros'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
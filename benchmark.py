@@ -0,0 +1,292 @@
+"""Benchmarks dos caminhos críticos do checklist.
+
+Uso:
+
+    python benchmark.py -o benchmark.json
+
+Além do resumo no terminal, grava todos os resultados num JSON (com versões
+do Python e das dependências) para comparar entre releases.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from importlib import metadata
+
+import checklistepiepc as app
+from catalogs import Catalog
+
+
+def _timeit(fn, repeat):
+    """Executa ``fn`` ``repeat`` vezes e retorna a mediana em milissegundos"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _percentile(samples, q):
+    """Percentil ``q`` (0-100) por interpolação entre as amostras ordenadas"""
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1] if len(samples) > 1 else samples[0]
+
+
+def _measure(fn, repeat):
+    """Mediana e p95 (ms) de ``repeat`` execuções e pico de memória (KiB) de uma execução extra"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'mediana_ms': statistics.median(samples), 'p95_ms': _percentile(samples, 95),
+            'pico_memoria_kib': peak / 1024}
+
+
+def scaled_spec(spec, factor):
+    """Cópia da spec com o catálogo multiplicado por ``factor`` (cada item repetido com sufixo)"""
+    if factor == 1:
+        return spec
+    categories = {
+        categoria: [f"{item} #{copy}" if copy else item for copy in range(factor) for item in itens]
+        for categoria, itens in spec.categories.items()
+    }
+    return app.ChecklistSpec(
+        key=spec.key, name=spec.name, catalog=Catalog(spec.key, f"x{factor}", categories),
+        statuses=spec.statuses, legend=spec.legend,
+        pdf_title=spec.pdf_title, section_title=spec.section_title, header_layout=spec.header_layout,
+        cat_col_widths=spec.cat_col_widths, badges=spec.badges, nonconforming=spec.nonconforming,
+        prefill_field=spec.prefill_field,
+    )
+
+
+def _sample_inspection(spec, rng):
+    """Inspeção preenchida com status aleatórios (mesma semente, mesmos dados)"""
+    data = {item: rng.choice(spec.status_codes) for item in spec.item_names}
+    info_data = {'local': 'Base', 'data': '01/01/2026', 'empresa': 'Rezende Energia', 'placa': 'ABC1D23',
+                 'colaborador': 'Benchmark', 'responsavel': 'Benchmark', 'resultado': 'Aprovado',
+                 'observacoes': 'Sem observações'}
+    return data, info_data
+
+
+def bench_pdf(repeat=10, factors=(1, 10)):
+    """Latência e pico de memória do PDF (platypus e overlay) com o catálogo real e multiplicado"""
+    rng = random.Random(0)
+    results = {}
+    for tipo, spec in app.SPECS.items():
+        for factor in factors:
+            scaled = scaled_spec(spec, factor)
+            data, info_data = _sample_inspection(scaled, rng)
+            app.create_pdf(scaled, data, info_data)  # aquece template, logo e fundo do overlay
+            app.create_pdf(scaled, data, info_data, overlay=True)
+            results[f"{tipo}_x{factor}"] = {
+                'itens': scaled.total_items(),
+                'platypus': _measure(lambda: app.create_pdf(scaled, data, info_data), repeat),
+                'overlay': _measure(lambda: app.create_pdf(scaled, data, info_data, overlay=True), repeat),
+            }
+    return results
+
+
+def bench_stats(repeat=200, factors=(1, 10), inspecoes=10000):
+    """Contadores por status (vetor da aba) e relatório da frota sobre ``inspecoes`` inspeções"""
+    from analytics import build_report
+
+    rng = random.Random(0)
+    results = {}
+    for tipo, spec in app.SPECS.items():
+        for factor in factors:
+            scaled = scaled_spec(spec, factor)
+            statuses = scaled.encode(_sample_inspection(scaled, rng)[0])
+            results[f"{tipo}_x{factor}"] = {
+                'itens': scaled.total_items(),
+                'contadores': _measure(lambda: scaled.count_statuses(statuses), repeat),
+            }
+
+        blobs = [bytes(rng.choices(range(len(spec.status_codes) + 1), k=spec.total_items()))
+                 for _ in range(inspecoes)]
+        rows = [(index, f"2026-{index % 12 + 1:02d}-{index % 28 + 1:02d}", f"P{index % 200}", '',
+                 f"C{index % 400}", rng.choice(app.RESULTADO_OPTIONS), spec.version, blob)
+                for index, blob in enumerate(blobs)]
+        catalogs = {spec.version: (spec.item_names, tuple(spec.status_codes), spec.catalog.item_codes)}
+        results[f"{tipo}_frota"] = {
+            'inspecoes': inspecoes,
+            'relatorio': _measure(lambda: build_report(rows, catalogs, spec.nonconforming), 5),
+        }
+    return results
+
+
+def bench_pdf_template(repeat=30):
+    """PDF completo remontando o template a cada chamada x com o template em cache"""
+    results = {}
+    for tipo, items, render in (('epc', app.get_epc_items(), app.create_pdf_epc),
+                                ('epi', app.get_epi_items(), app.create_pdf_epi)):
+        template = app.get_pdf_template(tipo)
+        statuses = list(template.status_columns)
+        all_items = [item for itens in items.values() for item in itens]
+        data = {item: statuses[i % len(statuses)] for i, item in enumerate(all_items)}
+        info_data = {'local': 'Base', 'data': '01/01/2026', 'colaborador': 'Benchmark', 'responsavel': 'Benchmark'}
+
+        def render_uncached():
+            app.get_pdf_template.cache_clear()
+            render(data, info_data)
+
+        uncached_ms = _timeit(render_uncached, repeat)
+        render(data, info_data)  # aquece o cache do template
+        cached_ms = _timeit(lambda: render(data, info_data), repeat)
+        results[tipo] = {
+            'sem_cache_ms': uncached_ms,
+            'com_cache_ms': cached_ms,
+            'economia_ms': uncached_ms - cached_ms,
+        }
+    return results
+
+
+def _fragment_script(tipo):
+    """Script mínimo com só o corpo em fragmento de uma aba (o que roda a cada toque num status)"""
+    import checklistepiepc as app
+    app.render_checklist_body(app.SPECS[tipo])
+
+
+def bench_rerun(repeat=5):
+    """Latência de rerun após mudar um status: script inteiro (antes) x fragmento da aba (depois).
+
+    O AppTest sempre reexecuta o script todo, então o "depois" é medido rodando
+    apenas o corpo do fragmento, que é o que o Streamlit reexecuta de fato.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    full = AppTest.from_file(app.__file__, default_timeout=120)
+    full.run()
+
+    results = {}
+    for tipo, spec in app.SPECS.items():
+        fragment = AppTest.from_function(_fragment_script, args=(tipo,), default_timeout=120)
+        fragment.run()
+
+        key = f"{tipo}_0"
+        toggles = itertools.cycle(spec.status_codes)
+
+        def change_status(at):
+            at.selectbox(key=key).set_value(next(toggles))
+            at.run()
+
+        results[tipo] = {
+            'script_ms': _timeit(lambda: change_status(full), repeat),
+            'fragmento_ms': _timeit(lambda: change_status(fragment), repeat),
+        }
+    return results
+
+
+# Roda num interpretador novo: mede o import a frio e o primeiro run do script (primeira pintura)
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import checklistepiepc
+imported = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(checklistepiepc.__file__, default_timeout=120)
+run_start = time.perf_counter()
+at.run()
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'primeiro_run_ms': (done - run_start) * 1000,
+    'reportlab_carregado': 'reportlab.platypus' in sys.modules,
+    'pandas_carregado': 'pandas' in sys.modules,
+}))
+"""
+
+
+def bench_startup(repeat=3):
+    """Partida a frio: import do módulo do app e primeiro run do script, cada amostra num processo novo"""
+    env = dict(os.environ, CHECKLIST_DB=os.environ.get('CHECKLIST_DB', ':memory:'))
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(app.__file__)), env=env).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'import_ms': statistics.median(s['import_ms'] for s in samples),
+        'primeiro_run_ms': statistics.median(s['primeiro_run_ms'] for s in samples),
+        'reportlab_carregado': any(s['reportlab_carregado'] for s in samples),
+        'pandas_carregado': any(s['pandas_carregado'] for s in samples),
+    }
+
+
+def environment():
+    """Máquina, Python e versões das dependências, para comparar resultados entre releases"""
+    versions = {}
+    for package in ('streamlit', 'reportlab', 'pandas', 'numpy', 'pillow'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count(),
+        'versoes': versions,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do checklist EPC/EPI")
+    parser.add_argument('-o', '--saida', default='benchmark.json', help="arquivo JSON com os resultados")
+    parser.add_argument('--repeat', type=int, default=10, help="repetições por medida de PDF (padrão: 10)")
+    args = parser.parse_args(argv)
+
+    results = {'ambiente': environment()}
+
+    print("Partida a frio (mediana)")
+    r = results['partida'] = bench_startup()
+    print(f"  import {r['import_ms']:.0f} ms | primeiro run {r['primeiro_run_ms']:.0f} ms "
+          f"| ReportLab carregado: {'sim' if r['reportlab_carregado'] else 'não'} "
+          f"| pandas carregado: {'sim' if r['pandas_carregado'] else 'não'}")
+
+    print("PDF por tamanho de catálogo (mediana / p95 / pico de memória)")
+    results['pdf'] = bench_pdf(args.repeat)
+    for name, r in results['pdf'].items():
+        for mode in ('platypus', 'overlay'):
+            m = r[mode]
+            print(f"  {name.upper()} ({r['itens']} itens) {mode}: {m['mediana_ms']:.1f} / {m['p95_ms']:.1f} ms "
+                  f"| {m['pico_memoria_kib']:.0f} KiB")
+
+    print("PDF - template pré-compilado (mediana por PDF)")
+    results['pdf_template'] = bench_pdf_template(args.repeat)
+    for tipo, r in results['pdf_template'].items():
+        print(f"  {tipo.upper()}: sem cache {r['sem_cache_ms']:.1f} ms | com cache {r['com_cache_ms']:.1f} ms "
+              f"| economia {r['economia_ms']:.1f} ms")
+
+    print("Estatísticas (mediana)")
+    results['estatisticas'] = bench_stats()
+    for name, r in results['estatisticas'].items():
+        if 'contadores' in r:
+            print(f"  {name.upper()} ({r['itens']} itens) contadores: {r['contadores']['mediana_ms'] * 1000:.1f} µs")
+        else:
+            print(f"  {name.upper()} ({r['inspecoes']} inspeções) relatório: {r['relatorio']['mediana_ms']:.0f} ms")
+
+    print("Rerun após mudar um status (mediana)")
+    results['rerun'] = bench_rerun()
+    for tipo, r in results['rerun'].items():
+        print(f"  {tipo.upper()}: script inteiro {r['script_ms']:.0f} ms | fragmento {r['fragmento_ms']:.0f} ms")
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Importação em lote de inspeções digitadas em planilha (CSV ou XLSX).
+
+Uso pela linha de comando (grava no banco de ``CHECKLIST_DB``):
+
+    python bulk_import.py planilha.xlsx -e erros.csv
+    python bulk_import.py planilha.csv --tipo epi --validar
+
+Uma linha por inspeção: coluna ``tipo`` (epc/epi), os campos do cabeçalho
+(local, data, empresa, placa, ...) e uma coluna por item do checklist com o
+status. A validação roda por coluna sobre a planilha inteira, sem laço por
+linha: tipo, status válidos para o tipo, pelo menos um item preenchido,
+responsável obrigatório, data e itens desconhecidos. As linhas válidas são gravadas em transações de
+``BATCH_SIZE`` e as inválidas voltam num relatório com o número da linha.
+"""
+import argparse
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from storage import INFO_COLUMNS
+
+# Inspeções gravadas por transação
+BATCH_SIZE = 1000
+
+# Linha da planilha do primeiro registro (a linha 1 é o cabeçalho)
+FIRST_ROW = 2
+
+
+def read_table(source, name=None):
+    """Planilha como DataFrame de texto, sem espaços nas pontas e com vazios como ''.
+
+    ``source`` é um caminho ou arquivo; ``name`` (ou o próprio caminho) define o formato pela extensão.
+    CSV aceita vírgula ou ponto e vírgula como separador.
+    """
+    name = name or (source if isinstance(source, str) else getattr(source, 'name', ''))
+    if name.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            frame = pd.read_excel(source, dtype=str, engine='openpyxl')
+        except ImportError:
+            raise RuntimeError("Planilhas XLSX precisam do openpyxl (pip install openpyxl)") from None
+    else:
+        frame = pd.read_csv(source, dtype=str, keep_default_na=False, encoding='utf-8-sig', sep=None,
+                            engine='python')
+    frame.columns = frame.columns.astype(str).str.strip()
+    return frame.fillna('').astype(str).apply(lambda column: column.str.strip())
+
+
+def template_csv(spec):
+    """CSV vazio com as colunas esperadas para um tipo de checklist (modelo para preencher)"""
+    columns = ['tipo', *INFO_COLUMNS, *spec.item_names]
+    return pd.DataFrame(columns=columns).to_csv(index=False)
+
+
+def _names(mask):
+    """Nomes das colunas marcadas em cada linha de um DataFrame booleano, separados por vírgula"""
+    if mask.shape[1] == 0:
+        return pd.Series('', index=mask.index)
+    return mask.dot(mask.columns + ', ').str.rstrip(', ')
+
+
+def _parse_dates(values):
+    """Datas 'dd/mm/aaaa' ou ISO (como o Excel exporta); inválidas viram NaT"""
+    parsed = pd.to_datetime(values, format='%d/%m/%Y', errors='coerce')
+    return parsed.fillna(pd.to_datetime(values.where(parsed.isna(), ''), format='ISO8601', errors='coerce'))
+
+
+def validate(frame, specs, resultados=None, default_tipo=None):
+    """Valida todas as linhas da planilha e codifica os status das válidas.
+
+    Retorna ``(registros, erros)``: ``registros`` no formato de
+    ``InspectionStore.save_many`` (status já como vetor de códigos) mais a
+    ``linha`` de origem; ``erros`` é um DataFrame (linha, erro) com todas as
+    falhas de cada linha inválida. ``resultados`` restringe a coluna resultado.
+    """
+    index = frame.index
+    empty = pd.Series('', index=index)
+
+    def column(name):
+        return frame[name] if name in frame.columns else empty
+
+    messages = pd.Series('', index=index, dtype=object)
+
+    def check(mask, message):
+        """Acrescenta ``message`` às mensagens das linhas de ``mask``"""
+        nonlocal messages
+        message = pd.Series(np.where(mask, message, ''), index=index, dtype=object)
+        messages = messages + np.where((messages != '') & (message != ''), '; ', '') + message
+
+    tipo = column('tipo').str.lower()
+    if default_tipo:
+        tipo = tipo.mask(tipo == '', default_tipo)
+    check(~tipo.isin(list(specs)), 'tipo inválido: "' + tipo + '"')
+
+    check(column('responsavel') == '', 'responsável obrigatório')
+
+    dates = _parse_dates(column('data'))
+    raw_dates = column('data')
+    check(dates.isna(), np.where(raw_dates == '', 'data obrigatória', 'data inválida: "' + raw_dates + '"'))
+
+    if resultados:
+        resultado = column('resultado')
+        check((resultado != '') & ~resultado.isin(resultados), 'resultado inválido: "' + resultado + '"')
+
+    item_columns = [name for name in frame.columns if name not in INFO_COLUMNS and name != 'tipo']
+    filled = frame[item_columns] != ''
+    codes = frame[item_columns].apply(lambda values: values.str.upper())
+    statuses = pd.Series(None, index=index, dtype=object)
+    for key, spec in specs.items():
+        rows = tipo == key
+        if not rows.any():
+            continue
+        known = [name for name in item_columns if name in spec.item_ids]
+        unknown = [name for name in item_columns if name not in spec.item_ids]
+        unknown_names = _names(filled[unknown])
+        check(rows & (unknown_names != ''), f"itens desconhecidos no {spec.name}: " + unknown_names)
+
+        invalid_names = _names(filled[known] & ~codes[known].isin(spec.status_codes))
+        check(rows & (invalid_names != ''),
+              f"status inválido (use {'/'.join(spec.status_codes)}) em: " + invalid_names)
+        check(rows & ~filled[known].any(axis=1), "nenhum item preenchido")
+
+        # Vetores de status das linhas deste tipo: matriz linhas x itens na ordem do catálogo
+        numbers = codes.loc[rows, known].apply(lambda values: values.map(spec.status_numbers))
+        matrix = np.zeros((int(rows.sum()), spec.total_items()), dtype=np.uint8)
+        matrix[:, [spec.item_ids[name] for name in known]] = numbers.fillna(0).to_numpy(dtype=np.uint8)
+        statuses[rows] = [row.tobytes() for row in matrix]
+
+    invalid = messages != ''
+    erros = pd.DataFrame({'linha': index[invalid] + FIRST_ROW, 'erro': messages[invalid].to_numpy()})
+
+    valid = ~invalid
+    info = frame.loc[valid].reindex(columns=list(INFO_COLUMNS), fill_value='')
+    info['data'] = dates[valid].dt.strftime('%d/%m/%Y')
+    registros = [
+        {'linha': linha, 'tipo': record_tipo, 'data': record_statuses, 'info_data': info_data}
+        for linha, record_tipo, record_statuses, info_data in zip(
+            index[valid] + FIRST_ROW, tipo[valid], statuses[valid], info.to_dict('records'))
+    ]
+    return registros, erros
+
+
+def import_table(store, specs, source, name=None, resultados=None, default_tipo=None, dry_run=False,
+                 batch_size=BATCH_SIZE):
+    """Lê, valida e grava (exceto com ``dry_run``) as linhas válidas de uma planilha.
+
+    Retorna {'linhas', 'validas', 'importadas', 'ids', 'erros' (DataFrame linha/erro), 'segundos'}.
+    """
+    start = time.perf_counter()
+    frame = read_table(source, name)
+    registros, erros = validate(frame, specs, resultados=resultados, default_tipo=default_tipo)
+
+    ids = []
+    if not dry_run:
+        for offset in range(0, len(registros), batch_size):
+            ids += store.save_many(registros[offset:offset + batch_size])
+    return {
+        'linhas': len(frame),
+        'validas': len(registros),
+        'importadas': len(ids),
+        'ids': ids,
+        'erros': erros,
+        'segundos': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    from checklistepiepc import RESULTADO_OPTIONS, SPECS
+    from storage import DEFAULT_DB_PATH, InspectionStore
+
+    parser = argparse.ArgumentParser(description="Importa inspeções de uma planilha CSV/XLSX")
+    parser.add_argument('entrada', help="planilha CSV ou XLSX, uma inspeção por linha")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="banco de inspeções")
+    parser.add_argument('--tipo', choices=list(SPECS), help="tipo das linhas sem a coluna tipo")
+    parser.add_argument('-e', '--erros', help="grava o relatório de erros neste CSV")
+    parser.add_argument('--validar', action='store_true', help="só valida, sem gravar")
+    args = parser.parse_args(argv)
+
+    store = InspectionStore(args.db, SPECS)
+    resultado = import_table(store, SPECS, args.entrada, resultados=RESULTADO_OPTIONS, default_tipo=args.tipo,
+                             dry_run=args.validar)
+
+    erros = resultado['erros']
+    if args.erros:
+        erros.to_csv(args.erros, index=False, encoding='utf-8-sig')
+    elif len(erros):
+        buffer = io.StringIO()
+        erros.head(50).to_csv(buffer, index=False)
+        print(buffer.getvalue(), file=sys.stderr, end='')
+    print(f"{resultado['linhas']} linhas, {resultado['validas']} válidas, {resultado['importadas']} importadas, "
+          f"{len(erros)} com erro em {resultado['segundos']:.2f}s")
+    return 1 if len(erros) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
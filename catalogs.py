@@ -0,0 +1,159 @@
+"""Catálogos de itens EPC/EPI carregados de arquivos de dados versionados.
+
+Formatos aceitos (pela extensão):
+
+- JSON/YAML: ``{"tipo", "versao", "categorias": [{"nome", "itens": [{"codigo", "nome"}]}]}``
+- CSV: colunas ``codigo``, ``categoria`` e ``item`` (``versao`` opcional), uma linha por item
+
+Cada arquivo é compilado uma vez por processo num ``Catalog`` imutável e
+recarregado quando muda no disco. O ``codigo`` de um item é estável entre
+versões (sobrevive a renomeações); o ID é a posição no catálogo, usada nos
+vetores de status.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from storage import catalog_version
+
+CATALOG_DIR = os.environ.get('CHECKLIST_CATALOGS') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                   'catalogs')
+
+# Intervalo mínimo entre verificações de mudança do arquivo
+CHECK_INTERVAL = 1.0
+
+
+class Catalog:
+    """Catálogo compilado: nomes, códigos, IDs por posição, offsets das categorias e índice nome -> ID.
+
+    ``version`` é o hash do conteúdo (o que fica gravado com cada inspeção);
+    ``label`` é a versão declarada no arquivo, para exibição.
+    """
+
+    __slots__ = ('tipo', 'label', 'categories', 'item_names', 'item_codes', 'item_ids', 'item_categories',
+                 'category_offsets', 'total', 'version')
+
+    def __init__(self, tipo, label, categories, codes=None):
+        categories = {categoria: tuple(itens) for categoria, itens in categories.items()}
+        names = tuple(item for itens in categories.values() for item in itens)
+        item_ids = {item: item_id for item_id, item in enumerate(names)}
+        if len(item_ids) != len(names):
+            raise ValueError(f"Catálogo {tipo}: nomes de item repetidos")
+        codes = tuple(codes) if codes is not None else tuple(f"{tipo.upper()}-{index + 1:03d}"
+                                                             for index in range(len(names)))
+        if len(codes) != len(names) or len(set(codes)) != len(codes):
+            raise ValueError(f"Catálogo {tipo}: códigos de item ausentes ou repetidos")
+
+        offsets = []
+        start = 0
+        for categoria, itens in categories.items():
+            offsets.append((categoria, start, start + len(itens)))
+            start += len(itens)
+
+        set_ = object.__setattr__
+        set_(self, 'tipo', tipo)
+        set_(self, 'label', label)
+        set_(self, 'categories', MappingProxyType(categories))
+        set_(self, 'item_names', names)
+        set_(self, 'item_codes', codes)
+        set_(self, 'item_ids', MappingProxyType(item_ids))
+        set_(self, 'item_categories', tuple(categoria for categoria, itens in categories.items() for _ in itens))
+        set_(self, 'category_offsets', tuple(offsets))
+        set_(self, 'total', len(names))
+        set_(self, 'version', catalog_version(categories))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Catalog é imutável")
+
+    def as_dict(self):
+        """{categoria: [itens]} mutável, no formato das antigas get_epc_items/get_epi_items"""
+        return {categoria: list(itens) for categoria, itens in self.categories.items()}
+
+
+def _from_document(document, tipo):
+    categories = {}
+    codes = []
+    for categoria in document['categorias']:
+        itens = categories.setdefault(categoria['nome'], [])
+        for item in categoria['itens']:
+            if isinstance(item, str):
+                raise ValueError(f"Catálogo {tipo}: item sem código: {item}")
+            itens.append(item['nome'])
+            codes.append(item['codigo'])
+    return Catalog(document.get('tipo', tipo), str(document.get('versao', '')), categories, codes)
+
+
+def _read_json(path, tipo):
+    with open(path, encoding='utf-8') as f:
+        return _from_document(json.load(f), tipo)
+
+
+def _read_yaml(path, tipo):
+    try:
+        import yaml
+    except ImportError:
+        raise RuntimeError("Catálogos YAML precisam do PyYAML (pip install pyyaml)") from None
+    with open(path, encoding='utf-8') as f:
+        return _from_document(yaml.safe_load(f), tipo)
+
+
+def _read_csv(path, tipo):
+    categories = {}
+    codes = []
+    label = ''
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            categories.setdefault(row['categoria'].strip(), []).append(row['item'].strip())
+            codes.append(row['codigo'].strip())
+            label = (row.get('versao') or label).strip()
+    return Catalog(tipo, label, categories, codes)
+
+
+READERS = {'.json': _read_json, '.yaml': _read_yaml, '.yml': _read_yaml, '.csv': _read_csv}
+
+
+def read_catalog(path, tipo=None):
+    """Lê e compila um arquivo de catálogo (sem cache)"""
+    base, extension = os.path.splitext(path)
+    reader = READERS.get(extension.lower())
+    if reader is None:
+        raise ValueError(f"Formato de catálogo não suportado: {path}")
+    return reader(path, tipo or os.path.basename(base))
+
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def load_catalog(path):
+    """Catálogo compilado de ``path``, relido só quando o arquivo muda (mtime/tamanho).
+
+    A verificação no disco acontece no máximo a cada ``CHECK_INTERVAL`` segundos.
+    """
+    now = time.monotonic()
+    entry = _loaded.get(path)
+    if entry is not None and now - entry[2] < CHECK_INTERVAL:
+        return entry[0]
+
+    with _lock:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = _loaded.get(path)
+        if entry is None or entry[1] != stamp:
+            entry = (read_catalog(path), stamp, now)
+        else:
+            entry = (entry[0], stamp, now)
+        _loaded[path] = entry
+        return entry[0]
+
+
+def catalog_path(tipo):
+    """Arquivo do catálogo de um tipo: o primeiro de epc.json, epc.yaml, epc.yml, epc.csv em ``CATALOG_DIR``"""
+    for extension in READERS:
+        path = os.path.join(CATALOG_DIR, f"{tipo}{extension}")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Catálogo '{tipo}' não encontrado em {CATALOG_DIR}")
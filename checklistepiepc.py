@@ -1,37 +1,24 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.lib.colors import HexColor
-import io
+from datetime import datetime, timedelta
+import functools
 import os
-import base64
-
-# Configuração da página
-st.set_page_config(
-    page_title="Checklist EPC/EPI - Rezende",
-    page_icon="🛡️",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-
-def get_base64_image(image_path):
-    """Converte imagem para base64"""
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except FileNotFoundError:
-        return ""
-
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import metrics
+import profiling
+from assets import get_logo
+from catalogs import Catalog, catalog_path, load_catalog
+from drafts import DraftJournal, draft_backend, new_draft_id, purge_drafts, valid_draft_id
+from metrics import timed
+from search import SearchIndex
+from state_backend import open_backend
+from storage import InspectionStore
 
 # CSS personalizado inspirado no exemplo
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
 
@@ -166,6 +153,12 @@ st.markdown("""
         font-size: 0.9rem;
     }
 
+    .item-changed {
+        border-left: 3px solid #F7931E;
+        background: #fff4e6;
+        padding-left: 0.4rem;
+    }
+
     .stSelectbox > label,
     .stTextInput > label,
     .stDateInput > label,
@@ -195,844 +188,1295 @@ st.markdown("""
         }
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+def setup_page():
+    """Configura a página e injeta o CSS (só dentro do Streamlit, não no import)"""
+    st.set_page_config(
+        page_title="Checklist EPC/EPI - Rezende",
+        page_icon="🛡️",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
+    st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 
 def load_logo():
-    """Carrega a logo da empresa"""
-    logo_path = r"C:\Users\Pedro Curry\OneDrive\Área de Trabalho\Rezende\MARKETING\__sitelogo__Logo Rezende.png"
-    if os.path.exists(logo_path):
-        return logo_path
-    else:
-        return None
+    """Caminho da logo da empresa (configurável por ``CHECKLIST_LOGO``), ou None se indisponível"""
+    logo = get_logo()
+    return logo.path if logo else None
+
+
+def load_logo_base64():
+    """Logo reduzida para o cabeçalho da página, em base64 ("" se indisponível)"""
+    logo = get_logo()
+    if logo is None:
+        return ""
+    try:
+        return logo.web_base64
+    except Exception:
+        return ""
 
 
 def get_epc_items():
-    """Lista de itens do checklist EPC organizados por categoria"""
-    return {
-        "Ferramentas Básicas": [
-            "ALICATE BOMBA D'ÁGUA 12\"",
-            "ALICATE HIDRAULICO COMPRESSÃO COM MATRIZES",
-            "ARCO DE SERRA COMUM",
-            "ARCO DE SERRA ISOLADO/SERRA PARA ARCO DE SERRA",
-            "CHAVE AJUSTÁVEL INGLESA BOCA 25MM",
-            "CHAVE AJUSTÁVEL INGLESA BOCA 35MM",
-            "CHAVE ALLE 1/8 -9/16POL SX",
-            "CHAVE FENDAR 6 X 150MM",
-            "CHAVE FENDAR 8 X 150MM",
-            "CHAVE DE BOCA 1/4 X 3 X 4 POL",
-            "JOGO CHAVE ALLEN 1/8\" A 9/16\"",
-            "JOGO CHAVE FIXA 8 PCS 1/4\" A 1.1/4\"",
-            "MARRETA 1,5KG C/CABO",
-            "FACÃO 20 POL."
-        ],
-        "Equipamentos de Segurança": [
-            "ATERRAMENTO PARA VEÍCULO",
-            "CONJUNTO DE ATERRAMENTO RÁPIDO E TEMPORÁRIO ATÉ 34",
-            "CONJUNTO DE ATERRAMENTO RÁPIDO E TEMPORÁRIO SECUNDÁRIO",
-            "CONJUNTO DE ATERRAMENTO BT PARA REDE MULTIPLEX",
-            "DETECTOR DE PRESENÇA DE TENSÃO POR APROX. BT / MT / AT",
-            "BANQUETA ISOLADA",
-            "LENÇOL ISOLANTE P/BT",
-            "LUVA DE BORRACHA CLASSE 2 / LUVA COBERTURA VAQUETA",
-            "LUVA DE BORRACHA CLASSE 4"
-        ],
-        "Equipamentos de Elevação": [
-            "BALDE DE LONA FUNDO DE COURO / PARA IÇAMENTO",
-            "CINTA DE ELEVAÇÃO 3TON. X 20CM LARG. X 1,5MT COMP.",
-            "CINTA DE ELEVAÇÃO 3TON. X 20CM LARG. X 2MT COMP.",
-            "CINTA DE ELEVAÇÃO 2TON. X 20CM LARG. X 2MT COMP.",
-            "CINTA TUBULAR TIPO ANEL PARA ELEVAÇÃO DE POSTA CAPA TR",
-            "ROLDANA PARA ELEVAÇÃO DE MATERIAIS, COM GANCHO",
-            "MOITÃO DUPLO 1500 DAN C/ 40MT DE CORDA",
-            "MOSQUETÃO OVAL COMUM PARA IÇAMENTO DE MATERIAIS",
-            "ROLDANA P/ LANÇAMENTO DE CABO C/ FIXAÇÃO NA CRUZETA"
-        ],
-        "Ferramentas Especializadas": [
-            "ALAVANCA AÇO SEXTAVADA, 1500 MM",
-            "ALICATE VOLT AMPERÍMETRO DE 20A - 1000A",
-            "BASTÃO PEGA TUDO",
-            "BASTÃO PODADOR DE GALHOS C/ CABEÇOTE UNIVERSAL",
-            "CABEÇOTE PARA INSTALAÇÃO DE ESPAÇADORES",
-            "CATRACA PARA TENSIONAR CABO COM ESTIRANTE DE NYLON",
-            "FERRAMENTA P/ APLICAÇÃO DE CONECTOR TIPO CUNHA",
-            "FERRAMENTA P/ OPERAÇÃO DE CHAVE C/ CARGA 25KV / 66A LOADBUSTER",
-            "VARA DE MANOBRA TELESCÓPICA 5 ESTÁGIOS C/ CABEÇOTE"
-        ],
-        "Equipamentos de Trabalho": [
-            "CAVALETE BOBINA",
-            "CAVADEIRA AÇO COM CABO",
-            "COLHER DE PEDREIRO 8 POL",
-            "ENXADA C/CABO FERRO 1,80 MT",
-            "ENXADADETA /CABO MADEIRA 1,5KG",
-            "ESCADA FIBRA EXT. 5,40X9,60M",
-            "ESCADA FIBRA EXT. 4,20X7.20M",
-            "MOTOSSERRA SABRE 30,40,50",
-            "PÁ QUADRADA GRANDE P/ JUNTAR C/ CABO DE MADEIRA EM \"Y\"",
-            "VASSOURAM GARI GRANDE"
-        ],
-        "Acessórios e Materiais": [
-            "BOLSA DE LONA PARA EPI E FERRAMENTAS",
-            "BOLSA DE BASTÃO PEGA TUDO",
-            "BANDEIROLA",
-            "CONE DE SINALIZAÇÃO GRANDE COM PINTURA FOSFORECENTE",
-            "CORDA ESTÁTICA CAPA E ALMA 12MM 22KN \"LINHA DE VIDA 144 METROS",
-            "CORDA PARA IÇAR FERRAMENTAS E MATERIAIS 10MM 43 METROS",
-            "DEPÓSITO PARA ÁGUA 10L",
-            "ENCERADO 6 X 5 M",
-            "ESCOVA EM \"V\" PARA LIMPEZA DE CONDUTOR COM ENCAIXE",
-            "GARRAFA TÉRMICA 12LT",
-            "KIT PRIMEIROS SOCORROS",
-            "LÂMINA PARA ARCO DE SERRA 24D",
-            "PLACA SINALIZAÇÃO \"ATENÇÃO! NÃO OPERE ESTE EQUIPAMENTO\"",
-            "PLACA SINALIZAÇÃO \"NÃO LIGAR, HOMENS NA LINHA\"",
-            "PRANCHETA OFÍCIO C/ PRENDEDOR PLÁST.",
-            "TRENA DE FITA FIBRA 50MT"
-        ]
-    }
+    """Itens do checklist EPC por categoria (cópia do catálogo em ``catalogs/``)"""
+    return SPECS['epc'].catalog.as_dict()
 
 
 def get_epi_items():
-    """Lista de itens do checklist EPI organizados por categoria"""
-    return {
-        "Proteção da Cabeça": [
-            "Capacete de segurança classe B",
-            "Jugular para capacete"
-        ],
-        "Proteção dos Olhos e Face": [
-            "Óculos de segurança incolor",
-            "Óculos de segurança cinza ou fumê",
-            "Óculos de sobreposição (para quem usa óculos de grau)",
-            "Balaclava simples",
-            "Balaclava Antichamas",
-            "Protetor facial contra arco elétrico"
+    """Itens do checklist EPI por categoria (cópia do catálogo em ``catalogs/``)"""
+    return SPECS['epi'].catalog.as_dict()
+
+
+INFO_FIELD_LABELS = {
+    'local': ("Local:", ""),
+    'empresa': ("Empresa:", "Rezende Energia"),
+    'data': ("Data:", None),
+    'placa': ("Placa do Veículo:", ""),
+    'veiculo': ("Veículo/Modelo:", ""),
+    'matricula': ("Matrícula:", ""),
+    'colaborador': ("Nome do Colaborador:", ""),
+    'funcao': ("Função/Cargo:", ""),
+}
+
+RESULTADO_OPTIONS = ["Aprovado", "Reprovado", "Aprovado com Restrições"]
+
+# Intervalo de consulta da fila enquanto um PDF está sendo gerado
+PDF_POLL_SECONDS = 0.5
+
+# Espera máxima por um PDF de inspeção gravada numa exportação ou relatório
+PDF_WAIT_SECONDS = 120
+
+# Formatos aceitos nas fotos de evidência
+PHOTO_TYPES = ['jpg', 'jpeg', 'png', 'webp']
+
+# Porta da API HTTP servida junto com o app (0 = desligada; ver api.py)
+API_PORT = int(os.environ.get('CHECKLIST_API_PORT', '0'))
+
+# Máximo de inspeções num relatório consolidado e num ZIP gerados pela interface
+REPORT_LIMIT = 500
+EXPORT_LIMIT = 2000
+
+# Itens por página do checklist; catálogos até EXPANDED_LIMIT itens abrem com as categorias expandidas
+PAGE_SIZE = 100
+EXPANDED_LIMIT = 150
+
+# Campos do cabeçalho copiados da última inspeção do mesmo veículo/colaborador
+PREFILL_FIELDS = ('empresa', 'veiculo', 'placa', 'colaborador', 'matricula', 'funcao')
+
+
+class ChecklistSpec:
+    """Definição declarativa de um tipo de checklist.
+
+    Reúne catálogo, códigos de status (com rótulo e cor dos contadores),
+    legenda, textos e layout. A interface, as estatísticas e o PDF são
+    gerados a partir dela; mapas status -> coluna/contador são calculados
+    uma única vez aqui.
+
+    O resultado de uma inspeção é um vetor ``array('B')`` com um byte por
+    item: o ID do item é sua posição no catálogo e o valor é o número do
+    status (0 = sem status, 1.. = posição em ``status_codes`` + 1).
+    ``encode``/``decode`` convertem de/para o dict {item: status}.
+
+    ``prefill_field`` é o campo do cabeçalho (placa, matrícula) que localiza
+    a última inspeção para pré-preencher uma nova.
+    """
+
+    def __init__(self, key, name, catalog, statuses, legend, pdf_title, section_title, header_layout,
+                 cat_col_widths, badges, nonconforming, prefill_field):
+        self.key = key
+        self.name = name
+        self._catalog = catalog
+        self._search_index = (None, None)
+        self.statuses = statuses
+        self.legend = legend
+        self.pdf_title = pdf_title
+        self.section_title = section_title
+        self.header_layout = header_layout
+        self.cat_col_widths = cat_col_widths
+        self.badges = badges
+        self.nonconforming = nonconforming
+        self.prefill_field = prefill_field
+
+        self.status_codes = [code for code, label, color in statuses]
+        self.status_index = {code: index for index, code in enumerate(self.status_codes)}
+        self.status_numbers = {code: index + 1 for index, code in enumerate(self.status_codes)}
+        self.header_fields = [field for row in header_layout for column in row for field in column]
+
+    @property
+    def catalog(self):
+        """Catálogo compilado atual: ``catalog`` é um Catalog fixo ou o caminho do arquivo (recarregável)"""
+        if isinstance(self._catalog, Catalog):
+            return self._catalog
+        return load_catalog(self._catalog)
+
+    @property
+    def categories(self):
+        return self.catalog.categories
+
+    @property
+    def item_names(self):
+        return self.catalog.item_names
+
+    @property
+    def item_ids(self):
+        return self.catalog.item_ids
+
+    @property
+    def item_categories(self):
+        return self.catalog.item_categories
+
+    @property
+    def version(self):
+        return self.catalog.version
+
+    @property
+    def search_index(self):
+        """Índice de busca dos nomes dos itens, montado na primeira busca de cada versão do catálogo"""
+        catalog = self.catalog
+        version, index = self._search_index
+        if version != catalog.version:
+            index = SearchIndex(catalog.item_names)
+            self._search_index = (catalog.version, index)
+        return index
+
+    @property
+    def tab_label(self):
+        return f"Checklist {self.name}"
+
+    @property
+    def badge(self):
+        return f"{self.name}s"
+
+    def total_items(self):
+        return self.catalog.total
+
+    def empty_statuses(self):
+        """Vetor de status com todos os itens em branco"""
+        return array('B', bytes(self.catalog.total))
+
+    def encode(self, data):
+        """Dict {item: status} -> vetor de códigos (itens e status desconhecidos são ignorados)"""
+        statuses = self.empty_statuses()
+        item_ids = self.item_ids
+        numbers = self.status_numbers
+        for item, status in data.items():
+            item_id = item_ids.get(item)
+            number = numbers.get(status)
+            if item_id is not None and number:
+                statuses[item_id] = number
+        return statuses
+
+    def decode(self, statuses):
+        """Vetor de códigos -> dict {item: status} só com os itens preenchidos"""
+        names = self.item_names
+        codes = self.status_codes
+        return {names[item_id]: codes[number - 1] for item_id, number in enumerate(statuses) if number}
+
+    def decode_codes(self, by_code):
+        """Dict {código do item: status} (ver ``InspectionStore.get``) -> {item: status} no catálogo atual"""
+        catalog = self.catalog
+        names = dict(zip(catalog.item_codes, catalog.item_names))
+        return {names[code]: status for code, status in by_code.items() if code in names}
+
+    def count_statuses(self, statuses):
+        """Quantidade de itens em cada status a partir do vetor de códigos"""
+        return [statuses.count(number) for number in range(1, len(self.status_codes) + 1)]
+
+
+SPECS = {
+    'epc': ChecklistSpec(
+        key='epc',
+        name='EPC',
+        catalog=catalog_path('epc'),
+        statuses=[('A', 'Bom', '#28a745'), ('B', 'Solicitar', '#ffc107'), ('C', 'Não Liberar', '#dc3545'),
+                  ('N/A', 'N/A', '#17a2b8')],
+        legend="Legenda: A = Bom | B = Solicitar Providências | C = Não Liberar | N/A = Não se Aplica",
+        pdf_title="Checklist - Equipamentos de Proteção Coletiva (EPCs)",
+        section_title="CHECKLIST - EQUIPAMENTOS DE PROTEÇÃO COLETIVA",
+        header_layout=[
+            [['local', 'empresa'], ['data', 'placa'], ['veiculo', 'matricula']],
+            [['colaborador'], ['funcao']],
         ],
-        "Proteção Respiratória": [
-            "Respirador descartável PFF1",
-            "Respirador descartável PFF2"
+        cat_col_widths=[0.6, 0.08, 0.08, 0.08, 0.08, 0.08],
+        badges={'A': ('status-conforme', 'Conforme'), 'B': ('status-nao-conforme', 'Não Conforme'),
+                'N/A': ('status-na', 'N/A')},
+        nonconforming=('B', 'C'),
+        prefill_field='placa',
+    ),
+    'epi': ChecklistSpec(
+        key='epi',
+        name='EPI',
+        catalog=catalog_path('epi'),
+        statuses=[('C', 'Conforme', '#28a745'), ('NC', 'Não Conforme', '#dc3545'), ('NR', 'Não Recebeu', '#ffc107'),
+                  ('N/A', 'N/A', '#17a2b8')],
+        legend="Legenda: C = Conforme | NC = Não Conforme | NR = Não Recebeu | N/A = Não se Aplica",
+        pdf_title="Checklist - Equipamentos de Proteção Individual (EPIs)",
+        section_title="CHECKLIST - EQUIPAMENTOS DE PROTEÇÃO INDIVIDUAL",
+        header_layout=[
+            [['empresa', 'colaborador'], ['data', 'local'], ['matricula', 'funcao']],
         ],
-        "Proteção Auditiva": [
-            "Protetor auricular tipo plug (descartável)",
-            "Protetor auricular tipo plug com cordão",
-            "Protetor auricular tipo concha (abafador)"
-        ],
-        "Proteção do Tronco e Corpo": [
-            "Camisa de manga longa anti-chamas",
-            "Calça anti-chamas",
-            "Colete refletivo de alta visibilidade",
-            "Colete Salva vidas"
-        ],
-        "Proteção das Mãos e Braços": [
-            "Luva de vaqueta (manuseio de materiais)",
-            "Luva de raspa (solda e corte)",
-            "Luva isolante classe 0 (até 1.000 V)",
-            "Luva isolante classe 2 (até 17.000 V)",
-            "Luva isolante classe 4 (até 36.000 V)",
-            "Luva de cobertura de vaqueta (uso sobre as isolantes)",
-            "Manga de raspa (proteção do braço)",
-            "Manga isolante classe 2 (até 17.000 V)"
-        ],
-        "Proteção das Pernas": [
-            "Perneira de raspa (trabalho com motosserra e ferramentas de corte)",
-            "Perneira contra animais peçonhentos (mata e roçada)"
-        ],
-        "Proteção dos Pés": [
-            "Botina de segurança com biqueira de aço",
-            "Botina de segurança com biqueira de composite (NR 10)",
-            "Bota dielétrica (classe elétrica)",
-            "Bota de PVC antiderrapante (chuva, lama e herbicidas)"
-        ],
-        "Proteção Contra Quedas": [
-            "Cinturão tipo paraquedista",
-            "Cinto paraquedista com talabarte",
-            "Talabarte ajustável para posicionamento",
-            "Linha de vida vertical com trava-quedas",
-            "Trava-quedas retrátil",
-            "Conectores mosquetões (trava dupla automática)"
-        ],
-        "Atividades Rurais": [
-            "Protetor solar",
-            "Repelente contra insetos"
-        ],
-        "Itens Complementares": [
-            "Capacete com viseira integrada contra arco elétrico",
-            "Protetor lombar (ergonomia – carga e descarga)",
-            "Capa de chuva PVC (isolante e visibilidade em obras externas)"
-        ]
-    }
-
-
-def create_pdf_epc(data, info_data):
+        cat_col_widths=[0.58, 0.084, 0.084, 0.084, 0.084, 0.084],
+        badges={'C': ('status-conforme', 'Conforme'), 'NC': ('status-nao-conforme', 'Não Conforme'),
+                'N/A': ('status-na', 'N/A')},
+        nonconforming=('NC', 'NR'),
+        prefill_field='matricula',
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_template(tipo):
+    """Template do PDF por tipo de checklist (chave de ``SPECS``), criado uma vez por processo"""
+    if tipo not in SPECS:
+        raise ValueError(f"Tipo de checklist desconhecido: {tipo}")
+    from pdf_render import PdfTemplate  # ReportLab só é carregado no primeiro PDF
+    return PdfTemplate(SPECS[tipo])
+
+
+@functools.lru_cache(maxsize=None)
+def _photo_backend():
+    """Backend das fotos neste processo (os workers de PDF leem as miniaturas direto dele)"""
+    from photos import photo_backend
+    return photo_backend(open_backend())
+
+
+def create_pdf(spec, data, info_data, overlay=False, generated_at=None, fotos=None):
+    """Cria o PDF de um checklist (``overlay=True`` usa o fundo estático em cache).
+
+    ``generated_at`` fixa o horário do rodapé e torna o PDF determinístico (ver ``pdf_key``).
+    ``fotos`` ({item: [hash]}) põe as miniaturas das evidências abaixo dos itens; o fundo
+    estático não tem espaço para elas, então uma inspeção com fotos sai sempre pelo platypus.
+    """
+    template = get_pdf_template(spec.key)
+    photos = None
+    if fotos:
+        from photos import load_thumbnails
+        photos = load_thumbnails(fotos, _photo_backend())
+        overlay = overlay and not photos
+    if profiling.PDF_ENABLED:
+        with profiling.Profile(f"pdf_{spec.key}"):
+            return _build_pdf(template, spec, data, info_data, overlay, generated_at, photos)
+    return _build_pdf(template, spec, data, info_data, overlay, generated_at, photos)
+
+
+def _build_pdf(template, spec, data, info_data, overlay, generated_at, photos=None):
+    if overlay:
+        return template.build_overlay(data, info_data, spec.categories, generated_at=generated_at)
+    return template.build(data, info_data, spec.categories, generated_at=generated_at, photos=photos)
+
+
+# Versão do desenho do modo overlay: entra na chave do cache, descartando os PDFs do desenho anterior
+OVERLAY_LAYOUT = 2
+
+
+def pdf_key(spec, data, info_data, overlay=False, generated_at=None, fotos=None):
+    """Chave do cache de PDFs: tudo o que muda os bytes de um PDF determinístico"""
+    from pdf_cache import content_key
+    logo = get_logo()
+    # As fotos entram pelo hash do conteúdo; sem fotos a chave é a mesma de antes delas
+    extra = (fotos,) if fotos else ()
+    return content_key(spec.key, spec.version, data, info_data, overlay and OVERLAY_LAYOUT, generated_at,
+                       logo.stamp if logo else None, *extra)
+
+
+def create_pdf_epc(data, info_data, overlay=False):
     """Cria PDF do checklist EPC com layout moderno"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8 * inch, leftMargin=0.5 * inch, rightMargin=0.5 * inch)
-
-    styles = getSampleStyleSheet()
-
-    # Estilos personalizados
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        alignment=TA_CENTER,
-        fontSize=16,
-        textColor=HexColor('#000000'),
-        fontName='Helvetica-Bold',
-        spaceAfter=20
-    )
-
-    section_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=HexColor('#F7931E'),
-        fontName='Helvetica-Bold',
-        spaceAfter=10
-    )
+    return create_pdf(SPECS['epc'], data, info_data, overlay=overlay)
 
-    elements = []
 
-    # Logo (se disponível)
-    logo_path = load_logo()
-    if logo_path and os.path.exists(logo_path):
-        try:
-            logo = Image(logo_path, width=2 * inch, height=1 * inch)
-            logo.hAlign = 'CENTER'
-            elements.append(logo)
-            elements.append(Spacer(1, 12))
-        except:
-            pass
-
-    # Título
-    title = Paragraph("Checklist - Equipamentos de Proteção Coletiva (EPCs)", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-
-    # Informações gerais
-    info_table_data = [
-        ['Local:', info_data.get('local', ''), 'Data:', info_data.get('data', ''), 'Status Geral'],
-        ['Empresa:', info_data.get('empresa', ''), 'Placa:', info_data.get('placa', ''), 'EPCs'],
-        ['Veículo:', info_data.get('veiculo', ''), 'Modelo:', info_data.get('modelo', ''), ''],
-        ['Matrícula:', info_data.get('matricula', ''), 'Colaborador:', info_data.get('colaborador', ''), ''],
-        ['Função:', info_data.get('funcao', ''), 'Responsável:', info_data.get('responsavel', ''), '']
-    ]
-
-    page_width = A4[0] - 1 * inch
-    col_widths = [page_width * 0.15, page_width * 0.2, page_width * 0.15, page_width * 0.25, page_width * 0.25]
-
-    info_table = Table(info_table_data, colWidths=col_widths)
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (4, 0), (4, 1), HexColor('#F7931E')),
-        ('TEXTCOLOR', (4, 0), (4, 1), colors.white),
-        ('FONTNAME', (4, 0), (4, 1), 'Helvetica-Bold'),
-        ('ALIGN', (4, 0), (4, 1), 'CENTER'),
-    ]))
-
-    elements.append(info_table)
-    elements.append(Spacer(1, 20))
-
-    # Legenda
-    legenda = Paragraph(
-        "Legenda: A = Bom | B = Solicitar Providências | C = Não Liberar | N/A = Não se Aplica",
-        styles['Normal'])
-    elements.append(legenda)
-    elements.append(Spacer(1, 15))
-
-    # Itens por categoria
-    epc_categories = get_epc_items()
-    for categoria, itens in epc_categories.items():
-        # Título da categoria
-        elements.append(Paragraph(categoria, section_style))
-
-        # Tabela dos itens da categoria
-        table_data = [['Descrição do Material', 'A', 'B', 'C', 'N/A']]
-
-        for item in itens:
-            status = data.get(item, '')
-            row = [item, '', '', '', '', '']
-            if status == 'A':
-                row[1] = 'X'
-            elif status == 'B':
-                row[2] = 'X'
-            elif status == 'C':
-                row[3] = 'X'
-            elif status == 'N/A':
-                row[4] = 'X'
-            table_data.append(row)
-
-        cat_col_widths = [page_width * 0.6, page_width * 0.08, page_width * 0.08, page_width * 0.08, page_width * 0.08,
-                          page_width * 0.08]
-
-        cat_table = Table(table_data, colWidths=cat_col_widths)
-        cat_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#F7931E')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
-
-        elements.append(cat_table)
-        elements.append(Spacer(1, 10))
-
-    # Observações
-    elements.append(Spacer(1, 20))
-    obs_text = f"Observações: {info_data.get('observacoes', '')}"
-    elements.append(Paragraph(obs_text, styles['Normal']))
-    elements.append(Spacer(1, 30))
-
-    # Assinaturas
-    elements.append(Paragraph("ASSINATURAS", section_style))
-    sig_table = Table([
-        ['Responsável pela Inspeção', 'Operador'],
-        ['_' * 30, '_' * 30],
-        [f"Data: {info_data.get('data', '')}", f"Data: {info_data.get('data', '')}"]
-    ], colWidths=[2.75 * inch, 2.75 * inch])
-
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 1), (-1, 1), 20)
-    ]))
-
-    elements.append(sig_table)
-
-    # Rodapé
-    elements.append(Spacer(1, 30))
-    footer_text = f"Documento gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} | Sistema Rezende Energia"
-    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey,
-                                  alignment=TA_CENTER)
-    elements.append(Paragraph(footer_text, footer_style))
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-
-def create_pdf_epi(data, info_data):
+def create_pdf_epi(data, info_data, overlay=False):
     """Cria PDF do checklist EPI com layout moderno"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8 * inch, leftMargin=0.5 * inch, rightMargin=0.5 * inch)
-
-    styles = getSampleStyleSheet()
-
-    # Estilos personalizados
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        alignment=TA_CENTER,
-        fontSize=16,
-        textColor=HexColor('#000000'),
-        fontName='Helvetica-Bold',
-        spaceAfter=20
-    )
+    return create_pdf(SPECS['epi'], data, info_data, overlay=overlay)
 
-    section_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=HexColor('#F7931E'),
-        fontName='Helvetica-Bold',
-        spaceAfter=10
-    )
 
-    elements = []
+def create_consolidated_pdf(store, headers, output, **kwargs):
+    """PDF único com índice e as inspeções gravadas de ``headers``, escrito em ``output`` à medida que é gerado.
 
-    # Logo (se disponível)
-    logo_path = load_logo()
-    if logo_path and os.path.exists(logo_path):
-        try:
-            logo = Image(logo_path, width=2 * inch, height=1 * inch)
-            logo.hAlign = 'CENTER'
-            elements.append(logo)
-            elements.append(Spacer(1, 12))
-        except:
-            pass
-
-    # Título
-    title = Paragraph("Checklist - Equipamentos de Proteção Individual (EPIs)", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-
-    # Informações gerais (mesmo layout do EPC)
-    info_table_data = [
-        ['Local:', info_data.get('local', ''), 'Data:', info_data.get('data', ''), 'Status Geral'],
-        ['Empresa:', info_data.get('empresa', ''), 'Placa:', info_data.get('placa', ''), 'EPIs'],
-        ['Veículo:', info_data.get('veiculo', ''), 'Modelo:', info_data.get('modelo', ''), ''],
-        ['Matrícula:', info_data.get('matricula', ''), 'Colaborador:', info_data.get('colaborador', ''), ''],
-        ['Função:', info_data.get('funcao', ''), 'Responsável:', info_data.get('responsavel', ''), '']
-    ]
-
-    page_width = A4[0] - 1 * inch
-    col_widths = [page_width * 0.15, page_width * 0.2, page_width * 0.15, page_width * 0.25, page_width * 0.25]
-
-    info_table = Table(info_table_data, colWidths=col_widths)
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (4, 0), (4, 1), HexColor('#F7931E')),
-        ('TEXTCOLOR', (4, 0), (4, 1), colors.white),
-        ('FONTNAME', (4, 0), (4, 1), 'Helvetica-Bold'),
-        ('ALIGN', (4, 0), (4, 1), 'CENTER'),
-    ]))
-
-    elements.append(info_table)
-    elements.append(Spacer(1, 20))
-
-    # Legenda
-    legenda = Paragraph(
-        "Legenda: C = Conforme | NC = Não Conforme | NR = Não Recebeu | N/A = Não se Aplica",
-        styles['Normal'])
-    elements.append(legenda)
-    elements.append(Spacer(1, 15))
-
-    # Itens por categoria
-    epi_categories = get_epi_items()
-    for categoria, itens in epi_categories.items():
-        # Título da categoria
-        elements.append(Paragraph(categoria, section_style))
-
-        # Tabela dos itens da categoria
-        table_data = [['Descrição do Material', 'C', 'NC', 'NR', 'N/A']]
-
-        for item in itens:
-            status = data.get(item, '')
-            row = [item, '', '', '', '', '']
-            if status == 'C':
-                row[1] = 'X'
-            elif status == 'NC':
-                row[2] = 'X'
-            elif status == 'NR':
-                row[3] = 'X'
-            elif status == 'N/A':
-                row[4] = 'X'
-            table_data.append(row)
-
-        cat_col_widths = [page_width * 0.58, page_width * 0.084, page_width * 0.084, page_width * 0.084,
-                          page_width * 0.084, page_width * 0.084]
-
-        cat_table = Table(table_data, colWidths=cat_col_widths)
-        cat_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#F7931E')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
-
-        elements.append(cat_table)
-        elements.append(Spacer(1, 10))
-
-    # Observações
-    elements.append(Spacer(1, 20))
-    obs_text = f"Observações: {info_data.get('observacoes', '')}"
-    elements.append(Paragraph(obs_text, styles['Normal']))
-    elements.append(Spacer(1, 30))
-
-    # Assinaturas
-    elements.append(Paragraph("ASSINATURAS", section_style))
-    sig_table = Table([
-        ['Responsável pela Inspeção', 'Operador'],
-        ['_' * 30, '_' * 30],
-        [f"Data: {info_data.get('data', '')}", f"Data: {info_data.get('data', '')}"]
-    ], colWidths=[2.75 * inch, 2.75 * inch])
-
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 1), (-1, 1), 20)
-    ]))
-
-    elements.append(sig_table)
-
-    # Rodapé
-    elements.append(Spacer(1, 30))
-    footer_text = f"Documento gerado em {datetime.now().strftime('%d/%m/%Y às %H:%M')} | Sistema Rezende Energia"
-    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey,
-                                  alignment=TA_CENTER)
-    elements.append(Paragraph(footer_text, footer_style))
-
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-
-def create_checklist_section(title, items_dict, section_key, status_options):
-    """Cria uma seção do checklist com design moderno"""
-    st.markdown(f'<div class="section-title">{title}</div>', unsafe_allow_html=True)
+    Ver ``pdf_report.render_consolidated`` para os demais argumentos.
+    """
+    import pdf_report
+    return pdf_report.render_consolidated(store, SPECS, get_pdf_template, headers, output, **kwargs)
 
-    with st.container():
-        st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
-        all_items_data = {}
+def archived_pdf_request(store, header):
+    """(spec, data, info_data, generated_at, fotos) do PDF de uma inspeção gravada, ou None se ela não existe mais.
 
-        for categoria, itens in items_dict.items():
-            st.markdown(f'<div class="category-header">{categoria}</div>', unsafe_allow_html=True)
+    O rodapé leva o horário em que a inspeção foi gravada: o PDF é determinístico
+    e exportações repetidas saem do cache de PDFs.
+    """
+    record = store.get(header['id'])
+    if record is None:
+        return None
+    spec = SPECS[record['tipo']]
+    names = dict(zip(spec.catalog.item_codes, spec.item_names))
+    fotos = {names[code]: keys for code, keys in record['fotos'].items() if code in names}
+    return (spec, spec.decode_codes(record['por_codigo']), record['info_data'],
+            datetime.fromisoformat(record['criado_em']), fotos)
 
-            for item in itens:
-                col1, col2 = st.columns([3, 1])
 
-                with col1:
-                    st.markdown(f'<div class="item-name">{item}</div>', unsafe_allow_html=True)
+def _wait_job(header, job, timeout):
+    if job is None:
+        return header, None, "inspeção não encontrada"
+    try:
+        job.future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        return header, None, f"PDF não ficou pronto em {timeout:.0f} s"
+    return header, job.pdf, job.erro
+
+
+def iter_archived_pdfs(store, headers, queue, window=8, timeout=PDF_WAIT_SECONDS):
+    """(header, pdf, erro) das inspeções gravadas de ``headers``, na mesma ordem.
+
+    Os PDFs saem do cache ou do pool da ``queue`` (modo overlay), com no máximo
+    ``window`` pedidos em andamento: o pool trabalha à frente de quem consome
+    sem acumular a exportação inteira em memória. Os PdfJobs ficam guardados
+    aqui, então o LRU da fila não os perde; um PDF que passa de ``timeout``
+    segundos sai com erro.
+    """
+    pending = deque()
+    for header in headers:
+        request = archived_pdf_request(store, header)
+        if request is None:
+            pending.append((header, None))
+        else:
+            spec, data, info_data, generated_at, fotos = request
+            job = queue.submit_job(spec.key, data, info_data, overlay=True, generated_at=generated_at,
+                                   cache_key=pdf_key(spec, data, info_data, True, generated_at, fotos), fotos=fotos)
+            pending.append((header, job))
+        if len(pending) >= window:
+            yield _wait_job(*pending.popleft(), timeout)
+    while pending:
+        yield _wait_job(*pending.popleft(), timeout)
+
+
+def session_statuses(spec):
+    """Vetor de status da sessão: guarda também os itens que não estão na tela (outra página,
+    categoria recolhida ou fora da busca), cujos widgets não existem neste rerun"""
+    statuses = st.session_state.get(f"{spec.key}_statuses")
+    catalog = st.session_state.get(f"{spec.key}_catalogo")
+    if statuses is None or catalog is None or len(statuses) != catalog.total:
+        return set_session_statuses(spec, spec.empty_statuses())
+    if catalog.version != spec.version:
+        remap_session_catalog(spec, catalog)
+    return st.session_state[f"{spec.key}_statuses"]
+
+
+def set_session_statuses(spec, statuses):
+    """Troca o vetor de status da sessão, marcando a versão do catálogo em que as posições valem"""
+    st.session_state[f"{spec.key}_statuses"] = statuses
+    st.session_state[f"{spec.key}_catalogo"] = spec.catalog
+    return statuses
+
+
+def remap_session_catalog(spec, old):
+    """Catálogo recarregado no meio da inspeção: leva status, fotos e base do pré-preenchimento
+    das posições do catálogo ``old`` para as do atual, pelo código do item (itens removidos saem)"""
+    new_ids = {code: item_id for item_id, code in enumerate(spec.catalog.item_codes)}
+    moved = {item_id: new_ids[code] for item_id, code in enumerate(old.item_codes) if code in new_ids}
+
+    def remap(vector):
+        result = spec.empty_statuses()
+        for item_id, number in enumerate(vector):
+            if number and item_id in moved:
+                result[moved[item_id]] = number
+        return result
+
+    base = st.session_state.get(f"{spec.key}_base")
+    if base is not None:
+        base['statuses'] = remap(base['statuses'])
+    fotos = st.session_state.get(f"{spec.key}_fotos")
+    if fotos:
+        st.session_state[f"{spec.key}_fotos"] = {moved[item_id]: keys for item_id, keys in fotos.items()
+                                                 if item_id in moved}
+    # As chaves dos seletores são posicionais: recriados a partir do vetor remapeado
+    for item_id in range(max(old.total, spec.total_items())):
+        st.session_state.pop(f"{spec.key}_{item_id}", None)
+    set_session_statuses(spec, remap(st.session_state[f"{spec.key}_statuses"]))
+
+
+def current_status(spec, item_id, statuses):
+    """Número do status de um item neste rerun, antes de o seletor ser desenhado.
+
+    O valor do seletor já está no session state quando o script começa; o
+    vetor só o recebe em ``render_item``. Sem seletor, vale o vetor.
+    """
+    value = st.session_state.get(f"{spec.key}_{item_id}")
+    return statuses[item_id] if value is None else spec.status_numbers.get(value, 0)
+
+
+def render_item(spec, item_id, statuses, options, baseline=None):
+    """Linha de um item: nome, seletor de status e selo; grava a escolha no vetor da sessão.
+
+    Com ``baseline`` (vetor da inspeção usada no pré-preenchimento) o item que mudou fica destacado.
+    """
+    col1, col2 = st.columns([3, 1])
+
+    with col2:
+        status = st.selectbox(
+            "Status",
+            options,
+            index=statuses[item_id],
+            key=f"{spec.key}_{item_id}",
+            label_visibility="collapsed"
+        )
 
-                with col2:
-                    status = st.selectbox(
-                        "Status",
-                        [""] + status_options,
-                        key=f"{section_key}_{item}",
-                        label_visibility="collapsed"
-                    )
+        statuses[item_id] = spec.status_numbers.get(status, 0)
 
-                    all_items_data[item] = status
+        # Indicador visual do status
+        badge = spec.badges.get(status)
+        if badge:
+            st.markdown(f'<div class="{badge[0]}">{badge[1]}</div>', unsafe_allow_html=True)
 
-                    # Indicador visual do status
-                    if status == status_options[0]:  # Primeira opção (Conforme/A)
-                        st.markdown('<div class="status-conforme">Conforme</div>', unsafe_allow_html=True)
-                    elif status == status_options[1]:  # Segunda opção (Não Conforme/B)
-                        st.markdown('<div class="status-nao-conforme">Não Conforme</div>', unsafe_allow_html=True)
-                    elif status == "N/A":
-                        st.markdown('<div class="status-na">N/A</div>', unsafe_allow_html=True)
+    with col1:
+        name = spec.item_names[item_id]
+        if baseline is not None and baseline[item_id] != statuses[item_id]:
+            before = spec.status_codes[baseline[item_id] - 1] if baseline[item_id] else "em branco"
+            st.markdown(f'<div class="item-name item-changed">{name}<br><small>Última inspeção: {before}</small>'
+                        '</div>', unsafe_allow_html=True)
+        else:
+            st.markdown(f'<div class="item-name">{name}</div>', unsafe_allow_html=True)
 
-        # Campo de observações
-        st.markdown("---")
-        observacoes = st.text_area(f"Observações - {title}:", key=f"{section_key}_obs", height=100)
+    if status in spec.nonconforming:
+        render_item_photos(spec, item_id)
 
-        st.markdown('</div>', unsafe_allow_html=True)
 
-        return all_items_data, observacoes
+def session_photos(spec):
+    """Fotos de evidência da aba, {item_id: [hash]}: como o vetor de status, guarda também os itens fora da tela"""
+    return st.session_state.setdefault(f"{spec.key}_fotos", {})
 
 
-def main():
-    # Inicializar session state
-    if 'checklist_data' not in st.session_state:
-        st.session_state.checklist_data = {}
+def nonconforming_photos(spec, statuses):
+    """{item_id: [hash]} só dos itens que continuam não conformes (mudar o status descarta as fotos do item)"""
+    numbers = {spec.status_numbers[code] for code in spec.nonconforming}
+    return {item_id: keys for item_id, keys in session_photos(spec).items() if keys and statuses[item_id] in numbers}
 
-    # Título principal com logo
-    logo_path = load_logo()
-    logo_base64 = ""
-    if logo_path:
-        logo_base64 = get_base64_image(logo_path)
 
-    st.markdown(f'''
-    <div class="main-title" style="display: flex; align-items: center; justify-content: center;">
-        <img src="data:image/png;base64,{logo_base64}" 
-             alt="Logo Rezende" style="height: 60px; margin-right: 2rem; filter: brightness(0) invert(1);">
-        <div>
-            <h1>Sistema de Checklist EPC/EPI</h1>
-            <p class="subtitle">Equipamentos de Proteção Coletiva e Individual - Rezende Energia</p>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+def remove_photo(spec, item_id, key):
+    session_photos(spec)[item_id].remove(key)
 
-    # Sidebar com informações
-    with st.sidebar:
-        st.markdown("### Informações do Sistema")
 
-        epc_items = get_epc_items()
-        epi_items = get_epi_items()
-        total_epc = sum(len(items) for items in epc_items.values())
-        total_epi = sum(len(items) for items in epi_items.values())
+def render_item_photos(spec, item_id):
+    """Fotos do item não conforme: miniaturas das enviadas e o envio de novas (processadas em segundo plano)"""
+    from photos import ERRO, MAX_PHOTOS_PER_ITEM, PENDENTE
 
-        st.info(f"**EPCs:** {total_epc} itens")
-        st.info(f"**EPIs:** {total_epi} itens")
-        st.success("**Status:** Online")
-        st.markdown("**Versão:** 2.0")
-
-        if st.button("Limpar Formulário", type="secondary"):
-            st.session_state.checklist_data = {}
+    store = get_photo_store()
+    keys = session_photos(spec).setdefault(item_id, [])
+    if keys:
+        for column, key in zip(st.columns(MAX_PHOTOS_PER_ITEM), keys):
+            with column:
+                status, erro = store.status(key)
+                if status == PENDENTE:
+                    st.caption("Processando foto...")
+                elif status == ERRO:
+                    st.caption(f"Foto não aproveitada: {erro}")
+                else:
+                    st.image(store.thumbnail(key))
+                st.button("Remover foto", key=f"{spec.key}_foto_remover_{item_id}_{key[:16]}", on_click=remove_photo,
+                          args=(spec, item_id, key))
+
+    if len(keys) < MAX_PHOTOS_PER_ITEM:
+        # O uploader muda de chave depois de cada envio: volta vazio, e a foto fica só no vetor da sessão
+        version_key = f"{spec.key}_foto_envio_{item_id}"
+        version = st.session_state.get(version_key, 0)
+        uploads = st.file_uploader(f"Foto de evidência - {spec.item_names[item_id]}", type=PHOTO_TYPES,
+                                   accept_multiple_files=True, key=f"{spec.key}_foto_{item_id}_{version}",
+                                   label_visibility="collapsed")
+        if uploads:
+            for upload in uploads[:MAX_PHOTOS_PER_ITEM - len(keys)]:
+                try:
+                    key = store.submit(upload.getvalue())
+                except ValueError as e:
+                    st.error(f"{upload.name}: {e}")
+                    continue
+                if key not in keys:
+                    keys.append(key)
+            st.session_state[version_key] = version + 1
             st.rerun()
 
-    # Navegação por tabs
-    tab1, tab2 = st.tabs(["Checklist EPC", "Checklist EPI"])
 
-    with tab1:
-        # Dados da inspeção EPC
-        st.markdown('<div class="section-title">DADOS DA INSPEÇÃO - EPC</div>', unsafe_allow_html=True)
+def pending_photos(fotos):
+    """Alguma das fotos de {item_id: [hash]} ainda está em processamento?"""
+    from photos import PENDENTE
+    keys = [key for keys in fotos.values() for key in keys]
+    return bool(keys) and any(get_photo_store().status(key)[0] == PENDENTE for key in keys)
 
-        with st.container():
-            st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
-            col1, col2, col3 = st.columns(3)
+@st.fragment(run_every=PDF_POLL_SECONDS)
+def poll_photo_jobs(spec):
+    """Só existe enquanto há foto sendo processada: mostra as miniaturas quando ficam prontas"""
+    if not pending_photos(session_photos(spec)):
+        st.rerun()
 
-            with col1:
-                local_epc = st.text_input("Local:", key="epc_local")
-                empresa_epc = st.text_input("Empresa:", value="Rezende Energia", key="epc_empresa")
 
-            with col2:
-                data_epc = st.date_input("Data:", datetime.now(), key="epc_data")
-                placa_epc = st.text_input("Placa do Veículo:", key="epc_placa")
+@timed('create_checklist_section')
+def create_checklist_section(spec):
+    """Cria uma seção do checklist com design moderno.
 
-            with col3:
-                veiculo_epc = st.text_input("Veículo/Modelo:", key="epc_veiculo")
-                matricula_epc = st.text_input("Matrícula:", key="epc_matricula")
+    Só os itens da página atual, e dentro dela só os das categorias abertas,
+    viram widgets: o rerun acompanha o que está na tela, não o catálogo.
+    """
+    title = spec.section_title
+    st.markdown(f'<div class="section-title">{title}</div>', unsafe_allow_html=True)
 
-            col4, col5 = st.columns(2)
+    with st.container():
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
-            with col4:
-                colaborador_epc = st.text_input("Nome do Colaborador:", key="epc_colaborador")
+        statuses = session_statuses(spec)
+        options = [""] + spec.status_codes
+        baseline = prefill_baseline(spec)
+        # Resumo das alterações preenchido depois dos itens, quando o vetor já tem as escolhas deste rerun
+        summary = st.empty() if baseline is not None else None
+
+        query = st.text_input("Buscar item", key=f"{spec.key}_busca", placeholder="Digite parte do nome do item")
+        item_ids = spec.search_index.search(query)
+        if query and not item_ids:
+            st.caption("Nenhum item encontrado.")
+
+        pages = max(1, -(-len(item_ids) // PAGE_SIZE))
+        page = 1
+        if pages > 1:
+            # A chave muda com o resultado da busca, voltando para a página 1
+            page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, step=1,
+                                   key=f"{spec.key}_pagina_{len(item_ids)}")
+        page_ids = item_ids[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
+        # Agrupa os itens da página por categoria, na ordem do catálogo
+        groups = {}
+        for item_id in page_ids:
+            groups.setdefault(spec.item_categories[item_id], []).append(item_id)
+
+        # Categorias abertas fora da busca: o estado do expander some quando ele sai da tela
+        abertas = st.session_state.setdefault(f"{spec.key}_abertas", set(spec.categories)
+                                              if spec.total_items() <= EXPANDED_LIMIT else set())
+        for categoria, ids in groups.items():
+            filled = sum(1 for item_id in ids if current_status(spec, item_id, statuses))
+            label = f"{categoria} ({filled}/{len(ids)})"
+            if baseline is not None:
+                changed = sum(1 for item_id in ids if current_status(spec, item_id, statuses) != baseline[item_id])
+                label += f" · {changed} alterados" if changed else ""
+            section = st.expander(label, expanded=bool(query) or categoria in abertas,
+                                  key=f"{spec.key}_cat_{'busca_' if query else ''}{categoria}", on_change="rerun")
+            if not query:
+                (abertas.add if section.open else abertas.discard)(categoria)
+            if section.open:
+                with section:
+                    for item_id in ids:
+                        render_item(spec, item_id, statuses, options, baseline)
+
+        if pending_photos(session_photos(spec)):
+            poll_photo_jobs(spec)
+
+        if summary is not None:
+            changed = sum(1 for before, now in zip(baseline, statuses) if before != now)
+            summary.caption(f"Pré-preenchido da inspeção nº {st.session_state[f'{spec.key}_base']['id']}: "
+                            f"{changed} itens alterados desde então (destacados).")
 
-            with col5:
-                funcao_epc = st.text_input("Função/Cargo:", key="epc_funcao")
+        # Campo de observações
+        st.markdown("---")
+        observacoes = st.text_area(f"Observações - {title}:", key=f"{spec.key}_obs", height=100)
 
-            st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
 
-        # Checklist EPC
-        epc_data, epc_obs = create_checklist_section(
-            "CHECKLIST - EQUIPAMENTOS DE PROTEÇÃO COLETIVA",
-            get_epc_items(),
-            "epc",
-            ["A", "B", "C", "N/A"]
-        )
+        return statuses, observacoes
 
-        # Resultado e responsável
-        st.markdown('<div class="section-title">RESULTADO E RESPONSABILIDADE</div>', unsafe_allow_html=True)
 
-        with st.container():
-            st.markdown('<div class="section-card">', unsafe_allow_html=True)
+def prefill_baseline(spec):
+    """Vetor de status da inspeção usada no pré-preenchimento (None se a aba não foi pré-preenchida)"""
+    base = st.session_state.get(f"{spec.key}_base")
+    if base is None or len(base['statuses']) != spec.total_items():
+        return None
+    return base['statuses']
+
+
+def lookup_last_inspection(spec):
+    """``on_change`` da placa/matrícula: procura a última inspeção com esse valor (consulta por índice)"""
+    value = st.session_state.get(f"{spec.key}_{spec.prefill_field}", '').strip()
+    last = get_store().latest(spec.key, **{spec.prefill_field: value}) if value else None
+    st.session_state[f"{spec.key}_ultima"] = last
+    base = st.session_state.get(f"{spec.key}_base")
+    if base is not None and base['valor'] != value:
+        del st.session_state[f"{spec.key}_base"]
+
+
+def prefill_from_last(spec):
+    """``on_click`` do pré-preenchimento: copia cabeçalho e status da última inspeção numa só passada.
+
+    Roda antes do rerun, então os widgets já nascem com os valores novos;
+    os seletores dos itens são recriados a partir do vetor da sessão.
+    """
+    last = st.session_state.get(f"{spec.key}_ultima")
+    record = get_store().get(last['id']) if last else None
+    if record is None:
+        return
+    for field in PREFILL_FIELDS:
+        value = record['info_data'].get(field)
+        if field in spec.header_fields and value:
+            st.session_state[f"{spec.key}_{field}"] = value
+
+    statuses = set_session_statuses(spec, spec.encode(spec.decode_codes(record['por_codigo'])))
+    st.session_state[f"{spec.key}_base"] = {'id': record['id'], 'valor': record['info_data'][spec.prefill_field],
+                                            'statuses': array('B', statuses)}
+    for item_id in range(spec.total_items()):
+        st.session_state.pop(f"{spec.key}_{item_id}", None)
+    st.session_state[f"{spec.key}_ultima"] = None
+
+
+def render_header_fields(spec):
+    """Campos de dados da inspeção conforme o layout da spec; retorna os valores por campo"""
+    st.markdown(f'<div class="section-title">DADOS DA INSPEÇÃO - {spec.name}</div>', unsafe_allow_html=True)
+
+    values = {}
+    with st.container():
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
-            col1, col2 = st.columns(2)
+        for row in spec.header_layout:
+            for column, fields in zip(st.columns(len(row)), row):
+                with column:
+                    for field in fields:
+                        label, default = INFO_FIELD_LABELS[field]
+                        # Valor inicial pela sessão, não por value=: pré-preenchimento e rascunho gravam na chave
+                        key = f"{spec.key}_{field}"
+                        if field == 'data':
+                            st.session_state.setdefault(key, datetime.now().date())
+                            values[field] = st.date_input(label, key=key)
+                            continue
+                        st.session_state.setdefault(key, default)
+                        if field == spec.prefill_field:
+                            values[field] = st.text_input(label, key=key, on_change=lookup_last_inspection,
+                                                          args=(spec,))
+                        else:
+                            values[field] = st.text_input(label, key=key)
+
+        last = st.session_state.get(f"{spec.key}_ultima")
+        if last:
+            col1, col2 = st.columns([3, 1])
+            col1.info(f"Última inspeção de {last['info_data'][spec.prefill_field]}: nº {last['id']} em "
+                      f"{last['info_data']['data']} ({last['info_data']['colaborador'] or 'sem colaborador'}).")
+            col2.button("Preencher com a última inspeção", key=f"{spec.key}_preencher", on_click=prefill_from_last,
+                        args=(spec,))
 
-            with col1:
-                resultado_epc = st.radio(
-                    "Resultado da Inspeção:",
-                    ["Aprovado", "Reprovado", "Aprovado com Restrições"],
-                    key="epc_resultado",
-                    horizontal=True
-                )
+        st.markdown('</div>', unsafe_allow_html=True)
 
-            with col2:
-                responsavel_epc = st.text_input("Responsável pela Inspeção:", key="epc_responsavel")
+    return values
 
-            # Estatísticas
-            st.markdown("### Estatísticas da Inspeção")
 
-            col1, col2, col3, col4 = st.columns(4)
+def render_stats(spec, statuses):
+    """Cartões com a contagem de itens por status"""
+    st.markdown("### Estatísticas da Inspeção")
 
-            bom = sum(1 for status in epc_data.values() if status == "A")
-            solicitar = sum(1 for status in epc_data.values() if status == "B")
-            nao_liberar = sum(1 for status in epc_data.values() if status == "C")
-            na = sum(1 for status in epc_data.values() if status == "N/A")
+    counts = spec.count_statuses(statuses)
+    for column, (code, label, color), count in zip(st.columns(len(spec.statuses)), spec.statuses, counts):
+        with column:
+            st.markdown(
+                f'<div class="metric-card"><h3 style="color: {color}; margin: 0;">{count}</h3><p style="margin: 0;">{label}</p></div>',
+                unsafe_allow_html=True)
 
-            with col1:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #28a745; margin: 0;">{bom}</h3><p style="margin: 0;">Bom</p></div>',
-                    unsafe_allow_html=True)
 
-            with col2:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #ffc107; margin: 0;">{solicitar}</h3><p style="margin: 0;">Solicitar</p></div>',
-                    unsafe_allow_html=True)
+@st.cache_resource
+def get_store():
+    """Banco de inspeções compartilhado por todas as sessões do servidor
 
-            with col3:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #dc3545; margin: 0;">{nao_liberar}</h3><p style="margin: 0;">Não Liberar</p></div>',
-                    unsafe_allow_html=True)
+    SQLite em modo WAL: só processos da mesma máquina podem abrir o mesmo banco.
+    Réplicas em servidores diferentes (mesmo com ``CHECKLIST_STATE`` no Redis)
+    não compartilham as inspeções, e o banco não pode ficar num disco de rede.
+    """
+    return InspectionStore(specs=SPECS)
 
-            with col4:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #17a2b8; margin: 0;">{na}</h3><p style="margin: 0;">N/A</p></div>',
-                    unsafe_allow_html=True)
 
-            st.markdown('</div>', unsafe_allow_html=True)
+@st.cache_resource
+def get_state_backend():
+    """Backend de estado compartilhado entre réplicas (``CHECKLIST_STATE``); None = arquivos locais"""
+    return open_backend()
 
-        # Botão para gerar PDF EPC
-        st.markdown("---")
-        col1, col2, col3 = st.columns([1, 1, 1])
 
-        with col2:
-            if st.button("Gerar PDF - EPC", type="primary", use_container_width=True):
-                if responsavel_epc and any(epc_data.values()):
-                    info_data_epc = {
-                        'local': local_epc,
-                        'data': data_epc.strftime('%d/%m/%Y'),
-                        'empresa': empresa_epc,
-                        'placa': placa_epc,
-                        'veiculo': veiculo_epc,
-                        'matricula': matricula_epc,
-                        'colaborador': colaborador_epc,
-                        'funcao': funcao_epc,
-                        'responsavel': responsavel_epc,
-                        'observacoes': epc_obs,
-                        'resultado': resultado_epc
-                    }
+@st.cache_resource
+def get_photo_store():
+    """Processamento e armazenamento das fotos de evidência, compartilhado por todas as sessões"""
+    from photos import PhotoStore, photo_backend
+    return PhotoStore(photo_backend(get_state_backend()))
 
-                    try:
-                        with st.spinner("Gerando PDF..."):
-                            pdf_buffer = create_pdf_epc(epc_data, info_data_epc)
-
-                            filename = f"Checklist_EPC_{data_epc.strftime('%Y%m%d')}_{colaborador_epc.replace(' ', '_') if colaborador_epc else 'Usuario'}.pdf"
-
-                            st.download_button(
-                                label="Download PDF EPC",
-                                data=pdf_buffer.getvalue(),
-                                file_name=filename,
-                                mime="application/pdf",
-                                type="primary",
-                                use_container_width=True
-                            )
-                            st.success("PDF gerado com sucesso!")
-                    except Exception as e:
-                        st.error(f"Erro ao gerar PDF: {str(e)}")
-                else:
-                    st.error("Preencha o responsável e pelo menos um item do checklist.")
 
-    with tab2:
-        # Dados da inspeção EPI
-        st.markdown('<div class="section-title">DADOS DA INSPEÇÃO - EPI</div>', unsafe_allow_html=True)
+@st.cache_resource
+def get_pdf_queue():
+    """Fila de PDFs do servidor, compartilhada por todas as sessões"""
+    from pdf_cache import PdfCache
+    from pdf_jobs import PdfJobQueue
+    shared = get_state_backend()
+    return PdfJobQueue(cache=PdfCache(backend=shared and shared.namespace('pdf')))
+
 
-        with st.container():
-            st.markdown('<div class="section-card">', unsafe_allow_html=True)
+def render_pdf_download(spec):
+    """Andamento do último PDF pedido nesta aba e, quando pronto, o botão de download.
 
-            col1, col2, col3 = st.columns(3)
+    Um pedido restaurado do rascunho (sessão nova, talvez em outra réplica)
+    não tem ``job``: o PDF vem do cache pela chave de conteúdo.
+    """
+    pedido = st.session_state.get(f"{spec.key}_pdf")
+    if not pedido:
+        return
 
-            with col1:
-                empresa_epi = st.text_input("Empresa:", value="Rezende Energia", key="epi_empresa")
-                colaborador_epi = st.text_input("Nome do Colaborador:", key="epi_colaborador")
+    if 'job' in pedido:
+        job = get_pdf_queue().poll(pedido['job'])
+        pdf = job and job.pdf
+    else:
+        job = None
+        pdf = get_pdf_queue().cache.get(pedido['chave'])
+    if job is not None and not job.done:
+        poll_pdf_job(spec)
+    elif job is not None and job.erro is not None:
+        st.error(f"Erro ao gerar PDF: {job.erro}")
+    elif pdf is None:
+        st.warning("O PDF não está mais disponível. Gere novamente.")
+    else:
+        st.download_button(
+            label=f"Download PDF {spec.name}",
+            data=pdf,
+            file_name=pedido['arquivo'],
+            mime="application/pdf",
+            type="primary",
+            use_container_width=True,
+            key=f"{spec.key}_download"
+        )
+        st.success(f"PDF gerado com sucesso! Inspeção nº {pedido['inspecao']} registrada.")
+
+
+@st.fragment(run_every=PDF_POLL_SECONDS)
+def poll_pdf_job(spec):
+    """Só existe enquanto o PDF está na fila: consulta o pedido periodicamente sem travar a sessão"""
+    job = get_pdf_queue().poll(st.session_state[f"{spec.key}_pdf"]['job'])
+    if job is None or job.done:
+        st.rerun()  # rerun completo: mostra o download e desliga a consulta periódica
+    st.info("Gerando PDF...")
+
+
+def header_values(spec):
+    """Valores atuais dos campos de cabeçalho, lidos do session state"""
+    return {field: st.session_state.get(f"{spec.key}_{field}", '') for field in spec.header_fields}
+
+
+def draft_values(spec):
+    """Estado do formulário de uma aba no formato do rascunho: campos por chave e status por código do item"""
+    values = {key: st.session_state.get(key) or None
+              for key in [f"{spec.key}_{field}" for field in spec.header_fields if field != 'data']
+              + [f"{spec.key}_responsavel", f"{spec.key}_obs", f"{spec.key}_resultado"]}
+    data_inspecao = st.session_state.get(f"{spec.key}_data")
+    values[f"{spec.key}_data"] = data_inspecao.isoformat() if data_inspecao else None
+    # O último PDF vai sem o id do pedido, que só vale na fila desta réplica
+    pedido = st.session_state.get(f"{spec.key}_pdf")
+    values[f"{spec.key}_pdf"] = ({field: pedido[field] for field in ('chave', 'arquivo', 'inspecao')}
+                                 if pedido else None)
+    # Fotos pelo hash (o conteúdo fica no armazenamento de fotos), por código do item
+    values[f"{spec.key}_fotos"] = {spec.catalog.item_codes[item_id]: keys
+                                   for item_id, keys in session_photos(spec).items() if keys} or None
+    statuses = session_statuses(spec)
+    codes = spec.status_codes
+    for item_id, code in enumerate(spec.catalog.item_codes):
+        values[f"{spec.key}:{code}"] = codes[statuses[item_id] - 1] if statuses[item_id] else None
+    return values
+
+
+def restore_draft(spec, state):
+    """Devolve ao session state os campos e status de uma aba gravados no rascunho"""
+    prefix = f"{spec.key}:"
+    by_code = {}
+    for key, value in state.items():
+        if key.startswith(prefix):
+            by_code[key[len(prefix):]] = value
+        elif key == f"{spec.key}_data":
+            st.session_state[key] = datetime.fromisoformat(value).date()
+        elif key == f"{spec.key}_fotos":
+            item_ids = {code: item_id for item_id, code in enumerate(spec.catalog.item_codes)}
+            st.session_state[key] = {item_ids[code]: list(keys) for code, keys in value.items() if code in item_ids}
+        elif key.startswith(f"{spec.key}_"):
+            st.session_state[key] = value
+    set_session_statuses(spec, spec.encode(spec.decode_codes(by_code)))
+
+
+@st.cache_resource
+def purge_old_drafts():
+    """Limpa os rascunhos abandonados uma vez por processo"""
+    return purge_drafts(draft_backend(get_state_backend()))
+
+
+def open_draft():
+    """Rascunho da sessão, identificado pelo ``?rascunho=`` da URL.
+
+    Uma sessão nova (websocket que caiu, aba recarregada, outra réplica com
+    o mesmo backend) com o mesmo id na URL reabre o diário e restaura o
+    formulário antes de os widgets nascerem.
+    """
+    draft = st.session_state.get('rascunho')
+    if draft is not None:
+        return draft
+
+    purge_old_drafts()
+    draft_id = st.query_params.get('rascunho')
+    if not valid_draft_id(draft_id):
+        draft_id = st.query_params['rascunho'] = new_draft_id()
+    draft = st.session_state.rascunho = DraftJournal(draft_id, draft_backend(get_state_backend()))
+    if draft.state:
+        for spec in SPECS.values():
+            restore_draft(spec, draft.state)
+        st.toast("Rascunho restaurado.")
+    return draft
+
+
+def autosave_draft(spec):
+    """Registra no rascunho o que mudou na aba (gravação agrupada pelo diário).
+
+    A aba com a inspeção recém-gravada fica fora do rascunho até ser alterada:
+    reabrir o link não traz de volta uma inspeção já enviada.
+    """
+    draft = st.session_state.get('rascunho')
+    if draft is None:
+        return
+    values = draft_values(spec)
+    if st.session_state.get(f"{spec.key}_enviada") == values:
+        return
+    st.session_state.pop(f"{spec.key}_enviada", None)
+    draft.update(values)
+
+
+def restart_draft(keep=()):
+    """Apaga o rascunho da sessão e abre outro, com novo id na URL; ``keep`` são as abas que vão para o novo"""
+    draft = st.session_state.get('rascunho')
+    if draft is not None:
+        draft.discard()
+    draft_id = st.query_params['rascunho'] = new_draft_id()
+    draft = st.session_state.rascunho = DraftJournal(draft_id, draft_backend(get_state_backend()))
+    for spec in keep:
+        draft.update(draft_values(spec))
+
+
+def clear_form():
+    """Esvazia as abas de checklist (campos, status, fotos e PDF) e descarta o rascunho"""
+    prefixes = tuple(f"{spec.key}_" for spec in SPECS.values())
+    for key in [key for key in st.session_state if key.startswith(prefixes)]:
+        del st.session_state[key]
+    st.session_state.checklist_data = {}
+    restart_draft()
+
+
+def render_checklist_tab(spec):
+    """Corpo completo de uma aba de checklist: cabeçalho, itens, resultado, estatísticas e PDF"""
+    render_header_fields(spec)
+    render_checklist_body(spec)
+
+
+@st.fragment
+@timed('fragment_rerun')
+def render_checklist_body(spec):
+    """Itens, resultado, estatísticas e PDF de um checklist.
+
+    Roda como fragmento: mudar um status reexecuta só este trecho da aba, e
+    não o script inteiro (título, sidebar, cabeçalho e a outra aba).
+    """
+    statuses, observacoes = create_checklist_section(spec)
+
+    # Resultado e responsável
+    st.markdown('<div class="section-title">RESULTADO E RESPONSABILIDADE</div>', unsafe_allow_html=True)
+
+    with st.container():
+        st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
+        col1, col2 = st.columns(2)
 
-            with col2:
-                data_epi = st.date_input("Data:", datetime.now(), key="epi_data")
-                local_epi = st.text_input("Local:", key="epi_local")
+        with col1:
+            resultado = st.radio(
+                "Resultado da Inspeção:",
+                RESULTADO_OPTIONS,
+                key=f"{spec.key}_resultado",
+                horizontal=True
+            )
 
-            with col3:
-                matricula_epi = st.text_input("Matrícula:", key="epi_matricula")
-                funcao_epi = st.text_input("Função/Cargo:", key="epi_funcao")
+        with col2:
+            responsavel = st.text_input("Responsável pela Inspeção:", key=f"{spec.key}_responsavel")
 
-            st.markdown('</div>', unsafe_allow_html=True)
+        render_stats(spec, statuses)
 
-        # Checklist EPI
-        epi_data, epi_obs = create_checklist_section(
-            "CHECKLIST - EQUIPAMENTOS DE PROTEÇÃO INDIVIDUAL",
-            get_epi_items(),
-            "epi",
-            ["C", "NC", "NR", "N/A"]
-        )
+        st.markdown('</div>', unsafe_allow_html=True)
 
-        # Resultado e responsável
-        st.markdown('<div class="section-title">RESULTADO E RESPONSABILIDADE</div>', unsafe_allow_html=True)
+    # Botão para gerar PDF
+    st.markdown("---")
+    col1, col2, col3 = st.columns([1, 1, 1])
+
+    with col2:
+        # Fotos só dos itens ainda não conformes; enquanto alguma é processada o botão espera por ela
+        fotos = nonconforming_photos(spec, statuses)
+        processando = pending_photos(fotos)
+        if processando:
+            st.caption("Aguardando o processamento das fotos...")
+        if st.button(f"Gerar PDF - {spec.name}", type="primary", use_container_width=True, disabled=processando):
+            if responsavel and any(statuses):
+                header = header_values(spec)
+                data_inspecao = header['data']
+                info_data = {field: header.get(field, '') for field in INFO_FIELD_LABELS}
+                info_data.update({
+                    'data': data_inspecao.strftime('%d/%m/%Y'),
+                    'responsavel': responsavel,
+                    'observacoes': observacoes,
+                    'resultado': resultado
+                })
+
+                from photos import PRONTO
+                store = get_photo_store()
+                perdidas = {key for keys in fotos.values() for key in keys if store.status(key)[0] != PRONTO}
+                if perdidas:
+                    st.warning(f"{len(perdidas)} foto(s) não puderam ser processadas e ficaram fora do PDF.")
+                fotos = {item_id: [key for key in keys if key not in perdidas] for item_id, keys in fotos.items()}
+                fotos = {item_id: keys for item_id, keys in fotos.items() if keys}
+
+                try:
+                    data = spec.decode(statuses)
+                    fotos_por_nome = {spec.item_names[item_id]: keys for item_id, keys in fotos.items()}
+                    # Gerar de novo sem mudar nada baixa o PDF outra vez, sem gravar outra inspeção
+                    conteudo = pdf_key(spec, data, info_data, fotos=fotos_por_nome)
+                    salva = st.session_state.get(f"{spec.key}_salva")
+                    if salva is not None and salva['conteudo'] == conteudo:
+                        inspection_id = salva['id']
+                    else:
+                        inspection_id = get_store().save(spec.key, statuses, info_data, fotos={
+                            spec.catalog.item_codes[item_id]: keys for item_id, keys in fotos.items()
+                        })
+                        st.session_state[f"{spec.key}_salva"] = {'conteudo': conteudo, 'id': inspection_id}
+                        # A inspeção gravada sai do rascunho; o das outras abas continua num rascunho novo
+                        restart_draft(keep=[other for other in SPECS.values() if other is not spec])
+                    st.session_state.checklist_data[spec.key] = inspection_id
+
+                    colaborador = header.get('colaborador', '')
+                    filename = f"Checklist_{spec.name}_{data_inspecao.strftime('%Y%m%d')}_{colaborador.replace(' ', '_') if colaborador else 'Usuario'}.pdf"
+
+                    # Horário do rodapé na resolução impressa (minutos): pedidos repetidos
+                    # com as mesmas entradas saem do cache de PDFs
+                    generated_at = datetime.now().replace(second=0, microsecond=0)
+                    fotos = fotos_por_nome
+                    cache_key = pdf_key(spec, data, info_data, generated_at=generated_at, fotos=fotos)
+                    st.session_state[f"{spec.key}_pdf"] = {
+                        'job': get_pdf_queue().submit(spec.key, data, info_data, generated_at=generated_at,
+                                                      cache_key=cache_key, fotos=fotos),
+                        'chave': cache_key,
+                        'arquivo': filename,
+                        'inspecao': inspection_id,
+                    }
+                    st.session_state[f"{spec.key}_enviada"] = draft_values(spec)
+                except Exception as e:
+                    st.error(f"Erro ao gerar PDF: {str(e)}")
+            else:
+                st.error("Preencha o responsável e pelo menos um item do checklist.")
+
+        render_pdf_download(spec)
+
+    autosave_draft(spec)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_fleet_report(tipo, watermark):
+    """Relatório da frota em cache; ``watermark`` do banco invalida quando chegam inspeções novas"""
+    from analytics import build_report  # pandas só é carregado ao abrir as análises
+    rows, catalogs = get_store().history(tipo)
+    return build_report(rows, catalogs, SPECS[tipo].nonconforming)
+
+
+@st.fragment
+def render_dashboard_tab():
+    """Painel da frota: não conformidade por item, rankings por placa/colaborador e tendência semanal"""
+    st.markdown('<div class="section-title">ANÁLISES DA FROTA</div>', unsafe_allow_html=True)
+
+    tipo = st.radio("Checklist:", list(SPECS), format_func=lambda key: SPECS[key].name,
+                    key="dashboard_tipo", horizontal=True)
+    spec = SPECS[tipo]
+    report = load_fleet_report(tipo, get_store().watermark())
+
+    if not report['inspecoes']:
+        st.info("Nenhuma inspeção registrada ainda.")
+        return
+
+    semanal = report['semanal']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Inspeções", report['inspecoes'])
+    col2.metric("Reprovadas", int(semanal['reprovadas'].sum()))
+    col3.metric(f"Itens {'/'.join(spec.nonconforming)}", int(semanal['nao_conformes'].sum()))
+
+    st.markdown("### Não conformidade por item")
+    st.dataframe(report['itens'].head(20), column_config={
+        'taxa_nc': st.column_config.ProgressColumn("Taxa", format="percent", min_value=0, max_value=1)
+    })
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### Veículos (placa)")
+        st.dataframe(report['veiculos'].head(20))
+    with col2:
+        st.markdown("### Colaboradores")
+        st.dataframe(report['colaboradores'].head(20))
+
+    st.markdown("### Tendência semanal")
+    st.line_chart(semanal[['inspecoes', 'nao_conformes']])
+
+
+@st.fragment
+def render_import_tab():
+    """Importação de inspeções digitadas em planilha (CSV/XLSX), com relatório de erros por linha"""
+    st.markdown('<div class="section-title">IMPORTAR PLANILHA</div>', unsafe_allow_html=True)
+    st.caption("Uma inspeção por linha: coluna tipo (epc/epi), campos do cabeçalho (local, data, empresa, placa, "
+               "..., responsavel, resultado) e uma coluna por item com o status.")
+
+    import bulk_import  # pandas só é carregado quando a aba é aberta
+    col1, col2 = st.columns(2)
+    for column, spec in zip((col1, col2), SPECS.values()):
+        column.download_button(f"Modelo {spec.name} (CSV)", bulk_import.template_csv(spec),
+                               file_name=f"modelo_{spec.key}.csv", mime="text/csv",
+                               key=f"importacao_modelo_{spec.key}")
+
+    arquivo = st.file_uploader("Planilha:", type=['csv', 'xlsx'], key="importacao_arquivo")
+    if arquivo is None:
+        st.session_state.pop('importacao', None)
+        return
+
+    col1, col2 = st.columns(2)
+    validar = col1.button("Validar", key="importacao_validar")
+    importar = col2.button("Importar linhas válidas", key="importacao_gravar")
+    if validar or importar:
+        try:
+            st.session_state.importacao = bulk_import.import_table(
+                get_store(), SPECS, arquivo, name=arquivo.name, resultados=RESULTADO_OPTIONS, dry_run=not importar
+            )
+        except (ValueError, RuntimeError) as e:
+            st.error(f"Não foi possível ler a planilha: {e}")
+            return
+
+    resultado = st.session_state.get('importacao')
+    if resultado is None:
+        return
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Linhas", resultado['linhas'])
+    col2.metric("Válidas", resultado['validas'])
+    col3.metric("Importadas", resultado['importadas'])
+    col4.metric("Com erro", len(resultado['erros']))
+    if resultado['importadas']:
+        st.success(f"{resultado['importadas']} inspeções gravadas em {resultado['segundos']:.1f}s.")
+    if len(resultado['erros']):
+        st.dataframe(resultado['erros'], hide_index=True)
+        st.download_button("Baixar relatório de erros", resultado['erros'].to_csv(index=False).encode('utf-8-sig'),
+                           file_name="erros_importacao.csv", mime="text/csv", key="importacao_erros")
+
+
+def _replace_export(key, path, name, **resultado):
+    """Guarda em ``st.session_state[key]`` o arquivo gerado, apagando o anterior"""
+    anterior = st.session_state.pop(key, None)
+    if anterior is not None and os.path.exists(anterior['arquivo']):
+        os.remove(anterior['arquivo'])
+    st.session_state[key] = {'arquivo': path, 'nome': name, **resultado}
+
+
+@st.fragment
+def render_supervisor_exports():
+    """Relatório consolidado (um PDF com índice) e ZIP com os PDFs das inspeções filtradas"""
+    st.markdown('<div class="section-title">RELATÓRIO CONSOLIDADO E EXPORTAÇÃO</div>', unsafe_allow_html=True)
+
+    hoje = datetime.now().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        periodo = st.date_input("Período:", value=(hoje - timedelta(days=30), hoje), format="DD/MM/YYYY",
+                                key="relatorio_periodo")
+        tipo = st.selectbox("Checklist:", [''] + list(SPECS), key="relatorio_tipo",
+                            format_func=lambda key: SPECS[key].name if key else "Todos")
+        responsavel = st.text_input("Responsável:", key="relatorio_responsavel")
+    with col2:
+        placa = st.text_input("Placa:", key="relatorio_placa")
+        matricula = st.text_input("Matrícula:", key="relatorio_matricula")
+        colaborador = st.text_input("Colaborador:", key="relatorio_colaborador")
+
+    inicio, fim = (tuple(periodo) + (None, None))[:2]
+    subtitle = ' a '.join(value.strftime('%d/%m/%Y') for value in (inicio, fim) if value)
+
+    def find(limit):
+        """Inspeções filtradas em ordem cronológica (no máximo ``limit``, as mais recentes)"""
+        headers = get_store().find(inicio and inicio.isoformat(), fim and fim.isoformat(), limit=limit + 1,
+                                   tipo=tipo, placa=placa.strip(), matricula=matricula.strip(),
+                                   colaborador=colaborador.strip(), responsavel=responsavel.strip())
+        if not headers:
+            st.warning("Nenhuma inspeção encontrada com esses filtros.")
+        elif len(headers) > limit:
+            st.warning(f"Mais de {limit} inspeções: só as {limit} mais recentes entram. "
+                       "Para períodos maiores use `python pdf_report.py` ou `python pdf_export.py`.")
+        return headers[:limit][::-1]
+
+    col1, col2 = st.columns(2)
+    if col1.button("Gerar relatório consolidado", key="relatorio_gerar"):
+        headers = find(REPORT_LIMIT)
+        if headers:
+            fd, path = tempfile.mkstemp(suffix='.pdf', prefix='relatorio_')
+            with st.spinner(f"Gerando relatório com {len(headers)} inspeções..."), os.fdopen(fd, 'wb') as f:
+                resultado = create_consolidated_pdf(get_store(), headers, f,
+                                                    subtitle=f"Período: {subtitle}" if subtitle else '')
+            _replace_export('relatorio', path, f"Relatorio_Consolidado_{hoje.strftime('%Y%m%d')}.pdf", **resultado)
+
+    if col2.button("Exportar PDFs (ZIP)", key="exportacao_gerar"):
+        headers = find(EXPORT_LIMIT)
+        if headers:
+            from pdf_export import ZipExport
+            fd, path = tempfile.mkstemp(suffix='.zip', prefix='exportacao_')
+            with st.spinner(f"Exportando {len(headers)} PDFs..."), os.fdopen(fd, 'wb') as f:
+                resultado = ZipExport(iter_archived_pdfs(get_store(), headers, get_pdf_queue())).write_to(f)
+            _replace_export('exportacao', path, f"Checklists_{hoje.strftime('%Y%m%d')}.zip", **resultado)
+
+    relatorio = st.session_state.get('relatorio')
+    if relatorio is not None and os.path.exists(relatorio['arquivo']):
+        st.success(f"Relatório com {relatorio['inspecoes']} inspeções e {relatorio['paginas']} páginas.")
+        if relatorio.get('ausentes'):
+            st.warning(f"{relatorio['ausentes']} inspeções foram apagadas durante a geração e ficaram de fora.")
+        with open(relatorio['arquivo'], 'rb') as f:
+            st.download_button("Baixar relatório consolidado", f, file_name=relatorio['nome'],
+                               mime="application/pdf", key="relatorio_download")
+
+    exportacao = st.session_state.get('exportacao')
+    if exportacao is not None and os.path.exists(exportacao['arquivo']):
+        st.success(f"ZIP com {exportacao['arquivos']} PDFs ({exportacao['bytes'] / 1024 / 1024:.1f} MB).")
+        for erro in exportacao['erros']:
+            st.error(erro)
+        with open(exportacao['arquivo'], 'rb') as f:
+            st.download_button("Baixar ZIP", f, file_name=exportacao['nome'], mime="application/zip",
+                               key="exportacao_download")
+
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Endpoint /metrics do Prometheus, um por servidor (se ``CHECKLIST_METRICS_PORT`` estiver definido)"""
+    return metrics.serve()
+
+
+@st.cache_resource
+def start_api_endpoint():
+    """API HTTP no mesmo processo do app (``CHECKLIST_API_PORT``), com o banco e a fila de PDFs das sessões
+
+    Não sobe sem ``CHECKLIST_API_TOKEN`` (retorna None).
+    """
+    import api
+    if not api.API_TOKEN:
+        return None
+    app = api.ChecklistApi(get_store(), get_pdf_queue(), SPECS, iter_archived_pdfs, resultados=RESULTADO_OPTIONS)
+    return api.serve(app)
+
+
+def render_metrics_panel():
+    """Painel de administração com os histogramas das etapas instrumentadas"""
+    with st.expander("Métricas (admin)"):
+        snapshot = metrics.snapshot()
+        if not snapshot:
+            st.caption("Nenhuma medição ainda.")
+            return
+        rows = ["| Etapa | N | p50 | p95 | p99 |", "|---|---:|---:|---:|---:|"]
+        for name, values in snapshot.items():
+            p50, p95, p99 = (f"{values[p] * 1000:.0f} ms" for p in ('p50', 'p95', 'p99'))
+            rows.append(f"| {name} | {values['count']} | {p50} | {p95} | {p99} |")
+        st.markdown('\n'.join(rows))
+        st.download_button("Exportar (Prometheus)", metrics.prometheus_text(), file_name="metrics.prom",
+                           mime="text/plain")
+
+
+def render_profile_panel():
+    """Resumo do perfil do rerun anterior desta sessão (o atual só termina depois da sidebar).
+
+    O perfil cobre todas as threads do processo durante o rerun (no Python 3.12+), não só esta sessão.
+    """
+    with st.expander("Profiling", expanded=True):
+        if st.session_state.get('profile_skipped'):
+            st.caption("O rerun anterior rodou sem profiling: outro perfil estava ativo no servidor.")
+        summary = st.session_state.get('profile_summary')
+        if summary is None:
+            st.caption("O resumo aparece a partir do próximo rerun.")
+            return
+        st.caption(f"Perfil salvo em {st.session_state.get('profile_path') or '(não salvo)'}")
+        st.code(summary, language=None)
 
-        with st.container():
-            st.markdown('<div class="section-card">', unsafe_allow_html=True)
 
-            col1, col2 = st.columns(2)
+def main():
+    """Ponto de entrada do script; com profiling ligado, cada execução roda sob o cProfile"""
+    if not profiling.requested(st.query_params.get('profile')):
+        render_app()
+        return
 
-            with col1:
-                resultado_epi = st.radio(
-                    "Resultado da Inspeção:",
-                    ["Aprovado", "Reprovado", "Aprovado com Restrições"],
-                    key="epi_resultado",
-                    horizontal=True
-                )
+    profile = profiling.Profile('rerun')
+    try:
+        with profile:
+            render_app(show_profile=True)
+    finally:
+        st.session_state.profile_skipped = profile.skipped
+        if not profile.skipped:
+            st.session_state.profile_summary = profile.summary
+            st.session_state.profile_path = profile.path
 
-            with col2:
-                responsavel_epi = st.text_input("Responsável pela Inspeção:", key="epi_responsavel")
 
-            # Estatísticas
-            st.markdown("### Estatísticas da Inspeção")
+@timed('rerun')
+def render_app(show_profile=False):
+    setup_page()
 
-            col1, col2, col3, col4 = st.columns(4)
+    # Inicializar session state
+    if 'checklist_data' not in st.session_state:
+        st.session_state.checklist_data = {}
+    open_draft()
 
-            conforme = sum(1 for status in epi_data.values() if status == "C")
-            nao_conforme = sum(1 for status in epi_data.values() if status == "NC")
-            nao_recebeu = sum(1 for status in epi_data.values() if status == "NR")
-            na_epi = sum(1 for status in epi_data.values() if status == "N/A")
+    # Título principal com logo
+    logo_base64 = load_logo_base64()
 
-            with col1:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #28a745; margin: 0;">{conforme}</h3><p style="margin: 0;">Conforme</p></div>',
-                    unsafe_allow_html=True)
+    st.markdown(f'''
+    <div class="main-title" style="display: flex; align-items: center; justify-content: center;">
+        <img src="data:image/png;base64,{logo_base64}" 
+             alt="Logo Rezende" style="height: 60px; margin-right: 2rem; filter: brightness(0) invert(1);">
+        <div>
+            <h1>Sistema de Checklist EPC/EPI</h1>
+            <p class="subtitle">Equipamentos de Proteção Coletiva e Individual - Rezende Energia</p>
+        </div>
+    </div>
+    ''', unsafe_allow_html=True)
 
-            with col2:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #dc3545; margin: 0;">{nao_conforme}</h3><p style="margin: 0;">Não Conforme</p></div>',
-                    unsafe_allow_html=True)
+    # Sidebar com informações
+    with st.sidebar:
+        st.markdown("### Informações do Sistema")
 
-            with col3:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #ffc107; margin: 0;">{nao_recebeu}</h3><p style="margin: 0;">Não Recebeu</p></div>',
-                    unsafe_allow_html=True)
+        for spec in SPECS.values():
+            st.info(f"**{spec.badge}:** {spec.total_items()} itens")
+        st.success("**Status:** Online")
+        st.markdown("**Versão:** 2.0")
 
+        if st.button("Limpar Formulário", type="secondary"):
+            clear_form()
+            st.rerun()
 
-            with col4:
-                st.markdown(
-                    f'<div class="metric-card"><h3 style="color: #17a2b8; margin: 0;">{na_epi}</h3><p style="margin: 0;">N/A</p></div>',
-                    unsafe_allow_html=True)
+        if metrics.ENABLED:
+            start_metrics_endpoint()
+            render_metrics_panel()
 
-            st.markdown('</div>', unsafe_allow_html=True)
+        if API_PORT and start_api_endpoint() is None:
+            st.warning("API desligada: defina `CHECKLIST_API_TOKEN` para usar `CHECKLIST_API_PORT`.")
 
-        # Botão para gerar PDF EPI
-        st.markdown("---")
-        col1, col2, col3 = st.columns([1, 1, 1])
+        if show_profile:
+            render_profile_panel()
 
-        with col2:
-            if st.button("Gerar PDF - EPI", type="primary", use_container_width=True):
-                if responsavel_epi and any(epi_data.values()):
-                    info_data_epi = {
-                        'local': local_epi,
-                        'data': data_epi.strftime('%d/%m/%Y'),
-                        'empresa': empresa_epi,
-                        'placa': '',  # Removido para EPI
-                        'veiculo': '',  # Removido para EPI
-                        'matricula': matricula_epi,
-                        'colaborador': colaborador_epi,
-                        'funcao': funcao_epi,
-                        'responsavel': responsavel_epi,
-                        'observacoes': epi_obs,
-                        'resultado': resultado_epi
-                    }
+    # Navegação por tabs
+    *tabs, dashboard_tab, import_tab = st.tabs(
+        [spec.tab_label for spec in SPECS.values()] + ["Análises da Frota", "Importar Planilha"],
+        key="abas", on_change="rerun"
+    )
 
-                    try:
-                        with st.spinner("Gerando PDF..."):
-                            pdf_buffer = create_pdf_epi(epi_data, info_data_epi)
-
-                            filename = f"Checklist_EPI_{data_epi.strftime('%Y%m%d')}_{colaborador_epi.replace(' ', '_') if colaborador_epi else 'Usuario'}.pdf"
-
-                            st.download_button(
-                                label="Download PDF EPI",
-                                data=pdf_buffer.getvalue(),
-                                file_name=filename,
-                                mime="application/pdf",
-                                type="primary",
-                                use_container_width=True
-                            )
-                            st.success("PDF gerado com sucesso!")
-                    except Exception as e:
-                        st.error(f"Erro ao gerar PDF: {str(e)}")
-                else:
-                    st.error("Preencha o responsável e pelo menos um item do checklist.")
+    for tab, spec in zip(tabs, SPECS.values()):
+        with tab:
+            render_checklist_tab(spec)
+
+    # As abas de checklist rodam sempre (preservam os campos preenchidos); as análises e a
+    # importação (e o pandas) só quando a aba está aberta
+    if dashboard_tab.open:
+        with dashboard_tab:
+            render_dashboard_tab()
+            render_supervisor_exports()
+    if import_tab.open:
+        with import_tab:
+            render_import_tab()
+
+    metrics.export()
 
 
 if __name__ == "__main__":
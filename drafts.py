@@ -0,0 +1,144 @@
+"""Rascunhos do checklist gravados fora da sessão, para sobreviver à queda dela.
+
+Cada rascunho é um diário só de acréscimos (``<id>.jsonl``, num diretório
+local ou no backend compartilhado de ``state_backend``): cada gravação
+acrescenta uma linha JSON com as chaves que mudaram desde a anterior
+(``null`` apaga a chave). As mudanças são agrupadas e gravadas no máximo a
+cada ``DEBOUNCE_SECONDS``; a cada ``COMPACT_RECORDS`` linhas o diário é
+reescrito como uma única linha com o estado completo. Reabrir um rascunho é
+uma leitura do diário inteiro, aplicando as linhas na ordem.
+"""
+import json
+import os
+import secrets
+import threading
+
+from state_backend import FileBackend
+
+DEFAULT_DRAFT_DIR = os.environ.get('CHECKLIST_DRAFTS', 'rascunhos')
+
+# Espera entre a última mudança e a gravação; mudanças nesse intervalo saem numa linha só
+DEBOUNCE_SECONDS = 1.0
+
+# Linhas no diário antes de compactá-lo num retrato do estado
+COMPACT_RECORDS = 200
+
+# Rascunhos sem mudança há mais tempo que isso são apagados
+MAX_AGE_SECONDS = 7 * 24 * 3600
+
+
+def new_draft_id():
+    return secrets.token_hex(8)
+
+
+def valid_draft_id(draft_id):
+    """Ids vêm da URL: só hexadecimal, para não virarem caminhos fora do diretório"""
+    return bool(draft_id) and len(draft_id) <= 32 and all(char in '0123456789abcdef' for char in draft_id)
+
+
+def draft_backend(shared=None):
+    """Onde ficam os rascunhos: o espaço ``rascunhos`` do backend compartilhado ou ``DEFAULT_DRAFT_DIR``"""
+    return shared.namespace('rascunhos') if shared is not None else FileBackend(DEFAULT_DRAFT_DIR)
+
+
+def purge_drafts(backend=None, max_age=MAX_AGE_SECONDS):
+    """Apaga os rascunhos abandonados; retorna quantos foram apagados (no Redis eles expiram sozinhos)"""
+    return (backend or draft_backend()).purge(max_age)
+
+
+class DraftJournal:
+    """Diário de um rascunho: ``state`` é o último estado conhecido, ``update`` registra as mudanças.
+
+    Os valores são escalares JSON. A gravação é feita por um timer após
+    ``debounce`` segundos sem mudanças (``debounce=0`` grava na hora) e pode
+    ser forçada com ``flush``. Uma linha final cortada por uma queda no meio
+    da escrita é ignorada na leitura e removida na gravação seguinte.
+    """
+
+    def __init__(self, draft_id, backend=None, debounce=DEBOUNCE_SECONDS, compact_records=COMPACT_RECORDS):
+        self.draft_id = draft_id
+        self.backend = backend or draft_backend()
+        self.name = f"{draft_id}.jsonl"
+        self.debounce = debounce
+        self.compact_records = compact_records
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+        self.state, self.records = self._read()
+
+    def _read(self):
+        state = {}
+        lines, complete = self.backend.read_log(self.name)
+        for line in lines:
+            try:
+                changes = json.loads(line)
+            except ValueError:
+                # Escrita interrompida: a próxima gravação compacta, descartando o resto do diário
+                return state, self.compact_records
+            for key, value in changes.items():
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+        return state, len(lines) if complete else self.compact_records
+
+    def update(self, values):
+        """Registra os valores atuais de algumas chaves (``None`` = vazia); retorna quantas mudaram"""
+        with self._lock:
+            changed = 0
+            for key, value in values.items():
+                if self.state.get(key) == value:
+                    continue
+                if value is None:
+                    del self.state[key]
+                else:
+                    self.state[key] = value
+                self._pending[key] = value
+                changed += 1
+            if changed:
+                if self.debounce <= 0:
+                    self._write()
+                else:
+                    # Cada mudança adia a gravação: uma sequência de cliques vira uma linha
+                    if self._timer is not None:
+                        self._timer.cancel()
+                    self._timer = threading.Timer(self.debounce, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+            return changed
+
+    def flush(self):
+        """Grava as mudanças pendentes agora"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write()
+
+    def _write(self):
+        """Acrescenta as mudanças pendentes ao diário (chamado com o lock), compactando quando ele cresce"""
+        if not self._pending:
+            return
+        if self.records >= self.compact_records:
+            # Retrato do estado numa troca atômica do diário (rename no disco, MULTI/EXEC no Redis)
+            self.backend.replace_log(self.name, [_dumps(self.state)], ttl=MAX_AGE_SECONDS)
+            self.records = 1
+        else:
+            self.backend.append(self.name, _dumps(self._pending), ttl=MAX_AGE_SECONDS)
+            self.records += 1
+        self._pending = {}
+
+    def discard(self):
+        """Apaga o rascunho (inspeção enviada ou descartada)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = {}
+            self.state = {}
+            self.records = 0
+            self.backend.delete(self.name)
+
+
+def _dumps(values):
+    return json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
@@ -0,0 +1,180 @@
+"""Instrumentação opcional dos caminhos críticos (rerun, seções, PDF, logo, banco).
+
+Ligada por ``CHECKLIST_METRICS=1``; desligada, ``timed`` não mede nada. Cada
+etapa vira um histograma com buckets fixos (como os do Prometheus), de onde
+saem contagem, soma e p50/p95/p99. Os resultados aparecem no painel de
+administração da sidebar e no formato texto do Prometheus, gravado em
+``CHECKLIST_METRICS_FILE`` e/ou servido em ``CHECKLIST_METRICS_PORT`` (/metrics).
+"""
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('CHECKLIST_METRICS', '').lower() in ('1', 'true', 'sim', 'yes')
+METRICS_FILE = os.environ.get('CHECKLIST_METRICS_FILE', '')
+METRICS_PORT = int(os.environ.get('CHECKLIST_METRICS_PORT', '0'))
+
+# Limites superiores dos buckets, em segundos
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Contagens por bucket, soma e total de uma etapa"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimativa do quantil por interpolação linear dentro do bucket (como ``histogram_quantile``)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[index - 1] if index else 0.0
+                return lower + (BUCKETS[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return BUCKETS[-1]
+
+
+_lock = threading.Lock()
+_histograms = {}
+_capture = threading.local()
+
+
+def observe(name, seconds):
+    """Registra uma duração da etapa ``name``"""
+    captured = getattr(_capture, 'observations', None)
+    if captured is not None:
+        captured.append((name, seconds))
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+def record_many(observations):
+    """Registra observações vindas de outro processo (ver ``capture``)"""
+    for name, seconds in observations:
+        observe(name, seconds)
+
+
+@contextlib.contextmanager
+def capture():
+    """Guarda as observações da thread numa lista em vez do registro (para devolver do pool de PDFs)"""
+    observations = []
+    _capture.observations = observations
+    try:
+        yield observations
+    finally:
+        _capture.observations = None
+
+
+class timed(contextlib.ContextDecorator):
+    """Mede a duração de um bloco ou função como etapa ``name`` (só com as métricas ligadas)"""
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        if ENABLED:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            observe(self.name, time.perf_counter() - self._start)
+            self._start = None
+        return False
+
+    def _recreate_cm(self):
+        # Cada chamada da função decorada precisa do seu próprio início (chamadas concorrentes)
+        return timed(self.name)
+
+
+def snapshot():
+    """{etapa: {'count', 'sum', 'p50', 'p95', 'p99'}} com tempos em segundos"""
+    with _lock:
+        result = {}
+        for name, histogram in sorted(_histograms.items()):
+            result[name] = {'count': histogram.count, 'sum': histogram.sum}
+            for q in QUANTILES:
+                result[name][f"p{round(q * 100)}"] = histogram.quantile(q)
+        return result
+
+
+def prometheus_text():
+    """Histogramas no formato texto de exposição do Prometheus"""
+    lines = [
+        '# HELP checklist_step_seconds Duração das etapas críticas do checklist',
+        '# TYPE checklist_step_seconds histogram',
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'checklist_step_seconds_bucket{{step="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'checklist_step_seconds_sum{{step="{name}"}} {histogram.sum:.6f}')
+            lines.append(f'checklist_step_seconds_count{{step="{name}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+_last_export = 0.0
+
+
+def export(path=METRICS_FILE, min_interval=10.0):
+    """Grava o texto do Prometheus em ``path`` (no máximo a cada ``min_interval`` segundos)"""
+    global _last_export
+    if not ENABLED or not path or time.monotonic() - _last_export < min_interval:
+        return
+    _last_export = time.monotonic()
+    # Troca atômica: o coletor (ex.: textfile do node_exporter) nunca lê um arquivo pela metade
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=METRICS_PORT, host='0.0.0.0'):
+    """Sobe o endpoint /metrics numa thread daemon e retorna o servidor (None se desligado)"""
+    if not ENABLED or not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,135 @@
+"""Cache de PDFs endereçado pelo conteúdo, em memória e em disco.
+
+A chave é o hash das entradas que definem o documento (versão do catálogo,
+status, cabeçalho, modo de renderização e horário do rodapé). Só faz sentido
+para PDFs determinísticos (``create_pdf(..., generated_at=...)``): mesmas
+entradas, mesmos bytes. As duas camadas têm limite de bytes e descartam os
+PDFs usados há mais tempo. Com um ``backend`` (ver ``state_backend``) a
+segunda camada é compartilhada entre as réplicas do app no lugar do disco.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.environ.get('CHECKLIST_PDF_CACHE', 'pdf_cache')
+
+# Validade de um PDF no backend compartilhado (renovada a cada gravação)
+BACKEND_TTL = 7 * 24 * 3600
+
+
+def content_key(*parts):
+    """SHA-256 de uma serialização canônica (chaves ordenadas) das partes"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PdfCache:
+    """LRU de PDFs em memória com uma segunda camada em disco (``directory=None`` desliga o disco).
+
+    O disco guarda um arquivo por chave; o mtime marca o último uso e os mais
+    antigos são apagados quando ``max_disk_bytes`` é ultrapassado. Outros
+    processos no mesmo diretório enxergam os PDFs uns dos outros. Com
+    ``backend`` o disco não é usado: os PDFs vão para o backend com validade
+    ``ttl`` e quem descarta é ele.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_memory_bytes=32 * 1024 * 1024,
+                 max_disk_bytes=512 * 1024 * 1024, backend=None, ttl=BACKEND_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        if backend is not None:
+            directory = None
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = {}
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    self._disk[entry.name[:-4]] = (stat.st_mtime, stat.st_size)
+                    self._disk_bytes += stat.st_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _remember(self, key, pdf):
+        """Coloca na memória (chamado com o lock) e descarta os menos usados além do limite"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        if len(pdf) > self.max_memory_bytes:
+            return
+        self._memory[key] = pdf
+        self._memory_bytes += len(pdf)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, key):
+        """Bytes do PDF ou None"""
+        with self._lock:
+            pdf = self._memory.get(key)
+            if pdf is not None:
+                self._memory.move_to_end(key)
+                return pdf
+            if self.backend is not None:
+                pdf = self.backend.get(key)
+                if pdf is not None:
+                    self._remember(key, pdf)
+                return pdf
+            if not self.directory:
+                return None
+            # Fora do índice pode ter sido gravado por outro processo: a leitura decide
+            try:
+                with open(self._path(key), 'rb') as f:
+                    pdf = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)[1]
+                return None
+            self._disk_bytes += len(pdf) - self._disk.get(key, (0, 0))[1]
+            self._disk[key] = (os.path.getmtime(self._path(key)), len(pdf))
+            self._remember(key, pdf)
+            return pdf
+
+    def put(self, key, pdf):
+        with self._lock:
+            self._remember(key, pdf)
+            if self.backend is not None:
+                self.backend.put(key, pdf, ttl=self.ttl)
+                return
+            if not self.directory or key in self._disk or len(pdf) > self.max_disk_bytes:
+                return
+            # Grava num temporário e renomeia: um leitor nunca vê um PDF pela metade
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp_path, self._path(key))
+            self._disk[key] = (os.path.getmtime(self._path(key)), len(pdf))
+            self._disk_bytes += len(pdf)
+
+            if self._disk_bytes > self.max_disk_bytes:
+                for old_key, (_, size) in sorted(self._disk.items(), key=lambda item: item[1][0]):
+                    if self._disk_bytes <= self.max_disk_bytes:
+                        break
+                    try:
+                        os.remove(self._path(old_key))
+                    except FileNotFoundError:
+                        pass
+                    del self._disk[old_key]
+                    self._disk_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {'memoria': len(self._memory), 'memoria_bytes': self._memory_bytes,
+                    'disco': len(self._disk), 'disco_bytes': self._disk_bytes}
@@ -0,0 +1,172 @@
+"""Exportação dos PDFs de várias inspeções gravadas num único ZIP, gerado em fluxo.
+
+Uso pela linha de comando (lê o banco de ``CHECKLIST_DB``):
+
+    python pdf_export.py -o auditoria_marco.zip --inicio 01/03/2025 --fim 31/03/2025 --placa ABC1D23
+
+O ZIP é produzido em pedaços (``ZipExport`` é um iterável de bytes): cada PDF
+entra no arquivo assim que fica pronto e os pedaços saem logo em seguida, então
+nem o ZIP inteiro nem todos os PDFs ficam em memória ao mesmo tempo. Junto
+vai um ``indice.csv`` com os dados de cada inspeção e o arquivo correspondente.
+"""
+import argparse
+import csv
+import io
+import sys
+import zipfile
+from datetime import datetime
+
+# Tamanho dos pedaços em que cada PDF é escrito no ZIP
+CHUNK_SIZE = 64 * 1024
+
+MANIFEST_NAME = 'indice.csv'
+MANIFEST_FIELDS = ('id', 'tipo', 'data', 'placa', 'matricula', 'colaborador', 'responsavel', 'resultado',
+                   'criado_em', 'arquivo', 'erro')
+
+
+def archive_name(header):
+    """Nome do PDF dentro do ZIP: id da inspeção, tipo, data e colaborador"""
+    info_data = header['info_data']
+    data = info_data.get('data', '')
+    try:
+        data = datetime.strptime(data, '%d/%m/%Y').strftime('%Y%m%d')
+    except ValueError:
+        data = data.replace('/', '')
+    colaborador = (info_data.get('colaborador') or 'Usuario').replace(' ', '_').replace('/', '_')
+    return f"{header['id']:06d}_Checklist_{header['tipo'].upper()}_{data}_{colaborador}.pdf"
+
+
+class _Chunks:
+    """Destino do ZipFile que só acumula os bytes escritos até serem retirados com ``take``"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class ZipExport:
+    """Iterável com os bytes de um ZIP dos PDFs de ``pdfs``.
+
+    ``pdfs`` produz ``(header, pdf, erro)`` na ordem do arquivo (ver
+    ``checklistepiepc.iter_archived_pdfs``); uma inspeção com erro não entra
+    no ZIP, só no índice. Depois de consumido, ``arquivos``, ``erros`` e
+    ``bytes`` trazem o resultado.
+    """
+
+    def __init__(self, pdfs, chunk_size=CHUNK_SIZE):
+        self.pdfs = pdfs
+        self.chunk_size = chunk_size
+        self.arquivos = 0
+        self.erros = []
+        self.bytes = 0
+
+    def _emit(self, chunks):
+        data = chunks.take()
+        self.bytes += len(data)
+        return data
+
+    def __iter__(self):
+        return (data for data in self._generate() if data)
+
+    def _generate(self):
+        chunks = _Chunks()
+        manifest = io.StringIO()
+        writer = csv.DictWriter(manifest, MANIFEST_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+        # Sem seek no destino o zipfile grava tamanhos e CRC depois de cada arquivo (data descriptor)
+        with zipfile.ZipFile(chunks, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for header, pdf, erro in self.pdfs:
+                row = {'id': header['id'], 'tipo': header['tipo'], 'criado_em': header.get('criado_em', ''),
+                       **header['info_data']}
+                if pdf is None:
+                    row['erro'] = erro or 'PDF indisponível'
+                    self.erros.append(f"inspeção {header['id']}: {row['erro']}")
+                else:
+                    row['arquivo'] = name = archive_name(header)
+                    info = zipfile.ZipInfo(name, self._timestamp(header))
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with archive.open(info, 'w') as entry:
+                        for start in range(0, len(pdf), self.chunk_size):
+                            entry.write(pdf[start:start + self.chunk_size])
+                            yield self._emit(chunks)
+                    self.arquivos += 1
+                writer.writerow(row)
+                yield self._emit(chunks)
+            # utf-8-sig: o Excel abre o índice com os acentos certos
+            archive.writestr(MANIFEST_NAME, manifest.getvalue().encode('utf-8-sig'))
+        yield self._emit(chunks)
+
+    @staticmethod
+    def _timestamp(header):
+        """Data/hora do arquivo no ZIP: quando a inspeção foi gravada"""
+        try:
+            return datetime.fromisoformat(header.get('criado_em', '')).timetuple()[:6]
+        except ValueError:
+            return datetime.now().timetuple()[:6]
+
+    def write_to(self, output):
+        """Grava o ZIP em ``output`` (caminho ou arquivo binário) e retorna {'arquivos', 'erros', 'bytes'}"""
+        own_file = isinstance(output, str)
+        file = open(output, 'wb') if own_file else output
+        try:
+            for data in self:
+                file.write(data)
+        finally:
+            if own_file:
+                file.close()
+        return {'arquivos': self.arquivos, 'erros': self.erros, 'bytes': self.bytes}
+
+
+def main(argv=None):
+    from checklistepiepc import SPECS, iter_archived_pdfs
+    from pdf_cache import PdfCache
+    from pdf_jobs import DEFAULT_WORKERS, PdfJobQueue
+    from state_backend import open_backend
+    from storage import DEFAULT_DB_PATH, InspectionStore
+
+    parser = argparse.ArgumentParser(description="Exporta num ZIP os PDFs das inspeções gravadas")
+    parser.add_argument('-o', '--saida', default='inspecoes.zip', help="arquivo ZIP (padrão: inspecoes.zip)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="banco de inspeções")
+    parser.add_argument('--inicio', help="data inicial (dd/mm/aaaa)")
+    parser.add_argument('--fim', help="data final (dd/mm/aaaa)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="processos para gerar os PDFs que não estão no cache (padrão: número de núcleos)")
+    for name in ('tipo', 'placa', 'matricula', 'colaborador', 'responsavel', 'resultado'):
+        parser.add_argument(f'--{name}', help=f"filtra por {name}")
+    args = parser.parse_args(argv)
+
+    store = InspectionStore(args.db, SPECS)
+    filters = {name: getattr(args, name) for name in ('tipo', 'placa', 'matricula', 'colaborador', 'responsavel',
+                                                      'resultado')}
+    headers = store.find(args.inicio, args.fim, limit=None, **filters)[::-1]
+    if not headers:
+        print("Nenhuma inspeção encontrada", file=sys.stderr)
+        return 1
+
+    shared = open_backend()
+    queue = PdfJobQueue(workers=args.workers or DEFAULT_WORKERS,
+                        cache=PdfCache(backend=shared and shared.namespace('pdf')))
+    try:
+        resultado = ZipExport(iter_archived_pdfs(store, headers, queue)).write_to(args.saida)
+    finally:
+        queue.shutdown()
+    for erro in resultado['erros']:
+        print(f"ERRO {erro}", file=sys.stderr)
+    print(f"{resultado['arquivos']}/{len(headers)} PDFs, {resultado['bytes'] / 1024:.0f} KB em {args.saida}")
+    return 1 if resultado['erros'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Fila de geração de PDFs em segundo plano, compartilhada por todas as sessões.
+
+A interface envia o pedido e recebe um id; o PDF é gerado num pool de
+processos (o ReportLab segura o GIL, então threads serializariam os
+inspetores) e a sessão consulta o andamento com ``poll``. Os PDFs prontos
+ficam num cache LRU limitado por quantidade e por bytes; com um ``PdfCache``,
+pedidos com a mesma chave de conteúdo nem chegam ao pool.
+"""
+import functools
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import metrics
+
+DEFAULT_WORKERS = int(os.environ.get('CHECKLIST_PDF_WORKERS', '0')) or os.cpu_count() or 1
+
+PENDENTE = 'pendente'
+PRONTO = 'pronto'
+ERRO = 'erro'
+
+
+def _render(tipo, data, info_data, overlay, generated_at, fotos=None):
+    """Executado no processo do pool: gera o PDF e devolve os bytes e as medições feitas no worker"""
+    from checklistepiepc import SPECS, create_pdf
+    with metrics.capture() as observations:
+        pdf = create_pdf(SPECS[tipo], data, info_data, overlay=overlay, generated_at=generated_at,
+                         fotos=fotos).getvalue()
+    return pdf, observations
+
+
+class PdfJob:
+    """Pedido de PDF: ``status`` passa de pendente para pronto (``pdf``) ou erro (``erro``).
+
+    ``future`` se resolve com o próprio pedido ao concluir: quem guarda o
+    PdfJob espera com ``future.result(timeout)`` e não depende do LRU da fila.
+    """
+
+    def __init__(self, job_id, tipo):
+        self.id = job_id
+        self.tipo = tipo
+        self.status = PENDENTE
+        self.pdf = None
+        self.erro = None
+        self.enviado_em = time.perf_counter()
+        self.segundos = None
+        self.future = Future()
+
+    @property
+    def done(self):
+        return self.status != PENDENTE
+
+
+class PdfJobQueue:
+    """Pool de workers de PDF com cache LRU dos resultados.
+
+    ``max_results``/``max_bytes`` limitam os PDFs prontos guardados; os mais
+    antigos (menos consultados) saem primeiro e ``poll`` passa a retornar None.
+    ``executor`` permite trocar o pool (ex.: ThreadPoolExecutor em testes).
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_results=64, max_bytes=64 * 1024 * 1024, executor=None,
+                 cache=None):
+        # spawn: o servidor do Streamlit tem threads ativas, fork não é seguro
+        self._executor = executor or ProcessPoolExecutor(max_workers=workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._results = OrderedDict()
+        self._bytes = 0
+        self.cache = cache
+
+    def submit(self, tipo, data, info_data, overlay=False, generated_at=None, cache_key=None, fotos=None):
+        """Enfileira um PDF e retorna o id para ``poll``.
+
+        ``cache_key`` (ver ``checklistepiepc.pdf_key``) consulta o cache de PDFs antes do pool.
+        ``fotos`` ({item: [hash]}) vai só com os hashes; o worker lê as miniaturas do backend das fotos.
+        """
+        return self.submit_job(tipo, data, info_data, overlay, generated_at, cache_key, fotos).id
+
+    def submit_job(self, tipo, data, info_data, overlay=False, generated_at=None, cache_key=None, fotos=None):
+        """Como ``submit``, mas retorna o próprio PdfJob (para esperar pelo ``future``)"""
+        with self._lock:
+            job = PdfJob(next(self._ids), tipo)
+            self._pending[job.id] = job
+
+        pdf = self.cache.get(cache_key) if self.cache is not None and cache_key else None
+        if pdf is not None:
+            self._store(job, pdf)
+            return job
+
+        future = self._executor.submit(_render, tipo, data, info_data, overlay, generated_at, fotos)
+        future.add_done_callback(functools.partial(self._finish, job, cache_key))
+        return job
+
+    def _finish(self, job, cache_key, future):
+        try:
+            pdf, observations = future.result()
+            metrics.record_many(observations)
+        except Exception as e:
+            job.erro = str(e)
+            pdf = None
+        if pdf is not None and self.cache is not None and cache_key:
+            self.cache.put(cache_key, pdf)
+        self._store(job, pdf)
+
+    def _store(self, job, pdf):
+        """Move o pedido para os resultados e descarta os mais antigos além dos limites"""
+        job.pdf = pdf
+        job.segundos = time.perf_counter() - job.enviado_em
+        if metrics.ENABLED:
+            metrics.observe('pdf_job', job.segundos)
+
+        with self._lock:
+            self._pending.pop(job.id, None)
+            self._results[job.id] = job
+            self._bytes += len(job.pdf or b'')
+            while self._results and (len(self._results) > self.max_results or self._bytes > self.max_bytes):
+                _, evicted = self._results.popitem(last=False)
+                self._bytes -= len(evicted.pdf or b'')
+        job.status = ERRO if job.erro is not None else PRONTO
+        job.future.set_result(job)
+
+    def poll(self, job_id):
+        """PdfJob do id (pendente ou concluído); None se não existe ou já saiu do cache"""
+        with self._lock:
+            job = self._pending.get(job_id)
+            if job is None:
+                job = self._results.get(job_id)
+                if job is not None:
+                    self._results.move_to_end(job_id)
+            return job
+
+    def stats(self):
+        """Pedidos pendentes, resultados em cache e bytes ocupados"""
+        with self._lock:
+            return {'pendentes': len(self._pending), 'resultados': len(self._results), 'bytes': self._bytes}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,618 @@
+"""Geração dos PDFs de checklist EPC/EPI com ReportLab.
+
+Importado sob demanda por ``checklistepiepc.create_pdf``: a maior parte das
+sessões nunca gera PDF, então o ReportLab não entra no tempo de partida do app.
+"""
+import copy
+import functools
+import io
+import re
+from datetime import datetime
+
+from reportlab.lib import colors
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable, Image
+
+from assets import get_logo
+from metrics import timed
+from storage import catalog_version
+
+PAGE_WIDTH = A4[0] - 1 * inch
+
+# Nome interno de fonte num operador Tf ("/F2 9 Tf")
+_FONT_OPERATOR = re.compile(r'/F\d+(?= [\d.]+ Tf)')
+
+# Modo overlay: linhas reservadas para as observações e campos do cabeçalho
+OVERLAY_OBS_LINES = 5
+# Observações maiores continuam em páginas próprias, a partir desta altura (margem de cima do platypus)
+OVERLAY_CONT_TOP = A4[1] - 0.8 * inch
+OVERLAY_CONT_BOTTOM = 0.8 * inch
+OVERLAY_INFO_FIELDS = ('local', 'data', 'empresa', 'placa', 'veiculo', 'modelo', 'matricula', 'colaborador',
+                       'funcao', 'responsavel')
+
+# Lado máximo das miniaturas de evidência, na linha logo abaixo do item
+PHOTO_SIZE = 0.9 * inch
+
+
+class LogoFlowable(Flowable):
+    """Desenha a logo a partir de um ImageReader compartilhado (decodificado uma única vez)"""
+
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.reader = reader
+        self.width = width
+        self.height = height
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask='auto')
+
+
+def load_logo_reader():
+    """ImageReader da logo para os PDFs, vindo do cache compartilhado (None se indisponível)"""
+    logo = get_logo()
+    if logo is None:
+        return None
+    try:
+        return logo.pdf_reader
+    except Exception:
+        return None
+
+
+class _Slot(Flowable):
+    """Marcador vazio do fundo estático: registra onde um texto variável será desenhado.
+
+    Ocupa a altura de uma linha de texto da célula, então o ponto registrado
+    coincide com a linha de base que a Table usaria para uma string.
+    """
+
+    def __init__(self, anchors, key, fontsize, align='LEFT', fontname='Helvetica', color=colors.black, leading=12):
+        super().__init__()
+        self.anchors = anchors
+        self.key = key
+        self.fontname = fontname
+        self.fontsize = fontsize
+        self.align = align
+        self.color = color
+        self.leading = leading
+        self.avail_width = 0
+
+    def wrap(self, availWidth, availHeight):
+        self.avail_width = availWidth
+        return 0, self.leading
+
+    def draw(self):
+        x, y = self.canv.absolutePosition(0, 0)
+        self.anchors[self.key] = {
+            'page': self.canv.getPageNumber() - 1,
+            'x': x,
+            'y': y + self.leading - self.fontsize,
+            'font': self.fontname,
+            'size': self.fontsize,
+            'leading': self.leading,
+            'align': self.align,
+            'color': self.color,
+            'width': self.avail_width,
+        }
+
+
+class _CapturingCanvas(Canvas):
+    """Canvas que guarda o stream de cada página e os recursos usados (fontes e imagens)"""
+
+    def __init__(self, capture, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._capture = capture
+        capture['pages'] = []
+
+    def showPage(self):
+        self._capture['pages'].append((list(self._code), list(self._formsinuse)))
+        super().showPage()
+
+    def save(self):
+        doc = self._doc
+        self._capture['fonts'] = sorted(doc.fontMapping.items(), key=lambda item: int(item[1].lstrip('/F')))
+        self._capture['images'] = [(name, obj) for name, obj in doc.idToObject.items()
+                                   if isinstance(obj, pdfdoc.PDFImageXObject)]
+        super().save()
+
+
+class PdfBackground:
+    """Páginas estáticas de um checklist, montadas uma vez por versão do catálogo.
+
+    Guarda o stream de conteúdo de cada página (logo, título, legenda, itens,
+    cabeçalhos e assinaturas) e as coordenadas de cada campo variável. Cada PDF
+    registra essas páginas como form XObjects e desenha por cima só os dados
+    da inspeção, sem passar pelo layout do platypus.
+    """
+
+    @timed('pdf_background')
+    def __init__(self, template, categories):
+        self.version = catalog_version(categories)
+        self.anchors = {}
+        capture = {}
+        doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4, topMargin=0.8 * inch, leftMargin=0.5 * inch,
+                                rightMargin=0.5 * inch)
+        doc.build(template.story({}, {}, categories, anchors=self.anchors),
+                  canvasmaker=functools.partial(_CapturingCanvas, capture))
+        self.pages = capture['pages']
+        self.fonts = capture['fonts']
+        self.images = capture['images']
+
+    def form_name(self, page):
+        return f"checklist_{self.version}_p{page}"
+
+    def install(self, canvas):
+        """Registra fontes, imagens e as páginas estáticas como form XObjects no canvas (uma vez por canvas)"""
+        doc = canvas._doc
+        if doc.hasForm(self.form_name(0)):
+            return
+        # Os streams capturados referenciam as fontes pelo nome interno (F1, F2...),
+        # atribuído na ordem de uso. Num canvas novo registrá-las na mesma ordem
+        # reproduz os nomes; num canvas que já usou outras fontes (relatório
+        # consolidado) os nomes são trocados nos operadores Tf.
+        renamed = {}
+        for psname, internal_name in self.fonts:
+            doc_name = doc.getInternalFontName(psname)
+            if doc_name != internal_name:
+                renamed[internal_name] = doc_name
+        for name, image in self.images:
+            if name not in doc.idToObject:
+                image = copy.copy(image)
+                image.__dict__.pop('__InternalName__', None)
+                doc.Reference(image, name)
+        for page, (code, forms) in enumerate(self.pages):
+            if renamed:
+                code = [_FONT_OPERATOR.sub(lambda match: renamed.get(match.group(), match.group()), line)
+                        for line in code]
+            canvas.beginForm(self.form_name(page))
+            canvas._code.extend(code)
+            canvas._formsinuse.extend(forms)
+            canvas.endForm()
+
+
+def footer_text(generated_at=None):
+    """Rodapé com a data/hora de geração do documento (``generated_at`` ou agora)"""
+    generated_at = generated_at or datetime.now()
+    return f"Documento gerado em {generated_at.strftime('%d/%m/%Y às %H:%M')} | Sistema Rezende Energia"
+
+
+def _draw_anchored(canvas, anchor, text, offset=0):
+    """Desenha um texto variável na posição registrada pelo fundo estático"""
+    canvas.setFillColor(anchor['color'])
+    canvas.setFont(anchor['font'], anchor['size'])
+    if anchor['align'] == 'CENTER':
+        canvas.drawCentredString(anchor['x'], anchor['y'] - offset, text)
+    else:
+        canvas.drawString(anchor['x'], anchor['y'] - offset, text)
+
+
+class PdfTemplate:
+    """Parte estática do PDF de um tipo de checklist: estilos, tabelas, larguras e logo.
+
+    Montado uma vez por processo (ver ``get_pdf_template``); a cada PDF só as
+    marcações X e os dados do cabeçalho mudam. Flowables não são compartilhados
+    entre documentos, pois o platypus altera o estado deles durante o build.
+    """
+
+    def __init__(self, spec):
+        styles = getSampleStyleSheet()
+
+        self.title = spec.pdf_title
+        self.badge = spec.badge
+        self.legend = spec.legend
+
+        # Estilos personalizados
+        self.normal_style = styles['Normal']
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            alignment=TA_CENTER,
+            fontSize=16,
+            textColor=HexColor('#000000'),
+            fontName='Helvetica-Bold',
+            spaceAfter=20
+        )
+        self.section_style = ParagraphStyle(
+            'SectionTitle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            textColor=HexColor('#F7931E'),
+            fontName='Helvetica-Bold',
+            spaceAfter=10
+        )
+        self.footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey,
+                                           alignment=TA_CENTER)
+
+        # Informações gerais
+        self.info_col_widths = [PAGE_WIDTH * 0.15, PAGE_WIDTH * 0.2, PAGE_WIDTH * 0.15, PAGE_WIDTH * 0.25,
+                                PAGE_WIDTH * 0.25]
+        self.info_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (4, 0), (4, 1), HexColor('#F7931E')),
+            ('TEXTCOLOR', (4, 0), (4, 1), colors.white),
+            ('FONTNAME', (4, 0), (4, 1), 'Helvetica-Bold'),
+            ('ALIGN', (4, 0), (4, 1), 'CENTER'),
+        ])
+
+        # Tabelas das categorias: cabeçalho, coluna de cada status e larguras
+        self.cat_header = ['Descrição do Material'] + spec.status_codes
+        self.status_columns = {status: index + 1 for status, index in spec.status_index.items()}
+        self.cat_col_widths = [PAGE_WIDTH * fraction for fraction in spec.cat_col_widths]
+        self.cat_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#F7931E')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ])
+
+        # Assinaturas
+        self.sig_col_widths = [2.75 * inch, 2.75 * inch]
+        self.sig_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 1), (-1, 1), 20)
+        ])
+
+        # Tabelas de uma célula sem borda nem espaçamento (campos do modo overlay)
+        self.bare_table_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+        ])
+        self.footer_table_style = TableStyle(self.bare_table_style.getCommands() + [
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ])
+
+        self._backgrounds = {}
+
+    @property
+    def logo_reader(self):
+        """Logo do cache compartilhado: acompanha trocas do arquivo sem remontar o template"""
+        return load_logo_reader()
+
+    def _photo_strip(self, thumbnails):
+        """Miniaturas JPEG lado a lado; o JPEG entra no PDF como está, sem recompressão"""
+        strip = Table([[Image(io.BytesIO(thumbnail), PHOTO_SIZE, PHOTO_SIZE, kind='proportional')
+                        for thumbnail in thumbnails]], hAlign='LEFT')
+        strip.setStyle(TableStyle([('LEFTPADDING', (0, 0), (-1, -1), 0), ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+                                   ('TOPPADDING', (0, 0), (-1, -1), 0), ('BOTTOMPADDING', (0, 0), (-1, -1), 0)]))
+        return strip
+
+    def story(self, data, info_data, categories, anchors=None, generated_at=None, photos=None):
+        """Lista de flowables do PDF de uma inspeção.
+
+        Com ``anchors`` monta só o fundo estático: os campos variáveis viram
+        marcadores que registram em ``anchors`` onde o texto deve ser desenhado.
+        ``photos`` ({item: [miniatura JPEG]}) acrescenta uma linha com as fotos abaixo de cada item.
+        """
+        def field(key, text, fontsize, align='LEFT', **kwargs):
+            if anchors is None:
+                return text
+            return _Slot(anchors, key, fontsize, align, **kwargs)
+
+        def info(name):
+            return field(('info', name), info_data.get(name, ''), 9)
+
+        elements = []
+
+        # Logo (se disponível)
+        if self.logo_reader is not None:
+            elements.append(LogoFlowable(self.logo_reader, 2 * inch, 1 * inch))
+            elements.append(Spacer(1, 12))
+
+        # Título
+        elements.append(Paragraph(self.title, self.title_style))
+        elements.append(Spacer(1, 20))
+
+        # Informações gerais
+        info_table_data = [
+            ['Local:', info('local'), 'Data:', info('data'), 'Status Geral'],
+            ['Empresa:', info('empresa'), 'Placa:', info('placa'), self.badge],
+            ['Veículo:', info('veiculo'), 'Modelo:', info('modelo'), ''],
+            ['Matrícula:', info('matricula'), 'Colaborador:', info('colaborador'), ''],
+            ['Função:', info('funcao'), 'Responsável:', info('responsavel'), '']
+        ]
+        info_table = Table(info_table_data, colWidths=self.info_col_widths)
+        info_table.setStyle(self.info_table_style)
+        elements.append(info_table)
+        elements.append(Spacer(1, 20))
+
+        # Legenda
+        elements.append(Paragraph(self.legend, self.normal_style))
+        elements.append(Spacer(1, 15))
+
+        # Itens por categoria
+        empty_row = [''] * len(self.cat_col_widths)
+        for categoria, itens in categories.items():
+            elements.append(Paragraph(categoria, self.section_style))
+
+            table_data = [self.cat_header]
+            photo_rows = []
+            for item in itens:
+                row = empty_row.copy()
+                row[0] = item
+                if anchors is None:
+                    column = self.status_columns.get(data.get(item, ''))
+                    if column:
+                        row[column] = 'X'
+                else:
+                    for status, column in self.status_columns.items():
+                        row[column] = _Slot(anchors, ('item', categoria, item, status), 8, 'CENTER')
+                table_data.append(row)
+                if photos and photos.get(item):
+                    photo_rows.append(len(table_data))
+                    table_data.append([self._photo_strip(photos[item])] + empty_row[1:])
+
+            cat_table = Table(table_data, colWidths=self.cat_col_widths)
+            if photo_rows:
+                cat_table.setStyle(TableStyle(self.cat_table_style.getCommands() + [
+                    command for row in photo_rows for command in (('SPAN', (0, row), (-1, row)),
+                                                                  ('ALIGN', (0, row), (-1, row), 'LEFT'))]))
+            else:
+                cat_table.setStyle(self.cat_table_style)
+            elements.append(cat_table)
+            elements.append(Spacer(1, 10))
+
+        # Observações
+        elements.append(Spacer(1, 20))
+        if anchors is None:
+            obs_text = f"Observações: {info_data.get('observacoes', '')}"
+            elements.append(Paragraph(obs_text, self.normal_style))
+        else:
+            # No fundo estático o espaço das observações tem altura fixa
+            obs_table = Table([[field(('obs',), '', 10)]], colWidths=[PAGE_WIDTH],
+                              rowHeights=[OVERLAY_OBS_LINES * 12])
+            obs_table.setStyle(self.bare_table_style)
+            elements.append(obs_table)
+        elements.append(Spacer(1, 30))
+
+        # Assinaturas
+        elements.append(Paragraph("ASSINATURAS", self.section_style))
+        sig_date = f"Data: {info_data.get('data', '')}"
+        sig_table = Table([
+            ['Responsável pela Inspeção', 'Operador'],
+            ['_' * 30, '_' * 30],
+            [field(('sig', 0), sig_date, 10, 'CENTER'), field(('sig', 1), sig_date, 10, 'CENTER')]
+        ], colWidths=self.sig_col_widths)
+        sig_table.setStyle(self.sig_table_style)
+        elements.append(sig_table)
+
+        # Rodapé
+        elements.append(Spacer(1, 30))
+        if anchors is None:
+            elements.append(Paragraph(footer_text(generated_at), self.footer_style))
+        else:
+            footer_table = Table([[field(('footer',), '', 8, 'CENTER', color=colors.grey, leading=9.6)]],
+                                 colWidths=[PAGE_WIDTH])
+            footer_table.setStyle(self.footer_table_style)
+            elements.append(footer_table)
+
+        return elements
+
+    def build(self, data, info_data, categories, generated_at=None, photos=None):
+        """Monta o PDF de uma inspeção e retorna o buffer posicionado no início.
+
+        Com ``generated_at`` o PDF é determinístico: rodapé com esse horário e
+        metadados (data de criação, /ID) fixos, então mesmas entradas geram os mesmos bytes.
+        """
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8 * inch, leftMargin=0.5 * inch,
+                                rightMargin=0.5 * inch, invariant=int(generated_at is not None))
+        with timed('pdf_story'):
+            story = self.story(data, info_data, categories, generated_at=generated_at, photos=photos)
+        with timed('pdf_doc_build'):
+            doc.build(story)
+        buffer.seek(0)
+        return buffer
+
+    def background(self, categories):
+        """Fundo estático para o catálogo informado, montado na primeira vez que a versão aparece"""
+        logo = get_logo()
+        key = (catalog_version(categories), logo.token if logo else None)
+        background = self._backgrounds.get(key)
+        if background is None:
+            background = self._backgrounds[key] = PdfBackground(self, categories)
+        return background
+
+    @timed('pdf_overlay')
+    def build_overlay(self, data, info_data, categories, generated_at=None):
+        """Modo rápido: reaproveita o fundo estático e desenha só os dados da inspeção"""
+        buffer = io.BytesIO()
+        canvas = Canvas(buffer, pagesize=A4, invariant=int(generated_at is not None))
+        self.draw_overlay(canvas, data, info_data, categories, generated_at)
+        canvas.save()
+        buffer.seek(0)
+        return buffer
+
+    def _overlay_obs_lines(self, info_data, categories):
+        """(linhas no quadro de observações, páginas de continuação com as linhas que não couberam)"""
+        anchor = self.background(categories).anchors[('obs',)]
+        lines = simpleSplit(f"Observações: {info_data.get('observacoes', '')}", anchor['font'], anchor['size'],
+                            anchor['width'])
+        if len(lines) <= OVERLAY_OBS_LINES:
+            return lines, []
+        per_page = int((OVERLAY_CONT_TOP - OVERLAY_CONT_BOTTOM - 2 * anchor['leading']) // anchor['leading'])
+        rest = lines[OVERLAY_OBS_LINES - 1:]
+        box = lines[:OVERLAY_OBS_LINES - 1] + ["(continua na página seguinte)"]
+        return box, [rest[start:start + per_page] for start in range(0, len(rest), per_page)]
+
+    def overlay_pages(self, info_data, categories):
+        """Páginas de uma inspeção no modo overlay: as do fundo estático mais as de continuação"""
+        return len(self.background(categories).pages) + len(self._overlay_obs_lines(info_data, categories)[1])
+
+    def draw_overlay(self, canvas, data, info_data, categories, generated_at=None, on_page=None):
+        """Desenha as páginas de uma inspeção num canvas já aberto (uma ``showPage`` por página).
+
+        Observações que não cabem nas ``OVERLAY_OBS_LINES`` do quadro continuam
+        em páginas extras no fim. ``on_page(canvas, page)`` é chamado antes de
+        fechar cada página.
+        """
+        background = self.background(categories)
+        background.install(canvas)
+        anchors = background.anchors
+
+        texts = [(('info', name), info_data.get(name, '')) for name in OVERLAY_INFO_FIELDS]
+        sig_date = f"Data: {info_data.get('data', '')}"
+        texts += [(('sig', 0), sig_date), (('sig', 1), sig_date), (('footer',), footer_text(generated_at))]
+        for categoria, itens in categories.items():
+            for item in itens:
+                texts.append((('item', categoria, item, data.get(item, '')), 'X'))
+
+        per_page = [[] for _ in background.pages]
+        for key, text in texts:
+            anchor = anchors.get(key)
+            if anchor is not None and text:
+                per_page[anchor['page']].append((anchor, text))
+
+        obs_anchor = anchors[('obs',)]
+        obs_lines, continuation = self._overlay_obs_lines(info_data, categories)
+
+        for page, page_texts in enumerate(per_page):
+            canvas.doForm(background.form_name(page))
+            for anchor, text in page_texts:
+                _draw_anchored(canvas, anchor, text)
+            if obs_anchor['page'] == page:
+                for index, line in enumerate(obs_lines):
+                    _draw_anchored(canvas, obs_anchor, line, index * obs_anchor['leading'])
+            if on_page is not None:
+                on_page(canvas, page)
+            canvas.showPage()
+
+        footer = anchors.get(('footer',))
+        for page, lines in enumerate(continuation, start=len(per_page)):
+            leading = obs_anchor['leading']
+            title = dict(obs_anchor, y=OVERLAY_CONT_TOP, font='Helvetica-Bold')
+            _draw_anchored(canvas, title, "Observações (continuação)")
+            for index, line in enumerate(lines):
+                _draw_anchored(canvas, dict(obs_anchor, y=OVERLAY_CONT_TOP - 2 * leading), line, index * leading)
+            if footer is not None:
+                _draw_anchored(canvas, dict(footer, y=OVERLAY_CONT_BOTTOM / 2), footer_text(generated_at))
+            if on_page is not None:
+                on_page(canvas, page)
+            canvas.showPage()
+
+
+class PdfStreamWriter:
+    """Grava num arquivo as páginas de um Canvas à medida que ficam prontas.
+
+    O ``Canvas.save`` do ReportLab só serializa o documento no fim, com todos
+    os objetos em memória. Aqui ``flush`` (chamado depois de ``showPage``)
+    grava os objetos já completos (páginas, streams, form XObjects, imagens,
+    fontes) e libera o conteúdo deles, guardando só a posição de cada um
+    para a tabela xref. A árvore de páginas, o dicionário de fontes, o
+    sumário, os links e o catálogo só ficam completos no fim e são gravados por ``close``.
+    O arquivo só precisa de ``write`` (não precisa de ``seek``/``tell``).
+    """
+
+    def __init__(self, canvas, file):
+        self.canvas = canvas
+        self.file = file
+        self.offset = 0
+        self._offsets = {}
+        self._next = 1
+        self._pending = []
+        self._pages_released = 0
+        doc = canvas._doc
+        self._deferred = {id(doc.Pages), id(doc.idToObject[pdfdoc.BasicFonts]), id(doc.Catalog), id(doc.info),
+                          id(doc.Outlines)}
+        doc.encrypt.prepare(doc)
+        self._write(pdfdoc.PDFFile(doc._pdfVersion).format(doc))
+
+    def _write(self, data):
+        self.file.write(data)
+        self.offset += len(data)
+
+    def _write_object(self, number):
+        doc = self.canvas._doc
+        name = doc.numberToId[number]
+        data = pdfdoc.PDFIndirectObject(name, doc.idToObject[name]).format(doc)
+        self._offsets[number] = self.offset
+        self._write(data)
+        # Só o nome continua registrado: referências posteriores usam o número do objeto
+        doc.idToObject[name] = None
+
+    def _write_ready(self):
+        """Grava, em ordem de número, os objetos registrados desde a última gravação"""
+        doc = self.canvas._doc
+        while self._next in doc.numberToId:
+            obj = doc.idToObject[doc.numberToId[self._next]]
+            # Links apontam para páginas que talvez ainda não existam
+            if id(obj) in self._deferred or isinstance(obj, pdfdoc.LinkAnnotation):
+                self._pending.append(self._next)
+            else:
+                self._write_object(self._next)
+            self._next += 1
+
+    def flush(self):
+        self._write_ready()
+        # A árvore de páginas passa a guardar só as referências das páginas já gravadas
+        pages = self.canvas._doc.Pages.pages
+        for index in range(self._pages_released, len(pages)):
+            pages[index] = pdfdoc.PDFObjectReference(getattr(pages[index], '__InternalName__'))
+        self._pages_released = len(pages)
+
+    def close(self):
+        """Fecha a última página, grava os objetos pendentes, a xref e o trailer"""
+        canvas = self.canvas
+        doc = canvas._doc
+        if len(canvas._code):
+            canvas.showPage()
+        self.flush()
+
+        # Mesmos passos de PDFDocument.GetPDFData antes do format
+        for font in doc.delayedFonts:
+            font.addObjects(doc)
+        doc.info.invariant = doc.invariant
+        doc.info.digest(doc.signature)
+        doc.Reference(doc.Catalog)
+        doc.Reference(doc.info)
+        doc.Outlines.prepare(doc, canvas)
+        if doc.Outlines.ready < 0:
+            doc.Catalog.Outlines = None
+
+        self._write_ready()
+        for number in self._pending:
+            self._write_object(number)
+        self._pending = []
+        self._deferred = set()
+        while self._next in doc.numberToId:
+            self._write_object(self._next)
+            self._next += 1
+
+        size = doc.objectcounter + 1
+        xref_offset = self.offset
+        self._write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        self._write(b''.join(b'%010d 00000 n \n' % self._offsets[number] for number in range(1, size)))
+        trailer = pdfdoc.PDFTrailer(startxref=xref_offset, Size=size, Root=doc.Reference(doc.Catalog),
+                                    Info=doc.Reference(doc.info), ID=doc.ID())
+        self._write(trailer.format(doc))
@@ -0,0 +1,229 @@
+"""Relatório consolidado: várias inspeções gravadas num único PDF, com página de índice.
+
+Uso pela linha de comando (lê o banco de ``CHECKLIST_DB``):
+
+    python pdf_report.py -o relatorio.pdf --inicio 01/03/2025 --fim 31/03/2025 --responsavel "Fulano"
+
+Cada inspeção é desenhada no modo overlay (fundo estático compartilhado) e as
+páginas vão para o arquivo assim que ficam prontas (``PdfStreamWriter``): a
+memória não cresce com o número de inspeções, só os cabeçalhos do índice e
+a posição de cada objeto no arquivo ficam guardados até o fim.
+"""
+import argparse
+import math
+import sys
+
+from reportlab.lib import colors
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+from metrics import timed
+from pdf_render import PdfStreamWriter, footer_text
+
+DEFAULT_TITLE = 'Relatório Consolidado de Inspeções'
+
+# Linhas de inspeção por página do índice
+INDEX_ROWS = 40
+INDEX_ROW_HEIGHT = 16
+MARGIN = 36
+
+# (título, largura) das colunas do índice; somam a largura útil da página
+INDEX_COLUMNS = (('Nº', 30), ('Tipo', 32), ('Data', 58), ('Placa/Matrícula', 75), ('Colaborador', 120),
+                 ('Responsável', 110), ('Resultado', 60), ('Pág.', 38))
+
+
+def _fit(text, font, size, width):
+    """Corta o texto com reticências para caber na largura da coluna"""
+    text = str(text or '')
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '...', font, size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _identification(header):
+    """Placa (EPC) ou matrícula (EPI), o que identifica a inspeção no índice"""
+    info_data = header['info_data']
+    return info_data.get('placa') or info_data.get('matricula') or ''
+
+
+def _draw_index_page(canvas, rows, page, total, title, subtitle):
+    width, height = A4
+    y = height - MARGIN - 16
+    if page == 0:
+        canvas.setFont('Helvetica-Bold', 16)
+        canvas.drawCentredString(width / 2, y, title)
+        y -= 18
+        canvas.setFont('Helvetica', 10)
+        if subtitle:
+            canvas.drawCentredString(width / 2, y, subtitle)
+            y -= 14
+        canvas.drawCentredString(width / 2, y, f"{total} inspeções")
+        y -= 24
+    else:
+        canvas.setFont('Helvetica-Bold', 12)
+        canvas.drawString(MARGIN, y, f"{title} (índice, continuação)")
+        y -= 24
+
+    # Cabeçalho da tabela
+    canvas.setFillColor(HexColor('#F7931E'))
+    canvas.rect(MARGIN, y - 4, width - 2 * MARGIN, INDEX_ROW_HEIGHT, stroke=0, fill=1)
+    canvas.setFillColor(colors.white)
+    canvas.setFont('Helvetica-Bold', 8)
+    x = MARGIN
+    for label, column_width in INDEX_COLUMNS:
+        canvas.drawString(x + 3, y, label)
+        x += column_width
+    y -= INDEX_ROW_HEIGHT
+
+    canvas.setFillColor(colors.black)
+    canvas.setStrokeColor(colors.lightgrey)
+    canvas.setLineWidth(0.5)
+    for number, header, start_page, key in rows:
+        info_data = header['info_data']
+        values = (number, header['tipo'].upper(), info_data.get('data', ''), _identification(header),
+                  info_data.get('colaborador', ''), info_data.get('responsavel', ''),
+                  info_data.get('resultado', ''), start_page)
+        canvas.setFont('Helvetica', 8)
+        x = MARGIN
+        for value, (_, column_width) in zip(values, INDEX_COLUMNS):
+            canvas.drawString(x + 3, y, _fit(value, 'Helvetica', 8, column_width - 6))
+            x += column_width
+        canvas.line(MARGIN, y - 5, width - MARGIN, y - 5)
+        # A linha inteira leva à primeira página da inspeção
+        canvas.linkAbsolute('', key, (MARGIN, y - 5, width - MARGIN, y - 5 + INDEX_ROW_HEIGHT))
+        y -= INDEX_ROW_HEIGHT
+
+
+def _draw_missing_page(canvas, number, header):
+    """Aviso no lugar de uma inspeção apagada depois de o índice ser montado"""
+    y = A4[1] - MARGIN - 16
+    canvas.setFont('Helvetica-Bold', 12)
+    canvas.drawString(MARGIN, y, f"{number}. Inspeção nº {header['id']} não encontrada")
+    canvas.setFont('Helvetica', 10)
+    canvas.drawString(MARGIN, y - 18, "Ela foi apagada enquanto o relatório era gerado.")
+
+
+def _draw_page_number(canvas, number, total):
+    canvas.setFont('Helvetica', 7)
+    canvas.setFillColor(colors.grey)
+    canvas.drawRightString(A4[0] - MARGIN, MARGIN / 2, f"Página {number} de {total}")
+
+
+@timed('pdf_consolidated')
+def render_consolidated(store, specs, template_for, headers, output, title=DEFAULT_TITLE, subtitle='',
+                        generated_at=None):
+    """Grava em ``output`` (caminho ou arquivo binário) um PDF com o índice e todas as inspeções de ``headers``.
+
+    ``headers`` são cabeçalhos de ``InspectionStore.find``, na ordem do
+    relatório; os status de cada inspeção só são lidos do ``store`` na hora de
+    desenhá-la. As inspeções saem no catálogo atual de cada tipo (``specs``),
+    casando os itens pelo código estável. ``template_for(tipo)`` devolve o
+    ``PdfTemplate``. Com ``generated_at`` o PDF é determinístico.
+    Uma inspeção apagada depois de listada fica com um aviso nas páginas
+    reservadas a ela no índice. Retorna {'inspecoes', 'ausentes', 'paginas', 'bytes'}.
+    """
+    # Páginas de cada inspeção: as do fundo estático do catálogo atual, mais as de continuação
+    # das observações longas (que já vêm no cabeçalho)
+    index_pages = max(1, math.ceil(len(headers) / INDEX_ROWS))
+    rows = []
+    reserved = {}
+    page = index_pages + 1
+    for number, header in enumerate(headers, start=1):
+        rows.append((number, header, page, f"inspecao_{number}"))
+        reserved[number] = template_for(header['tipo']).overlay_pages(header['info_data'],
+                                                                      specs[header['tipo']].categories)
+        page += reserved[number]
+    total_pages = page - 1
+
+    own_file = isinstance(output, str)
+    file = open(output, 'wb') if own_file else output
+    try:
+        canvas = Canvas(None, pagesize=A4, invariant=int(generated_at is not None))
+        canvas.setTitle(title)
+        canvas.showOutline()
+        writer = PdfStreamWriter(canvas, file)
+
+        canvas.bookmarkPage('indice')
+        canvas.addOutlineEntry('Índice', 'indice')
+        for index_page in range(index_pages):
+            page_rows = rows[index_page * INDEX_ROWS:(index_page + 1) * INDEX_ROWS]
+            _draw_index_page(canvas, page_rows, index_page, len(headers), title, subtitle)
+            canvas.setFont('Helvetica', 8)
+            canvas.drawCentredString(A4[0] / 2, MARGIN / 2, footer_text(generated_at))
+            _draw_page_number(canvas, index_page + 1, total_pages)
+            canvas.showPage()
+        writer.flush()
+
+        missing = 0
+        for number, header, start_page, key in rows:
+            tipo = header['tipo']
+
+            def on_page(canvas, page, tipo=tipo, key=key, number=number, start_page=start_page, header=header):
+                if page == 0:
+                    canvas.bookmarkPage(key)
+                    info_data = header['info_data']
+                    canvas.addOutlineEntry(f"{number}. {tipo.upper()} {info_data.get('data', '')} "
+                                           f"{_identification(header)} {info_data.get('colaborador', '')}".strip(),
+                                           key)
+                _draw_page_number(canvas, start_page + page, total_pages)
+
+            record = store.get(header['id'])
+            if record is None:
+                missing += 1
+                for page in range(reserved[number]):
+                    _draw_missing_page(canvas, number, header)
+                    on_page(canvas, page)
+                    canvas.showPage()
+                writer.flush()
+                continue
+            data = specs[tipo].decode_codes(record['por_codigo'])
+            template_for(tipo).draw_overlay(canvas, data, record['info_data'], specs[tipo].categories,
+                                            generated_at, on_page=on_page)
+            writer.flush()
+        writer.close()
+    finally:
+        if own_file:
+            file.close()
+    return {'inspecoes': len(headers) - missing, 'ausentes': missing, 'paginas': total_pages,
+            'bytes': writer.offset}
+
+
+def main(argv=None):
+    from checklistepiepc import SPECS, create_consolidated_pdf
+    from storage import DEFAULT_DB_PATH, InspectionStore
+
+    parser = argparse.ArgumentParser(description="Gera um PDF consolidado com várias inspeções gravadas")
+    parser.add_argument('-o', '--saida', default='relatorio.pdf', help="arquivo PDF (padrão: relatorio.pdf)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="banco de inspeções")
+    parser.add_argument('--inicio', help="data inicial (dd/mm/aaaa)")
+    parser.add_argument('--fim', help="data final (dd/mm/aaaa)")
+    parser.add_argument('--titulo', default=DEFAULT_TITLE)
+    for name in ('tipo', 'placa', 'matricula', 'colaborador', 'responsavel', 'resultado'):
+        parser.add_argument(f'--{name}', help=f"filtra por {name}")
+    args = parser.parse_args(argv)
+
+    store = InspectionStore(args.db, SPECS)
+    filters = {name: getattr(args, name) for name in ('tipo', 'placa', 'matricula', 'colaborador', 'responsavel',
+                                                      'resultado')}
+    # find devolve as mais recentes primeiro; o relatório segue a ordem cronológica
+    headers = store.find(args.inicio, args.fim, limit=None, **filters)[::-1]
+    if not headers:
+        print("Nenhuma inspeção encontrada", file=sys.stderr)
+        return 1
+
+    periodo = ' a '.join(value for value in (args.inicio, args.fim) if value)
+    resultado = create_consolidated_pdf(store, headers, args.saida, title=args.titulo,
+                                        subtitle=f"Período: {periodo}" if periodo else '')
+    print(f"{resultado['inspecoes']} inspeções, {resultado['paginas']} páginas, "
+          f"{resultado['bytes'] / 1024:.0f} KB em {args.saida}")
+    if resultado['ausentes']:
+        print(f"{resultado['ausentes']} inspeções apagadas durante a geração ficaram de fora", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
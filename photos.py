@@ -0,0 +1,127 @@
+"""Fotos de evidência dos itens não conformes: redução em segundo plano e deduplicação.
+
+A foto enviada (4-12 MB de um celular) é identificada pelo SHA-256 dos bytes
+originais: a mesma foto enviada de novo, em outro item ou por outra sessão,
+não é processada nem guardada outra vez. O processamento roda num pool de
+threads (o Pillow libera o GIL ao decodificar, reduzir e comprimir) e guarda
+duas versões JPEG no backend de estado (``state_backend``): a evidência
+reduzida a ``MAX_EDGE`` pixels e a miniatura de ``THUMB_EDGE`` que vai no PDF.
+O original não é guardado.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from state_backend import FileBackend
+
+DEFAULT_PHOTO_DIR = os.environ.get('CHECKLIST_PHOTOS', 'fotos')
+PHOTO_WORKERS = int(os.environ.get('CHECKLIST_PHOTO_WORKERS', '0')) or min(4, os.cpu_count() or 1)
+
+# Evidência guardada e miniatura do PDF: maior lado em pixels e qualidade JPEG
+MAX_EDGE = 1600
+QUALITY = 82
+THUMB_EDGE = 256
+THUMB_QUALITY = 70
+
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+MAX_PHOTOS_PER_ITEM = 3
+
+PENDENTE = 'pendente'
+PRONTO = 'pronto'
+ERRO = 'erro'
+
+
+def photo_key(data):
+    """Hash do conteúdo original: a identidade da foto"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def shrink(data, max_edge=MAX_EDGE, quality=QUALITY, thumb_edge=THUMB_EDGE, thumb_quality=THUMB_QUALITY):
+    """(evidência, miniatura) em JPEG a partir dos bytes de uma imagem, na orientação do EXIF"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG: decodifica já reduzido (escala do DCT), bem mais rápido que abrir a foto inteira
+        image.draft('RGB', (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        photo = io.BytesIO()
+        image.save(photo, 'JPEG', quality=quality, optimize=True)
+        image.thumbnail((thumb_edge, thumb_edge), Image.Resampling.LANCZOS)
+        thumb = io.BytesIO()
+        image.save(thumb, 'JPEG', quality=thumb_quality, optimize=True)
+    return photo.getvalue(), thumb.getvalue()
+
+
+def photo_backend(shared=None):
+    """Onde ficam as fotos: o espaço ``fotos`` do backend compartilhado ou ``DEFAULT_PHOTO_DIR``"""
+    return shared.namespace('fotos') if shared is not None else FileBackend(DEFAULT_PHOTO_DIR)
+
+
+class PhotoStore:
+    """Fotos processadas por hash, com o processamento num pool de threads.
+
+    ``submit`` retorna o hash na hora, ``status`` acompanha o processamento e
+    ``thumbnail`` lê a miniatura pronta.
+    """
+
+    def __init__(self, backend=None, workers=PHOTO_WORKERS):
+        self.backend = backend or photo_backend()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fotos')
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def submit(self, data):
+        """Enfileira uma foto (bytes originais) e retorna o hash; repetidas não são reprocessadas"""
+        if len(data) > MAX_UPLOAD_BYTES:
+            raise ValueError(f"foto maior que {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        key = photo_key(data)
+        with self._lock:
+            future = self._futures.get(key)
+            # Em processamento, ou já pronta (miniatura no backend): nada a fazer; uma que falhou é refeita
+            if future is not None and not (future.done() and future.exception() is not None):
+                return key
+            if future is None and self.backend.exists(f"{key}_mini.jpg"):
+                return key
+            self._futures[key] = self._executor.submit(self._process, key, data)
+        return key
+
+    def _process(self, key, data):
+        photo, thumb = shrink(data)
+        self.backend.put(f"{key}.jpg", photo)
+        # A miniatura por último: a presença dela marca a foto como pronta para quem só olha o backend
+        self.backend.put(f"{key}_mini.jpg", thumb)
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def status(self, key):
+        """(situação, erro): pendente, pronto ou erro (foto que o Pillow não consegue abrir)"""
+        with self._lock:
+            future = self._futures.get(key)
+        if future is not None:
+            if not future.done():
+                return PENDENTE, None
+            if future.exception() is not None:
+                return ERRO, str(future.exception())
+        return (PRONTO, None) if self.backend.exists(f"{key}_mini.jpg") else (ERRO, "foto não encontrada")
+
+    def thumbnail(self, key):
+        return self.backend.get(f"{key}_mini.jpg")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def load_thumbnails(fotos, backend=None):
+    """{item: [miniatura JPEG]} para {item: [hash]}; fotos que sumiram do backend ficam de fora"""
+    backend = backend or photo_backend()
+    thumbnails = {}
+    for item, keys in fotos.items():
+        images = [image for image in (backend.get(f"{key}_mini.jpg") for key in keys) if image is not None]
+        if images:
+            thumbnails[item] = images
+    return thumbnails
@@ -0,0 +1,107 @@
+"""Modo de profiling por rerun, para investigar lentidão com dados de produção.
+
+Ligado para todas as sessões por ``CHECKLIST_PROFILE=1`` ou só para uma
+sessão com ``?profile=1`` na URL. Cada execução do script (e, com
+``CHECKLIST_PROFILE_PDF=1``, cada PDF) roda sob o cProfile; o perfil é salvo
+em ``CHECKLIST_PROFILE_DIR`` (rotativo, mantém os ``CHECKLIST_PROFILE_KEEP``
+mais recentes) e pode ser aberto com ``python -m pstats`` ou snakeviz.
+
+Só um perfil fica ativo por vez no processo: no Python 3.12+ o cProfile usa
+``sys.monitoring``, que é global, e o perfil de um rerun inclui as outras
+threads (outras sessões rodando ao mesmo tempo). Um rerun que começa com
+outro perfil ativo roda sem profiling (``Profile.skipped``).
+"""
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+
+ENABLED = os.environ.get('CHECKLIST_PROFILE', '').lower() in ('1', 'true', 'sim', 'yes')
+PDF_ENABLED = os.environ.get('CHECKLIST_PROFILE_PDF', '').lower() in ('1', 'true', 'sim', 'yes')
+PROFILE_DIR = os.environ.get('CHECKLIST_PROFILE_DIR', 'profiles')
+KEEP = int(os.environ.get('CHECKLIST_PROFILE_KEEP', '50'))
+TOP_N = 15
+
+_counter = itertools.count()
+_rotate_lock = threading.Lock()
+# Tomado pelo perfil ativo; quem não consegue roda sem profiling em vez de esperar
+_active_lock = threading.Lock()
+
+
+def requested(query_value=None):
+    """Profiling ligado pelo ambiente ou pelo parâmetro ``profile`` da URL"""
+    return ENABLED or (query_value or '').lower() in ('1', 'true', 'sim', 'yes')
+
+
+def summarize(stats, top=TOP_N):
+    """Linhas com as ``top`` funções de maior tempo acumulado"""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    lines = [f"{'acum ms':>9} {'próprio ms':>10} {'chamadas':>9}  função"]
+    for (filename, line, name), (_, calls, own, cumulative, _) in rows:
+        where = f"{os.path.basename(filename)}:{line}" if line else filename
+        lines.append(f"{cumulative * 1000:9.1f} {own * 1000:10.1f} {calls:9d}  {name} ({where})")
+    return '\n'.join(lines)
+
+
+def _rotate(directory, keep):
+    """Apaga os perfis mais antigos além de ``keep`` (nomes começam pelo horário)"""
+    with _rotate_lock:
+        files = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+        for name in files[:max(0, len(files) - keep)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class Profile:
+    """Bloco executado sob o cProfile; ao sair grava o perfil e guarda o resumo em ``summary``.
+
+    Com outro perfil ativo no processo (deste módulo ou de outra ferramenta)
+    o bloco roda sem profiling e ``skipped`` fica True.
+    """
+
+    def __init__(self, name, directory=PROFILE_DIR, keep=KEEP):
+        self.name = name
+        self.directory = directory
+        self.keep = keep
+        self.path = None
+        self.summary = None
+        self.skipped = False
+        self._profiler = cProfile.Profile()
+
+    def __enter__(self):
+        if not _active_lock.acquire(blocking=False):
+            self.skipped = True
+            return self
+        try:
+            self._profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active" (sys.monitoring, Python 3.12+)
+            _active_lock.release()
+            self.skipped = True
+        return self
+
+    def __exit__(self, *exc):
+        if self.skipped:
+            return False
+        try:
+            self._profiler.disable()
+        finally:
+            _active_lock.release()
+        stats = pstats.Stats(self._profiler)
+        self.summary = summarize(stats)
+        if self.directory:
+            # Falha ao gravar o perfil não pode derrubar o rerun que está sendo investigado
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                stamp = time.strftime('%Y%m%d-%H%M%S')
+                path = os.path.join(self.directory, f"{stamp}-{os.getpid()}-{next(_counter):05d}-{self.name}.prof")
+                stats.dump_stats(path)
+                self.path = path
+                _rotate(self.directory, self.keep)
+            except OSError:
+                pass
+        return False
@@ -0,0 +1,44 @@
+"""Busca de itens do catálogo por trecho do nome, sem diferenciar acentos e maiúsculas.
+
+Os nomes são normalizados uma vez e indexados por trigramas: a consulta só
+confere por substring os itens que têm todos os trigramas dela, então o
+custo acompanha o número de candidatos e não o tamanho do catálogo.
+"""
+import unicodedata
+
+
+def normalize(text):
+    """Minúsculas sem acentos ("Proteção" -> "protecao")"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def _trigrams(text):
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Índice de trigramas sobre uma lista de nomes; ``search`` retorna os IDs (posições) em ordem"""
+
+    def __init__(self, names):
+        self.names = [normalize(name) for name in names]
+        self.postings = {}
+        for item_id, name in enumerate(self.names):
+            for trigram in _trigrams(name):
+                self.postings.setdefault(trigram, []).append(item_id)
+
+    def search(self, query):
+        query = normalize(query.strip())
+        if not query:
+            return list(range(len(self.names)))
+        if len(query) < 3:
+            return [item_id for item_id, name in enumerate(self.names) if query in name]
+
+        # Interseção começando pela lista mais curta; a substring confirma (trigramas não garantem ordem)
+        postings = sorted((self.postings.get(trigram, ()) for trigram in _trigrams(query)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(item_id for item_id in candidates if query in self.names[item_id])
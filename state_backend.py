@@ -0,0 +1,167 @@
+"""Onde fica o estado que precisa sobreviver à sessão: rascunhos e PDFs gerados.
+
+Com ``CHECKLIST_STATE`` vazio tudo fica em arquivos locais (``FileBackend``,
+e o disco do ``PdfCache``): vários processos na mesma máquina compartilham o
+estado pelo sistema de arquivos. Com uma URL ``redis://`` (ou ``rediss://``,
+``unix://``) os rascunhos e os PDFs vão para o Redis (``RedisBackend``) e as
+réplicas do app podem rodar em máquinas diferentes atrás do balanceador, sem
+sessão presa a um servidor. As inspeções continuam no banco SQLite do
+``InspectionStore`` (``CHECKLIST_DB``), que só é compartilhado entre processos
+da mesma máquina: o Redis não torna o app multi-servidor enquanto o banco de
+inspeções for local (ver "Implantação" no README).
+
+Os dois backends têm a mesma interface: valores (``get``/``exists``/``put``/
+``delete``, com validade opcional) e diários só de acréscimos (``append``/``read_log``/
+``replace_log``). Cada uso fica num espaço de nomes próprio (``namespace``),
+um subdiretório ou um prefixo de chave.
+"""
+import os
+import tempfile
+import time
+
+DEFAULT_STATE_URL = os.environ.get('CHECKLIST_STATE', '')
+
+REDIS_SCHEMES = ('redis://', 'rediss://', 'unix://')
+
+
+class FileBackend:
+    """Estado em arquivos sob ``directory``; escritas de valor por arquivo temporário + rename.
+
+    A validade (``ttl``) não é aplicada na leitura: ``purge`` apaga o que
+    ficou sem mudança por mais tempo que isso.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def namespace(self, name):
+        return FileBackend(os.path.join(self.directory, name))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def put(self, name, data, ttl=None):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def append(self, name, record, ttl=None):
+        """Acrescenta um registro (bytes sem quebra de linha) ao diário ``name``"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(name), 'ab') as f:
+            f.write(record + b'\n')
+
+    def read_log(self, name):
+        """``(registros, completo)``: ``completo`` é False se a última escrita foi interrompida"""
+        content = self.get(name)
+        if not content:
+            return [], True
+        records = content.split(b'\n')
+        if records[-1]:
+            return records[:-1], False
+        return records[:-1], True
+
+    def replace_log(self, name, records, ttl=None):
+        """Troca o diário inteiro pelos ``records`` de uma vez"""
+        self.put(name, b''.join(record + b'\n' for record in records))
+
+    def purge(self, max_age):
+        """Apaga os arquivos sem mudança há mais de ``max_age`` segundos; retorna quantos"""
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        limit = time.time() - max_age
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class RedisBackend:
+    """Estado num Redis (ou qualquer servidor/cliente compatível com a API do redis-py).
+
+    Valores são strings (``SET ... EX``) e diários são listas (``RPUSH``/``LRANGE``);
+    a validade é renovada a cada escrita e o próprio Redis apaga o que expirou.
+    """
+
+    def __init__(self, client, prefix='checklist:'):
+        self.client = client
+        self.prefix = prefix
+
+    def namespace(self, name):
+        return RedisBackend(self.client, f"{self.prefix}{name}:")
+
+    def _key(self, name):
+        return self.prefix + name
+
+    def get(self, name):
+        return self.client.get(self._key(name))
+
+    def exists(self, name):
+        return bool(self.client.exists(self._key(name)))
+
+    def put(self, name, data, ttl=None):
+        self.client.set(self._key(name), data, ex=ttl)
+
+    def delete(self, name):
+        self.client.delete(self._key(name))
+
+    def append(self, name, record, ttl=None):
+        pipe = self.client.pipeline()
+        pipe.rpush(self._key(name), record)
+        if ttl:
+            pipe.expire(self._key(name), ttl)
+        pipe.execute()
+
+    def read_log(self, name):
+        # RPUSH é atômico: não existe registro pela metade
+        return self.client.lrange(self._key(name), 0, -1), True
+
+    def replace_log(self, name, records, ttl=None):
+        # MULTI/EXEC: quem lê vê o diário antigo ou o novo, nunca vazio
+        key = self._key(name)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(key)
+        if records:
+            pipe.rpush(key, *records)
+            if ttl:
+                pipe.expire(key, ttl)
+        pipe.execute()
+
+    def purge(self, max_age):
+        return 0
+
+
+def open_backend(url=DEFAULT_STATE_URL):
+    """``RedisBackend`` para uma URL do Redis; None (estado em arquivos locais) para URL vazia"""
+    if not url:
+        return None
+    if not url.startswith(REDIS_SCHEMES):
+        raise ValueError(f"CHECKLIST_STATE não suportado: {url} (use redis://host:porta/banco)")
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("Estado compartilhado no Redis precisa do redis-py (pip install redis)") from None
+    return RedisBackend(redis.Redis.from_url(url))
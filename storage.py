@@ -0,0 +1,301 @@
+"""Armazenamento persistente das inspeções EPC/EPI em SQLite.
+
+Cada inspeção enviada é gravada com os dados do cabeçalho (``info_data``) e
+o vetor compacto de status dos itens (um byte por item, ver
+``ChecklistSpec.encode``), junto com a versão do catálogo que dá nome a cada
+posição. As fotos de evidência ficam fora do banco (``photos``); aqui só o
+hash de cada uma, ligado ao código do item. O banco roda em modo WAL, com
+índices por placa, matrícula, colaborador, data e resultado.
+
+O WAL exige que todos os processos que abrem o banco estejam na mesma máquina
+(memória compartilhada e travas do sistema de arquivos local): o banco não
+pode ficar num disco de rede nem ser dividido entre réplicas em servidores
+diferentes. Ver "Implantação" no README.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+
+from metrics import timed
+
+DEFAULT_DB_PATH = os.environ.get('CHECKLIST_DB', 'checklists.db')
+
+# Campos de info_data gravados como colunas da tabela de inspeções
+INFO_COLUMNS = (
+    'local', 'data', 'empresa', 'placa', 'veiculo', 'modelo', 'matricula',
+    'colaborador', 'funcao', 'responsavel', 'observacoes', 'resultado'
+)
+
+# Filtros aceitos por InspectionStore.find -> coluna
+FILTER_COLUMNS = {
+    'tipo': 'tipo',
+    'placa': 'placa',
+    'matricula': 'matricula',
+    'colaborador': 'colaborador',
+    'resultado': 'resultado',
+    'responsavel': 'responsavel',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inspections (
+    id INTEGER PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    local TEXT, data TEXT, empresa TEXT, placa TEXT, veiculo TEXT, modelo TEXT,
+    matricula TEXT, colaborador TEXT, funcao TEXT, responsavel TEXT,
+    observacoes TEXT, resultado TEXT,
+    catalogo TEXT NOT NULL,
+    statuses BLOB NOT NULL,
+    criado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS catalogs (
+    tipo TEXT NOT NULL,
+    versao TEXT NOT NULL,
+    itens TEXT NOT NULL,
+    status TEXT NOT NULL,
+    codigos TEXT,
+    rotulo TEXT,
+    PRIMARY KEY (tipo, versao)
+);
+CREATE INDEX IF NOT EXISTS idx_inspections_placa ON inspections (placa, data);
+CREATE INDEX IF NOT EXISTS idx_inspections_matricula ON inspections (matricula, data);
+CREATE INDEX IF NOT EXISTS idx_inspections_colaborador ON inspections (colaborador, data);
+CREATE INDEX IF NOT EXISTS idx_inspections_data ON inspections (data);
+CREATE INDEX IF NOT EXISTS idx_inspections_resultado ON inspections (resultado, data);
+CREATE TABLE IF NOT EXISTS photos (
+    inspection_id INTEGER NOT NULL REFERENCES inspections (id),
+    item TEXT NOT NULL,
+    foto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_photos_inspection ON photos (inspection_id);
+"""
+
+
+def to_iso_date(value):
+    """Converte 'dd/mm/aaaa' (formato do formulário) para 'aaaa-mm-dd'; outros valores ficam como estão"""
+    if not value:
+        return ''
+    try:
+        return datetime.strptime(value, '%d/%m/%Y').strftime('%Y-%m-%d')
+    except ValueError:
+        return value
+
+
+def from_iso_date(value):
+    """Inverso de ``to_iso_date``"""
+    if not value:
+        return ''
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%d/%m/%Y')
+    except ValueError:
+        return value
+
+
+def catalog_version(categories):
+    """Versão (hash curto) de um catálogo de itens por categoria"""
+    digest = hashlib.sha1(repr([(categoria, list(itens)) for categoria, itens in categories.items()]).encode())
+    return digest.hexdigest()[:12]
+
+
+class InspectionStore:
+    """Banco de inspeções: gravação em lote numa transação e consultas pelos campos indexados.
+
+    ``specs`` ({tipo: ChecklistSpec}) é usado para codificar os status na
+    gravação; a leitura usa só os catálogos gravados no próprio banco. Uma
+    conexão por instância, protegida por lock para uso a partir das threads
+    de sessão do Streamlit.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, specs=None):
+        self.path = path
+        self.specs = specs or {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._catalogs = {}
+
+    def _migrate(self):
+        """Colunas acrescentadas depois da primeira versão do banco"""
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(catalogs)')}
+        for column in ('codigos', 'rotulo'):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE catalogs ADD COLUMN {column} TEXT')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _register_catalog(self, spec, registered):
+        """Grava (uma vez) itens, códigos estáveis dos itens e status da versão atual do catálogo da spec.
+
+        A versão vai para ``registered``; quem chama só a põe em ``_catalogs``
+        depois do commit, para um rollback não deixar no cache um catálogo que
+        não está no banco.
+        """
+        catalog = spec.catalog
+        key = (spec.key, catalog.version)
+        if key not in self._catalogs and key not in registered:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO catalogs (tipo, versao, itens, status, codigos, rotulo) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (spec.key, catalog.version, json.dumps(catalog.item_names, ensure_ascii=False),
+                 json.dumps(spec.status_codes), json.dumps(catalog.item_codes), catalog.label)
+            )
+            registered[key] = (catalog.item_names, tuple(spec.status_codes), catalog.item_codes)
+
+    def _catalog(self, tipo, versao):
+        """(nomes dos itens, códigos de status, códigos dos itens) de uma versão de catálogo gravada.
+
+        Versões gravadas antes dos códigos de item usam o próprio nome como código.
+        """
+        key = (tipo, versao)
+        catalog = self._catalogs.get(key)
+        if catalog is None:
+            row = self._conn.execute('SELECT itens, status, codigos FROM catalogs WHERE tipo = ? AND versao = ?',
+                                     key).fetchone()
+            names = tuple(json.loads(row['itens']))
+            codes = tuple(json.loads(row['codigos'])) if row['codigos'] else names
+            catalog = self._catalogs[key] = (names, tuple(json.loads(row['status'])), codes)
+        return catalog
+
+    def save(self, tipo, data, info_data, fotos=None):
+        """Grava uma inspeção (``data`` como dict {item: status} ou vetor de códigos) e retorna o id"""
+        return self.save_many([{'tipo': tipo, 'data': data, 'info_data': info_data, 'fotos': fotos}])[0]
+
+    def save_many(self, records):
+        """Grava vários registros ``{'tipo', 'data', 'info_data'}`` numa única transação.
+
+        ``fotos`` opcional: {código do item: [hash da foto]}.
+        """
+        criado_em = datetime.now().isoformat(timespec='seconds')
+        placeholders = ', '.join('?' * (len(INFO_COLUMNS) + 4))
+        insert = (f"INSERT INTO inspections (tipo, {', '.join(INFO_COLUMNS)}, catalogo, statuses, criado_em) "
+                  f"VALUES ({placeholders})")
+
+        ids = []
+        registered = {}
+        with timed('storage_write'), self._lock:
+            with self._conn:
+                for record in records:
+                    tipo = record['tipo']
+                    spec = self.specs[tipo]
+                    self._register_catalog(spec, registered)
+
+                    data = record.get('data', {})
+                    statuses = spec.encode(data) if isinstance(data, dict) else data
+                    info_data = record.get('info_data', {})
+                    values = [info_data.get(column, '') or '' for column in INFO_COLUMNS]
+                    values[INFO_COLUMNS.index('data')] = to_iso_date(info_data.get('data', ''))
+                    inspection_id = self._conn.execute(
+                        insert, [tipo, *values, spec.version, bytes(statuses), criado_em]
+                    ).lastrowid
+                    fotos = record.get('fotos') or {}
+                    self._conn.executemany(
+                        'INSERT INTO photos (inspection_id, item, foto) VALUES (?, ?, ?)',
+                        [(inspection_id, item, foto) for item, keys in fotos.items() for foto in keys]
+                    )
+                    ids.append(inspection_id)
+            self._catalogs.update(registered)
+        return ids
+
+    def _header(self, row):
+        info_data = {column: row[column] or '' for column in INFO_COLUMNS}
+        info_data['data'] = from_iso_date(info_data['data'])
+        return {'id': row['id'], 'tipo': row['tipo'], 'info_data': info_data, 'catalogo': row['catalogo'],
+                'criado_em': row['criado_em']}
+
+    def get(self, inspection_id):
+        """Inspeção completa ou None.
+
+        ``data`` traz o dict {item: status}, ``por_codigo`` o mesmo pelo código
+        estável do item (para ler com outra versão do catálogo), ``statuses`` o
+        vetor gravado e ``fotos`` {código do item: [hash da foto]}.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM inspections WHERE id = ?', (inspection_id,)).fetchone()
+            if row is None:
+                return None
+            names, codes, item_codes = self._catalog(row['tipo'], row['catalogo'])
+            photos = self._conn.execute('SELECT item, foto FROM photos WHERE inspection_id = ? ORDER BY rowid',
+                                        (inspection_id,)).fetchall()
+        record = self._header(row)
+        record['fotos'] = {}
+        for photo in photos:
+            record['fotos'].setdefault(photo['item'], []).append(photo['foto'])
+        record['statuses'] = statuses = array('B', row['statuses'])
+        marked = [(item_id, codes[number - 1]) for item_id, number in enumerate(statuses) if number]
+        record['data'] = {names[item_id]: status for item_id, status in marked}
+        record['por_codigo'] = {item_codes[item_id]: status for item_id, status in marked}
+        return record
+
+    def find(self, data_inicio=None, data_fim=None, limit=100, offset=0, **filters):
+        """Cabeçalhos das inspeções que atendem aos filtros, das mais recentes para as mais antigas.
+
+        Filtros por igualdade: tipo, placa, matricula, colaborador, resultado e
+        responsavel. ``data_inicio``/``data_fim`` aceitam 'dd/mm/aaaa' ou 'aaaa-mm-dd'; ``limit=None`` retorna todas.
+        """
+        where, params = [], []
+        for name, value in filters.items():
+            if name not in FILTER_COLUMNS:
+                raise ValueError(f"Filtro desconhecido: {name}")
+            if value:
+                where.append(f"{FILTER_COLUMNS[name]} = ?")
+                params.append(value)
+        if data_inicio:
+            where.append('data >= ?')
+            params.append(to_iso_date(data_inicio))
+        if data_fim:
+            where.append('data <= ?')
+            params.append(to_iso_date(data_fim))
+
+        sql = f"SELECT id, tipo, {', '.join(INFO_COLUMNS)}, catalogo, criado_em FROM inspections"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY data DESC, id DESC LIMIT ? OFFSET ?'
+        params += [-1 if limit is None else limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._header(row) for row in rows]
+
+    def latest(self, tipo, **filters):
+        """Cabeçalho da inspeção mais recente (pela data, depois pelo id) com os ``filters`` de ``find``, ou None.
+
+        Por placa ou matrícula é uma única busca no índice (placa, data) ou (matricula, data), já na ordem
+        pedida: o custo não depende de quantas inspeções o veículo ou o colaborador tem.
+        """
+        headers = self.find(limit=1, tipo=tipo, **filters)
+        return headers[0] if headers else None
+
+    def history(self, tipo, data_inicio=None):
+        """Linhas (id, data ISO, placa, matricula, colaborador, resultado, catalogo, statuses) para análises.
+
+        Retorna também {versao: (nomes dos itens, códigos de status, códigos dos itens)} dos catálogos envolvidos.
+        """
+        sql = ('SELECT id, data, placa, matricula, colaborador, resultado, catalogo, statuses '
+               'FROM inspections WHERE tipo = ?')
+        params = [tipo]
+        if data_inicio:
+            sql += ' AND data >= ?'
+            params.append(to_iso_date(data_inicio))
+        with self._lock:
+            rows = [tuple(row) for row in self._conn.execute(sql + ' ORDER BY id', params)]
+            catalogs = {versao: self._catalog(tipo, versao) for versao in {row[6] for row in rows}}
+        return rows, catalogs
+
+    def watermark(self):
+        """(quantidade, último id) das inspeções: muda sempre que uma inspeção é gravada"""
+        with self._lock:
+            return tuple(self._conn.execute('SELECT COUNT(*), COALESCE(MAX(id), 0) FROM inspections').fetchone())
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM inspections').fetchone()[0]
@@ -0,0 +1,92 @@
+"""Cliente redis-py em memória, só com os comandos que o ``RedisBackend`` usa.
+
+Valores em bytes, listas, validade (``SET ... EX``/``EXPIRE``) por um relógio
+controlável e pipelines executados de uma vez, como um MULTI/EXEC.
+"""
+import threading
+
+
+class FakeRedis:
+    def __init__(self):
+        self.now = 0.0
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def advance(self, seconds):
+        """Avança o relógio: chaves com validade vencida deixam de existir"""
+        self.now += seconds
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= self.now:
+            self._data.pop(key, None)
+            del self._expires[key]
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = bytes(value)
+            self._expires.pop(key, None)
+            if ex:
+                self._expires[key] = self.now + ex
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    removed += 1
+            return removed
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = self.now + seconds
+            return True
+
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._data[key] if self._alive(key) else self._data.setdefault(key, [])
+            items.extend(bytes(value) for value in values)
+            return len(items)
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            if not self._alive(key):
+                return []
+            items = self._data[key]
+            return list(items[start:None if end == -1 else end + 1])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Acumula os comandos e executa todos sob o lock do cliente"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [getattr(self._client, name)(*args, **kwargs) for name, args, kwargs in commands]
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import ChecklistApi, Client
+from checklistepiepc import RESULTADO_OPTIONS, SPECS, iter_archived_pdfs
+from pdf_cache import PdfCache
+from pdf_jobs import PdfJobQueue
+from storage import InspectionStore
+
+TOKEN = 'segredo-de-teste'
+
+
+@pytest.fixture
+def app(tmp_path):
+    store = InspectionStore(str(tmp_path / 'inspecoes.db'), SPECS)
+    queue = PdfJobQueue(executor=ThreadPoolExecutor(max_workers=2), cache=PdfCache(None))
+    yield ChecklistApi(store, queue, SPECS, iter_archived_pdfs, resultados=RESULTADO_OPTIONS, token=TOKEN)
+    queue.shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return Client(app, token=TOKEN)
+
+
+def _inspection(**info):
+    spec = SPECS['epc']
+    return {'tipo': 'epc', 'itens': {spec.catalog.item_codes[0]: 'A', spec.item_names[3]: 'b'},
+            'info_data': {'data': '2025-03-05', 'responsavel': 'Ana', 'placa': 'API1234', **info}}
+
+
+def test_submit_returns_pdf_and_stores_inspection(client):
+    response = client.post('/inspecoes', _inspection())
+    assert response.status == 201
+    assert response.headers['Content-Type'] == 'application/pdf'
+    assert response.body.startswith(b'%PDF-')
+    assert 'Server-Timing' in response.headers
+
+    location = response.headers['Location']
+    assert client.get(location).body.startswith(b'%PDF-')
+    stored = client.get(location.removesuffix('/pdf'))
+    assert stored.status == 200
+    assert stored.json()['info_data']['data'] == '05/03/2025'
+
+
+def test_submit_without_pdf_returns_json(client):
+    response = client.post('/inspecoes?pdf=0', _inspection())
+    assert response.status == 201
+    assert isinstance(response.json()['id'], int)
+
+
+def test_malformed_json_is_400(client):
+    response = client.request('POST', '/inspecoes', body=b'{"tipo": ')
+    assert response.status == 400
+    assert 'JSON inválido' in response.json()['erro']
+
+
+def test_batch_needs_a_list(client):
+    assert client.post('/inspecoes/lote', {'tipo': 'epc'}).status == 400
+
+
+def test_invalid_inspection_lists_every_error(client):
+    response = client.post('/inspecoes', {'tipo': 'epi', 'itens': {'X': 'C'}, 'info_data': {'data': '31/02/2025'}})
+    assert response.status == 422
+    assert len(response.json()['erros']) >= 3
+
+
+@pytest.mark.parametrize('path', ['/inspecoes/999999', '/inspecoes/999999/pdf', '/catalogos/xyz', '/nada'])
+def test_not_found(client, path):
+    response = client.get(path)
+    assert response.status == 404
+    assert response.json()['erro']
+
+
+def test_batch_reports_each_inspection(client):
+    response = client.post('/inspecoes/lote', [_inspection(), {'tipo': 'xyz'}, _inspection(placa='OUTRA')])
+    assert response.status == 201
+    resultado = response.json()
+    assert (resultado['gravadas'], resultado['com_erro']) == (2, 1)
+    assert ['id' in item for item in resultado['resultados']] == [True, False, True]
+    assert resultado['resultados'][1]['erros']
+
+
+@pytest.mark.parametrize('headers', [None, {'Authorization': 'Bearer errado'}, {'Authorization': TOKEN}])
+def test_request_without_valid_token_is_401(app, headers):
+    response = Client(app).get('/catalogos/epc', headers=headers)
+    assert response.status == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    assert 'token' in response.json()['erro']
+
+
+def test_api_requires_a_configured_token(app):
+    with pytest.raises(ValueError, match='CHECKLIST_API_TOKEN'):
+        ChecklistApi(app.store, app.queue, SPECS, iter_archived_pdfs, token='')
@@ -0,0 +1,16 @@
+import json
+
+from batch_pdf import main
+
+
+def test_unknown_tipo_lists_valid_tipos_and_renders_nothing(tmp_path, capsys):
+    entrada = tmp_path / 'inspecoes.jsonl'
+    entrada.write_text('\n'.join(json.dumps(record) for record in [
+        {'tipo': 'epc', 'data': {}, 'info_data': {'data': '01/03/2025'}},
+        {'tipo': 'EPX', 'data': {}, 'info_data': {}},
+    ]), encoding='utf-8')
+    saida = tmp_path / 'pdfs'
+
+    assert main([str(entrada), '-o', str(saida), '-w', '1']) == 1
+    assert 'registro 2 (epx): tipo inválido; use epc, epi' in capsys.readouterr().err
+    assert not saida.exists()
@@ -0,0 +1,48 @@
+import io
+
+from bulk_import import import_table
+from checklistepiepc import RESULTADO_OPTIONS, SPECS
+from storage import InspectionStore
+
+ITEM = SPECS['epi'].item_names[0]
+
+
+def _import(tmp_path, csv_text):
+    store = InspectionStore(str(tmp_path / 'inspecoes.db'), SPECS)
+    resultado = import_table(store, SPECS, io.StringIO(csv_text), name='planilha.csv', resultados=RESULTADO_OPTIONS)
+    return resultado, resultado['erros'].to_dict('records')
+
+
+def test_rows_without_items_are_rejected(tmp_path):
+    item = SPECS['epi'].item_names[0]
+    planilha = io.StringIO(
+        f'tipo;data;responsavel;resultado;"{item}"\n'
+        'epi;01/03/2025;Ana;Aprovado;C\n'
+        'epi;02/03/2025;Ana;Aprovado;\n'
+    )
+    store = InspectionStore(str(tmp_path / 'inspecoes.db'), SPECS)
+    resultado = import_table(store, SPECS, planilha, name='planilha.csv', resultados=RESULTADO_OPTIONS)
+
+    assert (resultado['validas'], resultado['importadas']) == (1, 1)
+    assert resultado['erros'].to_dict('records') == [{'linha': 3, 'erro': 'nenhum item preenchido'}]
+
+
+def test_unknown_status_code_names_the_item(tmp_path):
+    resultado, erros = _import(tmp_path, f'tipo;data;responsavel;"{ITEM}"\nepi;01/03/2025;Ana;X\n')
+
+    assert resultado['importadas'] == 0
+    assert erros == [{'linha': 2, 'erro': f'status inválido (use C/NC/NR/N/A) em: {ITEM}'}]
+
+
+def test_missing_required_headers_reject_every_row(tmp_path):
+    resultado, erros = _import(tmp_path, f'tipo;"{ITEM}"\nepi;C\nepi;NC\n')
+
+    assert resultado['importadas'] == 0
+    assert erros == [{'linha': linha, 'erro': 'responsável obrigatório; data obrigatória'} for linha in (2, 3)]
+
+
+def test_sheet_without_item_columns_has_no_filled_items(tmp_path):
+    resultado, erros = _import(tmp_path, 'tipo;data;responsavel\nepc;01/03/2025;Ana\n')
+
+    assert resultado['importadas'] == 0
+    assert erros == [{'linha': 2, 'erro': 'nenhum item preenchido'}]
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+from checklistepiepc import SPECS, create_pdf, pdf_key
+from pdf_render import PdfTemplate
+
+GENERATED_AT = datetime(2025, 3, 1, 14, 30)
+
+
+def _inspection(spec):
+    data = {item: spec.status_codes[index % len(spec.status_codes)] for index, item in enumerate(spec.item_names)}
+    info_data = {'local': 'Base', 'data': '01/03/2025', 'empresa': 'Rezende Energia', 'placa': 'ABC1D23',
+                 'matricula': '00042', 'colaborador': 'Fulano', 'responsavel': 'Beltrano', 'resultado': 'Aprovado',
+                 'observacoes': 'Sem observações'}
+    return data, info_data
+
+
+@pytest.mark.parametrize('overlay', [False, True], ids=['platypus', 'overlay'])
+@pytest.mark.parametrize('tipo', list(SPECS))
+def test_deterministic_pdf_is_byte_identical(tipo, overlay):
+    """Mesmas entradas e mesmo ``generated_at``: mesmos bytes, inclusive com um template novo"""
+    spec = SPECS[tipo]
+    data, info_data = _inspection(spec)
+    first = create_pdf(spec, data, info_data, overlay=overlay, generated_at=GENERATED_AT).getvalue()
+    second = create_pdf(spec, dict(data), dict(info_data), overlay=overlay, generated_at=GENERATED_AT).getvalue()
+    fresh = PdfTemplate(spec)
+    third = (fresh.build_overlay(data, info_data, spec.categories, generated_at=GENERATED_AT) if overlay else
+             fresh.build(data, info_data, spec.categories, generated_at=GENERATED_AT)).getvalue()
+    assert first.startswith(b'%PDF-')
+    assert first == second == third
+
+
+def test_pdf_key_follows_content():
+    spec = SPECS['epc']
+    data, info_data = _inspection(spec)
+    key = pdf_key(spec, data, info_data, generated_at=GENERATED_AT)
+    assert key == pdf_key(spec, dict(reversed(list(data.items()))), dict(info_data), generated_at=GENERATED_AT)
+    assert key != pdf_key(spec, data, dict(info_data, observacoes='Outra'), generated_at=GENERATED_AT)
+    assert key != pdf_key(spec, data, info_data, overlay=True, generated_at=GENERATED_AT)
+    assert key != pdf_key(spec, data, info_data, generated_at=GENERATED_AT.replace(minute=31))
@@ -0,0 +1,47 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pdf_jobs
+from checklistepiepc import SPECS, iter_archived_pdfs
+from pdf_cache import PdfCache
+from pdf_jobs import PdfJobQueue
+from storage import InspectionStore
+
+
+@pytest.fixture
+def archived(tmp_path):
+    store = InspectionStore(str(tmp_path / 'inspecoes.db'), SPECS)
+    spec = SPECS['epc']
+    store.save_many([{'tipo': 'epc', 'data': {spec.item_names[index]: 'A'},
+                      'info_data': {'data': '05/03/2025', 'responsavel': 'Ana', 'placa': f'ABC{index}'}}
+                     for index in range(3)])
+    return store, store.find()
+
+
+def test_archived_pdfs_do_not_depend_on_the_queue_lru(archived):
+    """Com ``max_results=0`` todo resultado sai do LRU na hora; os PDFs chegam mesmo assim"""
+    store, headers = archived
+    queue = PdfJobQueue(executor=ThreadPoolExecutor(max_workers=2), cache=PdfCache(None), max_results=0)
+    try:
+        for _ in range(2):  # a segunda passada sai toda do cache de PDFs
+            results = list(iter_archived_pdfs(store, headers, queue))
+            assert [header['id'] for header, _, _ in results] == [header['id'] for header in headers]
+            assert all(erro is None and pdf.startswith(b'%PDF-') for _, pdf, erro in results)
+    finally:
+        queue.shutdown()
+
+
+def test_slow_pdf_is_reported_as_timeout(archived, monkeypatch):
+    store, headers = archived
+    release = threading.Event()
+    monkeypatch.setattr(pdf_jobs, '_render', lambda *args: release.wait() and (b'', []))
+    queue = PdfJobQueue(executor=ThreadPoolExecutor(max_workers=1), cache=PdfCache(None))
+    try:
+        header, pdf, erro = next(iter_archived_pdfs(store, headers[:1], queue, timeout=0.05))
+        assert pdf is None
+        assert 'não ficou pronto' in erro
+    finally:
+        release.set()
+        queue.shutdown()
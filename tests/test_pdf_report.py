@@ -0,0 +1,64 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from checklistepiepc import SPECS, create_consolidated_pdf
+from storage import InspectionStore
+
+pypdf = pytest.importorskip('pypdf')
+
+
+class _DeletingStore:
+    """Store que perde uma inspeção entre a listagem e o desenho"""
+
+    def __init__(self, store, missing_id):
+        self.store = store
+        self.missing_id = missing_id
+
+    def get(self, inspection_id):
+        return None if inspection_id == self.missing_id else self.store.get(inspection_id)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = InspectionStore(str(tmp_path / 'inspecoes.db'), SPECS)
+    for index, tipo in enumerate(['epc', 'epi', 'epc']):
+        spec = SPECS[tipo]
+        observacoes = 'palavra ' * 400 if index == 2 else 'Sem observações'
+        store.save(tipo, {spec.item_names[index]: spec.status_codes[0]},
+                   {'data': f"0{index + 1}/03/2025", 'responsavel': 'Ana', 'placa': f"AAA000{index}",
+                    'observacoes': observacoes})
+    return store
+
+
+def _render(store, headers):
+    output = io.BytesIO()
+    resultado = create_consolidated_pdf(store, headers, output, generated_at=datetime(2025, 3, 31, 12, 0))
+    return resultado, output.getvalue()
+
+
+def test_streamed_report_parses_strictly(store):
+    """O PdfStreamWriter usa internals do ReportLab: o arquivo tem que passar num parser estrito"""
+    headers = store.find(limit=None)[::-1]
+    resultado, pdf = _render(store, headers)
+
+    reader = pypdf.PdfReader(io.BytesIO(pdf), strict=True)
+    assert len(reader.pages) == resultado['paginas']
+    assert len(pdf) == resultado['bytes']
+    assert [entry.title for entry in reader.outline][0] == 'Índice'
+    assert len(reader.outline) == len(headers) + 1
+    for page in reader.pages:
+        page.extract_text()
+    assert 'palavra palavra' in reader.pages[-1].extract_text()
+
+
+def test_missing_inspection_keeps_report_consistent(store):
+    headers = store.find(limit=None)[::-1]
+    resultado, pdf = _render(_DeletingStore(store, headers[1]['id']), headers)
+
+    assert (resultado['inspecoes'], resultado['ausentes']) == (2, 1)
+    reader = pypdf.PdfReader(io.BytesIO(pdf), strict=True)
+    assert len(reader.pages) == resultado['paginas']
+    texts = [page.extract_text() for page in reader.pages]
+    assert any(f"Inspeção nº {headers[1]['id']} não encontrada" in text for text in texts)
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+from drafts import DraftJournal, purge_drafts
+from pdf_cache import PdfCache
+from state_backend import FileBackend, RedisBackend, open_backend
+
+from fake_redis import FakeRedis
+
+
+@pytest.fixture(params=['arquivo', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'arquivo':
+        return FileBackend(str(tmp_path / 'estado'))
+    return RedisBackend(FakeRedis())
+
+
+def test_get_put_delete(backend):
+    assert backend.get('a') is None
+    assert not backend.exists('a')
+    backend.put('a', b'1')
+    backend.put('a', b'2', ttl=60)
+    assert backend.get('a') == b'2'
+    assert backend.exists('a')
+    backend.delete('a')
+    backend.delete('a')
+    assert backend.get('a') is None
+    assert not backend.exists('a')
+
+
+def test_namespace_isolates_keys(backend):
+    pdf, drafts = backend.namespace('pdf'), backend.namespace('rascunhos')
+    pdf.put('x', b'pdf')
+    drafts.put('x', b'rascunho')
+    assert (pdf.get('x'), drafts.get('x'), backend.get('x')) == (b'pdf', b'rascunho', None)
+
+
+def test_log_append_and_replace(backend):
+    assert backend.read_log('d') == ([], True)
+    backend.append('d', b'1')
+    backend.append('d', b'2', ttl=60)
+    assert backend.read_log('d') == ([b'1', b'2'], True)
+    backend.replace_log('d', [b'3'])
+    assert backend.read_log('d') == ([b'3'], True)
+
+
+def test_file_log_with_interrupted_write(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    backend.append('d', b'{"a":1}')
+    with open(tmp_path / 'd', 'ab') as f:
+        f.write(b'{"b"')
+    assert backend.read_log('d') == ([b'{"a":1}'], False)
+
+
+def test_redis_ttl_eviction():
+    client = FakeRedis()
+    backend = RedisBackend(client).namespace('pdf')
+    backend.put('velho', b'1', ttl=10)
+    backend.append('diario', b'1', ttl=10)
+    client.advance(5)
+    backend.append('diario', b'2', ttl=10)
+    client.advance(6)
+    assert backend.get('velho') is None
+    assert backend.read_log('diario') == ([b'1', b'2'], True)
+    client.advance(10)
+    assert backend.read_log('diario') == ([], True)
+
+
+def test_file_purge_removes_stale_entries(tmp_path):
+    backend = FileBackend(str(tmp_path))
+    backend.put('velho', b'1')
+    backend.put('novo', b'2')
+    old = time.time() - 3600
+    os.utime(tmp_path / 'velho', (old, old))
+    assert backend.purge(60) == 1
+    assert (backend.get('velho'), backend.get('novo')) == (None, b'2')
+    assert FileBackend(str(tmp_path / 'nao_existe')).purge(60) == 0
+
+
+def test_open_backend():
+    assert open_backend('') is None
+    with pytest.raises(ValueError):
+        open_backend('memcached://localhost')
+
+
+def test_draft_shared_between_replicas(backend):
+    """Duas réplicas com o mesmo backend: a segunda reabre o rascunho gravado pela primeira"""
+    shared = backend.namespace('rascunhos')
+    first = DraftJournal('abc123', shared, debounce=0, compact_records=3)
+    for value in ('A', 'B', 'C', 'D'):
+        first.update({'epc_placa': value, 'epc:EPC-001': 'B'})
+    first.update({'epc:EPC-001': None})
+
+    second = DraftJournal('abc123', shared)
+    assert second.state == {'epc_placa': 'D'}
+    assert len(shared.read_log('abc123.jsonl')[0]) < 5
+
+    second.discard()
+    assert DraftJournal('abc123', shared).state == {}
+
+
+def test_purge_drafts_on_redis_is_left_to_expiry():
+    assert purge_drafts(RedisBackend(FakeRedis()).namespace('rascunhos')) == 0
+
+
+def test_pdf_cache_on_backend():
+    client = FakeRedis()
+    backend = RedisBackend(client).namespace('pdf')
+    cache = PdfCache(backend=backend, max_memory_bytes=10, ttl=60)
+    cache.put('a', b'12345678')
+    cache.put('b', b'87654321')
+    # 'a' saiu da memória (LRU), mas outra réplica e esta mesma ainda o leem do backend
+    assert cache.stats()['memoria'] == 1
+    assert cache.get('a') == b'12345678'
+    assert PdfCache(backend=backend).get('b') == b'87654321'
+    client.advance(61)
+    assert PdfCache(backend=backend).get('b') is None
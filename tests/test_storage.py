@@ -0,0 +1,23 @@
+import pytest
+
+from checklistepiepc import SPECS
+from storage import InspectionStore
+
+
+def _record(tipo='epc'):
+    return {'tipo': tipo, 'data': {SPECS[tipo].item_names[0]: 'A'},
+            'info_data': {'data': '05/03/2025', 'responsavel': 'Ana'}}
+
+
+def test_rolled_back_batch_does_not_cache_catalog(tmp_path):
+    path = str(tmp_path / 'inspecoes.db')
+    store = InspectionStore(path, SPECS)
+    with pytest.raises(KeyError):
+        store.save_many([_record(), {**_record(), 'tipo': 'desconhecido'}])
+    assert store.count() == 0
+
+    inspection_id = store.save(**_record())
+    store.close()
+
+    reopened = InspectionStore(path, SPECS)
+    assert reopened.get(inspection_id)['data'][SPECS['epc'].item_names[0]] == 'A'